@@ -0,0 +1,43 @@
+"""composite indexes for hot query shapes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 23:05:12.418903
+
+Indexes are built with CREATE INDEX CONCURRENTLY so the tables stay writable
+while they build. CONCURRENTLY cannot run inside a transaction, hence the
+autocommit block. A build interrupted half way leaves an INVALID index
+behind: drop it and run the migration again.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_recycling_events_user_id_created_at', 'recycling_events', ['user_id', 'created_at']),
+    ('ix_recycling_events_branch_id_created_at', 'recycling_events', ['branch_id', 'created_at']),
+    ('ix_purchases_user_id_created_at', 'purchases', ['user_id', 'created_at']),
+    ('ix_user_rewards_user_id_reward_id', 'user_rewards', ['user_id', 'reward_id']),
+    ('ix_user_rewards_user_id_status_created_at', 'user_rewards', ['user_id', 'status', 'created_at']),
+    ('ix_rewards_status_popularity_score', 'rewards', ['status', 'popularity_score']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
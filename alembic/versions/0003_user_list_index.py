@@ -0,0 +1,31 @@
+"""index for keyset pagination of the user list
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 23:31:07.902154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, see 0002
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_created_at_id', 'users', ['created_at', 'id'],
+            unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_created_at_id', table_name='users', postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""authorization version of users, carried by access tokens
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:52:41.318807
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default is a metadata-only change, existing rows are not rewritten
+    op.add_column('users', sa.Column('authz_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'authz_version')
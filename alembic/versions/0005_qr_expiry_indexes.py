@@ -0,0 +1,39 @@
+"""expiry indexes for the QR artifact sweeper
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:14:03.527216
+
+Databases created with create_all and stamped at the baseline may already
+have these indexes and others may not, hence IF NOT EXISTS. Built
+CONCURRENTLY in an autocommit block like 0002, an interrupted build leaves
+an INVALID index behind: drop it and run the migration again.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_purchases_qr_expires_at', 'purchases', ['qr_expires_at']),
+    ('ix_user_rewards_expires_at', 'user_rewards', ['expires_at']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
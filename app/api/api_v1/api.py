@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from app.api.api_v1.endpoints import (
     auth,
     users,
@@ -9,8 +9,10 @@ from app.api.api_v1.endpoints import (
     admin,
     ai_validation
 )
+from app.core.rate_limit import enforce_rate_limit
 
-api_router = APIRouter()
+# Every API route is rate limited, by cost, before its own dependencies run
+api_router = APIRouter(dependencies=[Depends(enforce_rate_limit)])
 
 # Authentication routes
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, func, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Dict, Any
 from loguru import logger
 from datetime import datetime, timedelta
 
-from app.core.security import get_current_admin_user
-from app.db.session import get_db
+from app.core.security import get_current_admin_claims
+from app.db.session import get_async_read_db, execute_concurrently
+from app.db.query_profiler import profiler, MAX_STATEMENTS_PER_ENDPOINT
 from app.models.user import User
 from app.models.branch import Branch
-from app.models.recycling import RecyclingEvent
+from app.models.recycling import RecyclingEvent, RecyclingItem
 from app.models.purchase import Purchase
 from app.schemas.admin import (
     AdminDashboard,
@@ -23,51 +26,68 @@ from app.schemas.admin import (
 router = APIRouter()
 
 
+def dashboard_overview_query():
+    """Dashboard totals in one statement: a single pass over recycling events, active users as a subquery"""
+    return select(
+        func.count(RecyclingEvent.id).label("total_events"),
+        func.coalesce(func.sum(RecyclingEvent.total_weight_recycled), 0.0).label("total_waste"),
+        func.coalesce(func.sum(RecyclingEvent.carbon_footprint_reduced), 0.0).label("total_carbon"),
+        func.coalesce(func.sum(RecyclingEvent.points_earned), 0).label("total_points"),
+        func.coalesce(func.avg(RecyclingEvent.accuracy_score), 0.0).label("avg_accuracy"),
+        select(func.count(User.id)).where(User.is_active == True).scalar_subquery().label("active_users")
+    )
+
+
+def top_branches_query(limit: int):
+    """Ranking columns of the active branches with the most recycled items"""
+    return select(
+        Branch.id,
+        Branch.name,
+        Branch.city,
+        Branch.total_recycled_items,
+        Branch.total_carbon_reduced,
+        Branch.recycling_accuracy_rate
+    ).where(Branch.is_active == True).order_by(Branch.total_recycled_items.desc()).limit(limit)
+
+
+def top_users_query(limit: int):
+    """Ranking columns of the active users with the most points"""
+    return select(
+        User.id,
+        User.first_name,
+        User.last_name,
+        User.total_points,
+        User.total_recycled_items,
+        User.carbon_footprint_reduced
+    ).where(User.is_active == True).order_by(User.total_points.desc()).limit(limit)
+
+
 @router.get("/dashboard", response_model=AdminDashboard)
 async def get_admin_dashboard(
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get complete admin dashboard data"""
     
-    # Calculate overview statistics
-    total_recycling_events = db.query(RecyclingEvent).count()
-    total_users = db.query(User).filter(User.is_active == True).count()
-    total_branches = db.query(Branch).filter(Branch.is_active == True).count()
-    
-    # Calculate environmental stats
-    total_waste = db.query(RecyclingEvent).with_entities(
-        func.sum(RecyclingEvent.total_weight_recycled)
-    ).scalar() or 0.0
-    
-    total_carbon = db.query(RecyclingEvent).with_entities(
-        func.sum(RecyclingEvent.carbon_footprint_reduced)
-    ).scalar() or 0.0
-    
-    total_points = db.query(RecyclingEvent).with_entities(
-        func.sum(RecyclingEvent.points_earned)
-    ).scalar() or 0
-    
-    avg_accuracy = db.query(RecyclingEvent).with_entities(
-        func.avg(RecyclingEvent.accuracy_score)
-    ).scalar() or 0.0
+    overview_result, branches_result, users_result = await execute_concurrently(
+        db,
+        dashboard_overview_query(),
+        top_branches_query(10),
+        top_users_query(10)
+    )
     
+    totals = overview_result.one()
     overview = EnvironmentalStats(
-        total_waste_recycled=total_waste,
-        carbon_footprint_reduced=total_carbon,
-        recycling_accuracy_rate=avg_accuracy,
-        total_recycling_events=total_recycling_events,
-        active_users=total_users,
-        total_points_awarded=total_points
+        total_waste_recycled=totals.total_waste,
+        carbon_footprint_reduced=totals.total_carbon,
+        recycling_accuracy_rate=totals.avg_accuracy,
+        total_recycling_events=totals.total_events,
+        active_users=totals.active_users,
+        total_points_awarded=totals.total_points
     )
     
-    # Get top branches
-    branches = db.query(Branch).filter(Branch.is_active == True).order_by(
-        Branch.total_recycled_items.desc()
-    ).limit(10).all()
-    
     top_branches = []
-    for i, branch in enumerate(branches, 1):
+    for i, branch in enumerate(branches_result, 1):
         top_branches.append(BranchRanking(
             branch_id=branch.id,
             branch_name=branch.name,
@@ -79,16 +99,11 @@ async def get_admin_dashboard(
             rank=i
         ))
     
-    # Get top users
-    users = db.query(User).filter(User.is_active == True).order_by(
-        User.total_points.desc()
-    ).limit(10).all()
-    
     top_users = []
-    for i, user in enumerate(users, 1):
+    for i, user in enumerate(users_result, 1):
         top_users.append(UserRanking(
             user_id=user.id,
-            user_name=user.full_name,
+            user_name=f"{user.first_name} {user.last_name}",
             total_points=user.total_points,
             total_recycled_items=user.total_recycled_items,
             carbon_footprint_reduced=user.carbon_footprint_reduced,
@@ -173,8 +188,8 @@ async def get_admin_dashboard(
 
 @router.get("/stats/environmental")
 async def get_environmental_stats(
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
+    db: AsyncSession = Depends(get_async_read_db),
     days: int = 30
 ):
     """Get detailed environmental impact statistics"""
@@ -182,9 +197,12 @@ async def get_environmental_stats(
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
     # Query recycling events in the period
-    events = db.query(RecyclingEvent).filter(
-        RecyclingEvent.created_at >= cutoff_date
-    ).all()
+    result = await db.execute(
+        select(RecyclingEvent)
+        .options(selectinload(RecyclingEvent.items).selectinload(RecyclingItem.waste_type))
+        .where(RecyclingEvent.created_at >= cutoff_date)
+    )
+    events = result.scalars().all()
     
     total_events = len(events)
     total_weight = sum(event.total_weight_recycled for event in events)
@@ -229,14 +247,18 @@ async def get_environmental_stats(
 
 @router.get("/stats/users")
 async def get_user_statistics(
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get user engagement and activity statistics"""
     
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    verified_users = db.query(User).filter(User.is_verified == True).count()
+    total_users = await db.scalar(select(func.count(User.id)))
+    active_users = await db.scalar(
+        select(func.count(User.id)).where(User.is_active == True)
+    )
+    verified_users = await db.scalar(
+        select(func.count(User.id)).where(User.is_verified == True)
+    )
     
     # Users by registration date (last 6 months)
     monthly_registrations = []
@@ -244,10 +266,12 @@ async def get_user_statistics(
         month_start = (datetime.utcnow() - timedelta(days=30 * (i + 1))).replace(day=1)
         month_end = (datetime.utcnow() - timedelta(days=30 * i)).replace(day=1)
         
-        count = db.query(User).filter(
-            User.created_at >= month_start,
-            User.created_at < month_end
-        ).count()
+        count = await db.scalar(
+            select(func.count(User.id)).where(
+                User.created_at >= month_start,
+                User.created_at < month_end
+            )
+        )
         
         monthly_registrations.append({
             "month": month_start.strftime("%Y-%m"),
@@ -255,9 +279,12 @@ async def get_user_statistics(
         })
     
     # Top users by points
-    top_users = db.query(User).filter(User.is_active == True).order_by(
-        User.total_points.desc()
-    ).limit(20).all()
+    result = await db.execute(
+        select(User).where(User.is_active == True).order_by(
+            User.total_points.desc()
+        ).limit(20)
+    )
+    top_users = result.scalars().all()
     
     user_rankings = []
     for i, user in enumerate(top_users, 1):
@@ -283,24 +310,29 @@ async def get_user_statistics(
 
 @router.get("/stats/branches")
 async def get_branch_statistics(
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get branch performance statistics"""
     
-    branches = db.query(Branch).filter(Branch.is_active == True).all()
+    result = await db.execute(select(Branch).where(Branch.is_active == True))
+    branches = result.scalars().all()
     
     branch_stats = []
     for branch in branches:
         # Count events for this branch
-        events_count = db.query(RecyclingEvent).filter(
-            RecyclingEvent.branch_id == branch.id
-        ).count()
+        events_count = await db.scalar(
+            select(func.count(RecyclingEvent.id)).where(
+                RecyclingEvent.branch_id == branch.id
+            )
+        )
         
         # Count unique users
-        unique_users = db.query(RecyclingEvent.user_id).filter(
-            RecyclingEvent.branch_id == branch.id
-        ).distinct().count()
+        unique_users = await db.scalar(
+            select(func.count(distinct(RecyclingEvent.user_id))).where(
+                RecyclingEvent.branch_id == branch.id
+            )
+        )
         
         branch_stats.append({
             "branch_id": branch.id,
@@ -320,3 +352,32 @@ async def get_branch_statistics(
         "total_branches": len(branch_stats),
         "branch_rankings": branch_stats
     }
+
+
+@router.get("/sql-profile")
+async def get_sql_profile(
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
+    top_statements: int = Query(10, ge=1, le=MAX_STATEMENTS_PER_ENDPOINT)
+):
+    """SQL statement counts and time per endpoint, and recent slow queries (this worker)"""
+    return profiler.report(top_statements)
+
+
+@router.get("/sql-profile/export")
+async def export_sql_profile(
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims)
+):
+    """Download the full SQL profile of this worker as JSON"""
+    return JSONResponse(
+        profiler.report(MAX_STATEMENTS_PER_ENDPOINT),
+        headers={"Content-Disposition": 'attachment; filename="sql-profile.json"'}
+    )
+
+
+@router.delete("/sql-profile")
+async def reset_sql_profile(
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims)
+):
+    """Start a new SQL profile window"""
+    profiler.reset()
+    return {"message": "SQL profile reset"}
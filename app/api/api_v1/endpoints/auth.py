@@ -1,30 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+from typing import Optional
 from loguru import logger
 
 from app.core.config import settings
 from app.core.security import (
     authenticate_user, 
+    authorization_claims,
     create_access_token, 
     create_refresh_token,
-    verify_token,
-    get_password_hash
+    decode_token,
+    verify_unrevoked_token,
+    get_password_hash_async
 )
-from app.db.session import get_db
+from app.core.token_revocation import revoke_token
+from app.db.session import get_async_db
 from app.models.user import User
 from app.schemas.auth import (
     LoginRequest, 
     LoginResponse, 
     RefreshTokenRequest, 
     RefreshTokenResponse,
+    LogoutRequest,
     RegisterRequest,
     RegisterResponse,
     AuthResponse
 )
 from app.schemas.user import UserInDB
-from app.core.exceptions import AuthenticationError, ValidationError
+from app.core.exceptions import AuthenticationError, ValidationError, ServiceUnavailableError
 
 router = APIRouter()
 security = HTTPBearer()
@@ -33,12 +39,13 @@ security = HTTPBearer()
 @router.post("/register", response_model=RegisterResponse)
 async def register(
     user_data: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register a new user"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User.id).where(User.email == user_data.email))
+    existing_user = result.first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,7 +53,7 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     new_user = User(
         email=user_data.email,
@@ -59,8 +66,7 @@ async def register(
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     logger.info(f"New user registered: {new_user.email}")
     
@@ -74,12 +80,12 @@ async def register(
 @router.post("/login", response_model=LoginResponse)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Authenticate user and return tokens"""
     
     # Authenticate user
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise AuthenticationError("Incorrect email or password")
     
@@ -92,7 +98,8 @@ async def login(
     
     access_token = create_access_token(
         subject=user.id, 
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        claims=authorization_claims(user)
     )
     refresh_token = create_refresh_token(
         subject=user.id,
@@ -102,7 +109,7 @@ async def login(
     # Update last login
     from datetime import datetime
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     logger.info(f"User logged in: {user.email}")
     
@@ -124,17 +131,18 @@ async def login(
 @router.post("/refresh", response_model=RefreshTokenResponse)
 async def refresh_token(
     refresh_data: RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Refresh access token using refresh token"""
     
     # Verify refresh token
-    user_id = verify_token(refresh_data.refresh_token, "refresh")
-    if not user_id:
+    claims = await verify_unrevoked_token(refresh_data.refresh_token, "refresh")
+    if not claims:
         raise AuthenticationError("Invalid refresh token")
+    user_id = claims["sub"]
     
     # Check if user exists and is active
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, int(user_id))
     if not user or not user.is_active:
         raise AuthenticationError("User not found or inactive")
     
@@ -142,7 +150,8 @@ async def refresh_token(
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         subject=user.id,
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        claims=authorization_claims(user)
     )
     
     return RefreshTokenResponse(
@@ -153,8 +162,35 @@ async def refresh_token(
 
 
 @router.post("/logout", response_model=AuthResponse)
-async def logout():
-    """Logout user (client should remove tokens)"""
+async def logout(
+    logout_data: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Logout user, revoking the access token and the refresh token if one is sent"""
+    claims = await verify_unrevoked_token(credentials.credentials, "access")
+    if claims is None:
+        raise AuthenticationError("Invalid authentication credentials")
+    
+    tokens = [claims]
+    if logout_data is not None and logout_data.refresh_token:
+        refresh_claims = decode_token(logout_data.refresh_token)
+        # Only the caller's own refresh token can be revoked
+        if (
+            refresh_claims is not None
+            and refresh_claims.get("sub") == claims["sub"]
+            and refresh_claims.get("type") == "refresh"
+        ):
+            tokens.append(refresh_claims)
+    
+    try:
+        for token_claims in tokens:
+            await revoke_token(token_claims.get("jti"), token_claims["exp"])
+    except Exception as e:
+        logger.error(f"Token revocation failed: {str(e)}")
+        raise ServiceUnavailableError("Could not log out, please retry shortly")
+    
+    logger.info(f"User logged out: {claims['sub']}")
+    
     return AuthResponse(
         success=True,
         message="Logged out successfully"
@@ -164,7 +200,7 @@ async def logout():
 @router.post("/verify-email", response_model=AuthResponse)
 async def verify_email(
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Verify user email with token"""
     # TODO: Implement email verification logic
@@ -182,10 +218,11 @@ async def verify_email(
 @router.post("/forgot-password", response_model=AuthResponse)
 async def forgot_password(
     email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send password reset email"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User.id).where(User.email == email))
+    user = result.first()
     if not user:
         # Don't reveal if email exists or not
         return AuthResponse(
@@ -1,32 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from loguru import logger
 
 from app.core.security import get_current_active_user
-from app.db.session import get_db
+from app.db.session import get_async_read_db
+from app.db.pagination import Keyset, set_next_cursor
 from app.models.user import User
 from app.models.branch import Branch
 from app.schemas.branch import Branch as BranchSchema, BranchList, BranchStats
 
 router = APIRouter()
 
+# Alphabetical, the id breaks ties between branches with the same name
+BRANCH_LIST_ORDER = Keyset(Branch.name, Branch.id, descending=False)
+
 
 @router.get("/", response_model=List[BranchList])
 async def get_branches(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     city: str = None
 ):
-    """Get list of active branches"""
+    """Get list of active branches, pass the X-Next-Cursor header back as cursor for the next page"""
     
-    query = db.query(Branch).filter(Branch.is_active == True)
+    query = select(Branch).where(Branch.is_active == True)
     
     if city:
-        query = query.filter(Branch.city.ilike(f"%{city}%"))
+        query = query.where(Branch.city.ilike(f"%{city}%"))
     
-    branches = query.order_by(Branch.name).offset(offset).limit(limit).all()
+    result = await db.execute(BRANCH_LIST_ORDER.paginate(query, cursor, offset, limit))
+    branches = result.scalars().all()
+    set_next_cursor(response, BRANCH_LIST_ORDER.next_cursor(branches, limit))
+    branches = branches[:limit]
     
     result = []
     for branch in branches:
@@ -46,11 +56,11 @@ async def get_branches(
 @router.get("/{branch_id}", response_model=BranchSchema)
 async def get_branch_details(
     branch_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed information about a specific branch"""
     
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    branch = await db.get(Branch, branch_id)
     
     if not branch:
         raise HTTPException(
@@ -64,11 +74,11 @@ async def get_branch_details(
 @router.get("/{branch_id}/stats", response_model=BranchStats)
 async def get_branch_stats(
     branch_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get environmental statistics for a specific branch"""
     
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    branch = await db.get(Branch, branch_id)
     
     if not branch:
         raise HTTPException(
@@ -82,10 +92,12 @@ async def get_branch_stats(
     
     current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    monthly_count = db.query(RecyclingEvent).filter(
-        RecyclingEvent.branch_id == branch_id,
-        RecyclingEvent.created_at >= current_month_start
-    ).count()
+    monthly_count = await db.scalar(
+        select(func.count(RecyclingEvent.id)).where(
+            RecyclingEvent.branch_id == branch_id,
+            RecyclingEvent.created_at >= current_month_start
+        )
+    )
     
     # Get most recycled categories (mock data for now)
     most_recycled_categories = [
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
 from loguru import logger
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
 
-from app.core.security import get_current_active_user
-from app.db.session import get_db
-from app.models.user import User
+from app.core.config import settings
+from app.core.security import get_current_active_principal
+from app.core.principal_cache import Principal
+from app.db.session import get_async_db, get_async_read_db
+from app.db.pagination import Keyset, set_next_cursor
 from app.models.purchase import Purchase, PurchaseItem
 from app.models.branch import Branch
 from app.models.waste_type import WasteType
@@ -15,30 +21,43 @@ from app.schemas.purchase import (
     PurchaseCreate,
     PurchaseResponse,
     QRCodeResponse,
-    PurchaseList
+    PurchaseList,
+    QRBatchRequest,
+    QRBatchOutput
 )
-from app.services.qr_service import generate_qr_code
+from app.services.qr_service import (
+    get_qr_image,
+    qr_cache_key,
+    stream_qr_zip,
+    render_qr_sheet,
+    QR_MEDIA_TYPES
+)
+from app.services.qr_token import encode_purchase_token
 from app.core.exceptions import NotFoundError, ValidationError
 
 router = APIRouter()
 
+# Newest first, the id breaks ties between purchases created in the same instant
+HISTORY_ORDER = Keyset(Purchase.created_at, Purchase.id)
+
 
 @router.post("/", response_model=PurchaseResponse)
 async def create_purchase(
     purchase_data: PurchaseCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new purchase and generate QR code"""
     
     # Validate branch exists
-    branch = db.query(Branch).filter(Branch.id == purchase_data.branch_id).first()
+    branch = await db.get(Branch, purchase_data.branch_id)
     if not branch:
         raise NotFoundError("Branch not found")
     
     # Validate waste types for items
     waste_type_ids = [item.waste_type_id for item in purchase_data.items]
-    waste_types = db.query(WasteType).filter(WasteType.id.in_(waste_type_ids)).all()
+    result = await db.execute(select(WasteType).where(WasteType.id.in_(waste_type_ids)))
+    waste_types = result.scalars().all()
     waste_type_dict = {wt.id: wt for wt in waste_types}
     
     if len(waste_types) != len(waste_type_ids):
@@ -47,50 +66,40 @@ async def create_purchase(
     # Generate unique purchase code
     purchase_code = f"ECO-{uuid.uuid4().hex[:8].upper()}"
     
-    # Create purchase
-    purchase = Purchase(
-        purchase_code=purchase_code,
-        user_id=current_user.id,
-        branch_id=purchase_data.branch_id,
-        total_amount=purchase_data.total_amount,
-        currency=purchase_data.currency,
-        payment_method=purchase_data.payment_method,
-        qr_expires_at=datetime.utcnow() + timedelta(hours=24)  # QR expires in 24 hours
-    )
-    
-    db.add(purchase)
-    db.flush()  # Get the purchase ID
-    
     # Create purchase items
-    total_potential_points = 0
-    total_estimated_weight = 0.0
+    purchase_items = []
     
     for item_data in purchase_data.items:
         waste_type = waste_type_dict[item_data.waste_type_id]
         
-        # Calculate potential points
-        potential_points = waste_type.recycling_points * item_data.quantity
-        total_potential_points += potential_points
-        total_estimated_weight += item_data.estimated_weight
-        
-        purchase_item = PurchaseItem(
-            purchase_id=purchase.id,
+        purchase_items.append(PurchaseItem(
             waste_type_id=item_data.waste_type_id,
             name=item_data.name,
             description=item_data.description,
             quantity=item_data.quantity,
             unit_price=item_data.unit_price,
             estimated_weight=item_data.estimated_weight,
-            potential_points=potential_points
-        )
-        
-        db.add(purchase_item)
+            potential_points=waste_type.recycling_points * item_data.quantity
+        ))
+    
+    # Create purchase, items are attached in memory so totals never lazy-load them
+    purchase = Purchase(
+        purchase_code=purchase_code,
+        user_id=current_user.id,
+        branch_id=purchase_data.branch_id,
+        total_amount=purchase_data.total_amount,
+        currency=purchase_data.currency,
+        payment_method=purchase_data.payment_method,
+        qr_expires_at=datetime.utcnow() + timedelta(hours=24),  # QR expires in 24 hours
+        items=purchase_items
+    )
     
     # Update purchase totals
-    purchase.potential_points = total_potential_points
-    purchase.estimated_waste_weight = total_estimated_weight
     purchase.calculate_environmental_impact()
     
+    db.add(purchase)
+    await db.flush()  # Get the purchase ID
+    
     # Generate QR code
     qr_data = {
         "purchase_id": purchase.id,
@@ -105,18 +114,29 @@ async def create_purchase(
                 "waste_type_category": waste_type_dict[item.waste_type_id].category,
                 "bin_color": waste_type_dict[item.waste_type_id].bin_color,
                 "quantity": item.quantity,
-                "points": item.potential_points
+                "points": waste_type_dict[item.waste_type_id].recycling_points * item.quantity
             }
             for item in purchase_data.items
         ]
     }
     
-    qr_code_url = await generate_qr_code(qr_data)
+    # The QR image only carries a short signed token, item details stay in the database
+    qr_data["qr_token"] = encode_purchase_token(purchase.id, current_user.id, purchase.qr_expires_at)
     purchase.set_qr_data(qr_data)
-    purchase.qr_code_url = qr_code_url
     
-    db.commit()
-    db.refresh(purchase)
+    # The image is rendered on first request, not on the purchase write path
+    purchase.qr_code_url = f"{settings.API_V1_STR}/purchases/{purchase.id}/qr.png"
+    
+    await db.commit()
+    
+    # Reload server-generated columns together with the items
+    result = await db.execute(
+        select(Purchase)
+        .options(selectinload(Purchase.items))
+        .where(Purchase.id == purchase.id)
+        .execution_options(populate_existing=True)
+    )
+    purchase = result.scalars().one()
     
     logger.info(f"Purchase created: {purchase_code} for user {current_user.email}")
     
@@ -145,15 +165,18 @@ async def create_purchase(
 @router.get("/{purchase_id}/qr", response_model=QRCodeResponse)
 async def get_purchase_qr(
     purchase_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get QR code for a purchase"""
     
-    purchase = db.query(Purchase).filter(
-        Purchase.id == purchase_id,
-        Purchase.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Purchase).where(
+            Purchase.id == purchase_id,
+            Purchase.user_id == current_user.id
+        )
+    )
+    purchase = result.scalars().first()
     
     if not purchase:
         raise NotFoundError("Purchase not found")
@@ -172,47 +195,195 @@ async def get_purchase_qr(
     )
 
 
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes from the database as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def _purchase_qr_image(
+    purchase_id: int,
+    image_format: str,
+    request: Request,
+    current_user: Principal,
+    db: AsyncSession
+) -> Response:
+    """Render (or serve cached) QR image for a purchase with HTTP caching headers"""
+    
+    result = await db.execute(
+        select(Purchase).where(
+            Purchase.id == purchase_id,
+            Purchase.user_id == current_user.id
+        )
+    )
+    purchase = result.scalars().first()
+    
+    if not purchase or not purchase.qr_payload:
+        raise NotFoundError("Purchase not found")
+    
+    now = datetime.now(timezone.utc)
+    expires_at = _as_utc(purchase.qr_expires_at) if purchase.qr_expires_at else None
+    
+    if expires_at and expires_at < now:
+        raise ValidationError("QR code has expired")
+    
+    if purchase.is_recycled:
+        raise ValidationError("Purchase has already been recycled")
+    
+    # The cache key is a content hash of payload and render parameters,
+    # so it doubles as a strong ETag without rendering anything
+    payload = purchase.qr_payload
+    etag = f'"{qr_cache_key(payload, image_format)}"'
+    headers = {"ETag": etag}
+    
+    if expires_at:
+        max_age = int((expires_at - now).total_seconds())
+        headers["Cache-Control"] = f"private, max-age={max_age}"
+        headers["Expires"] = format_datetime(expires_at, usegmt=True)
+    else:
+        headers["Cache-Control"] = "private, no-cache"
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    _, image = await get_qr_image(payload, image_format)
+    return Response(content=image, media_type=QR_MEDIA_TYPES[image_format], headers=headers)
+
+
+@router.get("/{purchase_id}/qr.png", response_class=Response)
+async def get_purchase_qr_png(
+    purchase_id: int,
+    request: Request,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get QR code image for a purchase as PNG"""
+    return await _purchase_qr_image(purchase_id, "png", request, current_user, db)
+
+
+@router.get("/{purchase_id}/qr.svg", response_class=Response)
+async def get_purchase_qr_svg(
+    purchase_id: int,
+    request: Request,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get QR code image for a purchase as SVG"""
+    return await _purchase_qr_image(purchase_id, "svg", request, current_user, db)
+
+
+@router.post("/qr/batch", response_class=StreamingResponse)
+async def batch_purchase_qr(
+    batch_request: QRBatchRequest,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Re-render QR codes for many purchases as a ZIP archive or a printable sheet"""
+    
+    requested_ids = list(dict.fromkeys(batch_request.purchase_ids))
+    
+    # Ownership, expiry and recycled status are checked in a single query
+    query = select(Purchase).where(
+        Purchase.id.in_(requested_ids),
+        Purchase.qr_code_data.isnot(None),
+        Purchase.is_recycled == False,
+        Purchase.qr_expires_at > datetime.utcnow()
+    )
+    if not current_user.is_admin:
+        query = query.where(Purchase.user_id == current_user.id)
+    
+    result = await db.execute(query)
+    purchases = {purchase.id: purchase for purchase in result.scalars().all()}
+    if not purchases:
+        raise NotFoundError("No valid purchases found for QR reprint")
+    
+    # Resolve everything needed from the session before streaming starts
+    entries = [
+        (purchases[purchase_id].purchase_code, purchases[purchase_id].qr_payload)
+        for purchase_id in requested_ids
+        if purchase_id in purchases
+    ]
+    skipped = [purchase_id for purchase_id in requested_ids if purchase_id not in purchases]
+    headers = {"X-Skipped-Purchase-Ids": ",".join(str(purchase_id) for purchase_id in skipped)}
+    
+    logger.info(
+        f"QR batch reprint: {len(entries)} purchases, {len(skipped)} skipped - "
+        f"User: {current_user.email}"
+    )
+    
+    if batch_request.output == QRBatchOutput.SHEET:
+        sheet = await render_qr_sheet(entries)
+        headers["Content-Disposition"] = 'attachment; filename="qr-sheet.pdf"'
+        return StreamingResponse(iter([sheet]), media_type="application/pdf", headers=headers)
+    
+    headers["Content-Disposition"] = 'attachment; filename="qr-codes.zip"'
+    return StreamingResponse(
+        stream_qr_zip(entries, batch_request.image_format.value),
+        media_type="application/zip",
+        headers=headers
+    )
+
+
 @router.get("/", response_model=List[PurchaseList])
 async def get_user_purchases(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db),
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Get user's purchase history"""
-    
-    purchases = db.query(Purchase).filter(
-        Purchase.user_id == current_user.id
-    ).order_by(Purchase.created_at.desc()).offset(offset).limit(limit).all()
-    
-    result = []
-    for purchase in purchases:
-        result.append(PurchaseList(
-            id=purchase.id,
-            purchase_code=purchase.purchase_code,
-            total_amount=purchase.total_amount,
-            currency=purchase.currency,
-            potential_points=purchase.potential_points,
-            is_recycled=purchase.is_recycled,
-            created_at=purchase.created_at,
-            branch_name=purchase.branch.name
-        ))
+    """Get user's purchase history, pass the X-Next-Cursor header back as cursor for the next page"""
+    
+    # Only the listed columns are selected, the branch name comes from the join
+    query = (
+        select(
+            Purchase.id,
+            Purchase.purchase_code,
+            Purchase.total_amount,
+            Purchase.currency,
+            Purchase.potential_points,
+            Purchase.is_recycled,
+            Purchase.created_at,
+            Branch.name.label("branch_name")
+        )
+        .join(Purchase.branch)
+        .where(Purchase.user_id == current_user.id)
+    )
+    rows = (await db.execute(HISTORY_ORDER.paginate(query, cursor, offset, limit))).all()
     
-    return result
+    set_next_cursor(response, HISTORY_ORDER.next_cursor(rows, limit))
+    return [PurchaseList(**row._mapping) for row in rows[:limit]]
 
 
 @router.get("/{purchase_id}", response_model=PurchaseResponse)
 async def get_purchase_details(
     purchase_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed information about a specific purchase"""
     
-    purchase = db.query(Purchase).filter(
-        Purchase.id == purchase_id,
-        Purchase.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Purchase)
+        .options(
+            joinedload(Purchase.branch),
+            selectinload(Purchase.items).joinedload(PurchaseItem.waste_type)
+        )
+        .where(
+            Purchase.id == purchase_id,
+            Purchase.user_id == current_user.id
+        )
+    )
+    purchase = result.scalars().first()
     
     if not purchase:
         raise NotFoundError("Purchase not found")
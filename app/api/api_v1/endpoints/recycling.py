@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Dict, Any, Optional
 from loguru import logger
 import uuid
 from datetime import datetime, timedelta
 
-from app.core.security import get_current_active_user
-from app.db.session import get_db, get_mongodb
+from app.core.security import get_current_active_user, get_current_active_principal
+from app.core.principal_cache import Principal
+from app.db.session import get_async_db, get_async_read_db
+from app.db.pagination import Keyset, set_next_cursor
 from app.models.user import User
-from app.models.purchase import Purchase
+from app.models.purchase import Purchase, PurchaseItem
 from app.models.recycling import RecyclingEvent, RecyclingItem, RecyclingStatus, ValidationStatus
 from app.models.branch import Branch
 from app.schemas.recycling import (
@@ -21,28 +25,47 @@ from app.schemas.recycling import (
 )
 from app.services.qr_service import validate_qr_code
 from app.services.ai_validation import validate_recycling_classification
+from app.services.event_log import log_event
 from app.core.exceptions import NotFoundError, ValidationError, BusinessLogicError
 
 router = APIRouter()
 
+# Newest first, the id breaks ties between events created in the same instant
+HISTORY_ORDER = Keyset(RecyclingEvent.created_at, RecyclingEvent.id)
+
 
 @router.post("/scan-qr", response_model=QRScanResponse)
 async def scan_qr_code(
     scan_request: ScanQRRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Scan QR code to start recycling process"""
     
     try:
-        # Validate and decode QR code
-        qr_data = await validate_qr_code(scan_request.qr_code_data)
+        # Validate and decode QR code, forged, malformed or expired codes
+        # are rejected here without a database round-trip
+        try:
+            qr_data = await validate_qr_code(scan_request.qr_code_data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        
+        if qr_data['user_id'] != current_user.id:
+            raise NotFoundError("Purchase not found or access denied")
         
         # Verify purchase exists and belongs to user
-        purchase = db.query(Purchase).filter(
-            Purchase.id == qr_data['purchase_id'],
-            Purchase.user_id == current_user.id
-        ).first()
+        result = await db.execute(
+            select(Purchase)
+            .options(
+                joinedload(Purchase.branch),
+                selectinload(Purchase.items).joinedload(PurchaseItem.waste_type)
+            )
+            .where(
+                Purchase.id == qr_data['purchase_id'],
+                Purchase.user_id == current_user.id
+            )
+        )
+        purchase = result.scalars().first()
         
         if not purchase:
             raise NotFoundError("Purchase not found or access denied")
@@ -70,7 +93,7 @@ async def scan_qr_code(
         )
         
         db.add(recycling_event)
-        db.flush()
+        await db.flush()
         
         # Create recycling items based on purchase items
         items_to_recycle = []
@@ -95,11 +118,10 @@ async def scan_qr_code(
                 "potential_points": purchase_item.potential_points
             })
         
-        db.commit()
+        await db.commit()
         
-        # Log to MongoDB
-        mongo_db = get_mongodb()
-        await mongo_db.recycling_events.insert_one({
+        # Log to MongoDB, written in the background
+        await log_event("recycling_events", {
             "recycling_event_id": recycling_event.id,
             "event_code": event_code,
             "user_id": current_user.id,
@@ -136,15 +158,24 @@ async def scan_qr_code(
 async def validate_recycling(
     validation_request: ValidateRecyclingRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Validate recycling classification using AI"""
     
     # Get recycling event
-    recycling_event = db.query(RecyclingEvent).filter(
-        RecyclingEvent.id == validation_request.recycling_event_id,
-        RecyclingEvent.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(RecyclingEvent)
+        .options(
+            joinedload(RecyclingEvent.purchase),
+            joinedload(RecyclingEvent.branch),
+            selectinload(RecyclingEvent.items).joinedload(RecyclingItem.waste_type)
+        )
+        .where(
+            RecyclingEvent.id == validation_request.recycling_event_id,
+            RecyclingEvent.user_id == current_user.id
+        )
+    )
+    recycling_event = result.scalars().first()
     
     if not recycling_event:
         raise NotFoundError("Recycling event not found")
@@ -156,7 +187,7 @@ async def validate_recycling(
         # Update status to in progress
         recycling_event.status = RecyclingStatus.IN_PROGRESS
         recycling_event.validation_started_at = datetime.utcnow()
-        db.commit()
+        await db.commit()
         
         # Call AI validation service
         ai_result = await validate_recycling_classification(
@@ -235,11 +266,10 @@ async def validate_recycling(
         branch = recycling_event.branch
         branch.update_recycling_stats(correct_classifications, recycling_event.carbon_footprint_reduced)
         
-        db.commit()
+        await db.commit()
         
-        # Log to MongoDB
-        mongo_db = get_mongodb()
-        await mongo_db.ai_validations.insert_one({
+        # Log to MongoDB, written in the background
+        await log_event("ai_validations", {
             "validation_id": ai_result.get("validation_id"),
             "recycling_event_id": recycling_event.id,
             "user_id": current_user.id,
@@ -278,7 +308,7 @@ async def validate_recycling(
         # Rollback status on error
         recycling_event.status = RecyclingStatus.FAILED
         recycling_event.validation_status = ValidationStatus.REJECTED
-        db.commit()
+        await db.commit()
         
         logger.error(f"Recycling validation failed: {str(e)}")
         raise
@@ -286,45 +316,57 @@ async def validate_recycling(
 
 @router.get("/history", response_model=List[RecyclingEventList])
 async def get_recycling_history(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db),
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Get user's recycling history"""
+    """Get user's recycling history, pass the X-Next-Cursor header back as cursor for the next page"""
     
-    events = db.query(RecyclingEvent).filter(
-        RecyclingEvent.user_id == current_user.id
-    ).order_by(RecyclingEvent.created_at.desc()).offset(offset).limit(limit).all()
-    
-    result = []
-    for event in events:
-        result.append(RecyclingEventList(
-            id=event.id,
-            event_code=event.event_code,
-            status=event.status,
-            points_earned=event.points_earned,
-            accuracy_score=event.accuracy_score,
-            created_at=event.created_at,
-            purchase_code=event.purchase.purchase_code,
-            branch_name=event.branch.name
-        ))
+    # Only the listed columns are selected, purchase code and branch name come from joins
+    query = (
+        select(
+            RecyclingEvent.id,
+            RecyclingEvent.event_code,
+            RecyclingEvent.status,
+            RecyclingEvent.points_earned,
+            RecyclingEvent.accuracy_score,
+            RecyclingEvent.created_at,
+            Purchase.purchase_code,
+            Branch.name.label("branch_name")
+        )
+        .join(RecyclingEvent.purchase)
+        .join(RecyclingEvent.branch)
+        .where(RecyclingEvent.user_id == current_user.id)
+    )
+    rows = (await db.execute(HISTORY_ORDER.paginate(query, cursor, offset, limit))).all()
     
-    return result
+    set_next_cursor(response, HISTORY_ORDER.next_cursor(rows, limit))
+    return [RecyclingEventList(**row._mapping) for row in rows[:limit]]
 
 
 @router.get("/{event_id}", response_model=RecyclingEventResponse)
 async def get_recycling_event_details(
     event_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed information about a recycling event"""
     
-    event = db.query(RecyclingEvent).filter(
-        RecyclingEvent.id == event_id,
-        RecyclingEvent.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(RecyclingEvent)
+        .options(
+            joinedload(RecyclingEvent.purchase),
+            selectinload(RecyclingEvent.items).joinedload(RecyclingItem.waste_type)
+        )
+        .where(
+            RecyclingEvent.id == event_id,
+            RecyclingEvent.user_id == current_user.id
+        )
+    )
+    event = result.scalars().first()
     
     if not event:
         raise NotFoundError("Recycling event not found")
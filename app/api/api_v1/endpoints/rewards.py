@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
 from loguru import logger
 import uuid
 from datetime import datetime, timedelta
 
-from app.core.security import get_current_active_user
-from app.db.session import get_db
+from app.core.security import get_current_active_user, get_current_active_principal
+from app.core.principal_cache import Principal
+from app.db.session import get_async_db, get_async_read_db
+from app.db.pagination import Keyset, set_next_cursor
 from app.models.user import User
 from app.models.reward import Reward, UserReward, RewardStatus, UserRewardStatus
 from app.schemas.reward import (
@@ -21,10 +25,13 @@ from app.core.exceptions import NotFoundError, ValidationError, BusinessLogicErr
 
 router = APIRouter()
 
+# Newest redemptions first, the id breaks ties
+USER_REWARDS_ORDER = Keyset(UserReward.created_at, UserReward.id)
+
 
 @router.get("/", response_model=List[RewardList])
 async def get_rewards_catalog(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     category: str = None,
     min_points: int = None,
     max_points: int = None,
@@ -33,18 +40,21 @@ async def get_rewards_catalog(
 ):
     """Get available rewards catalog"""
     
-    query = db.query(Reward).filter(Reward.status == RewardStatus.ACTIVE)
+    query = select(Reward).where(Reward.status == RewardStatus.ACTIVE)
     
     if category:
-        query = query.filter(Reward.category.ilike(f"%{category}%"))
+        query = query.where(Reward.category.ilike(f"%{category}%"))
     
     if min_points is not None:
-        query = query.filter(Reward.points_required >= min_points)
+        query = query.where(Reward.points_required >= min_points)
     
     if max_points is not None:
-        query = query.filter(Reward.points_required <= max_points)
+        query = query.where(Reward.points_required <= max_points)
     
-    rewards = query.order_by(Reward.popularity_score.desc()).offset(offset).limit(limit).all()
+    result = await db.execute(
+        query.order_by(Reward.popularity_score.desc()).offset(offset).limit(limit)
+    )
+    rewards = result.scalars().all()
     
     result = []
     for reward in rewards:
@@ -66,11 +76,11 @@ async def get_rewards_catalog(
 @router.get("/{reward_id}", response_model=RewardSchema)
 async def get_reward_details(
     reward_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed information about a specific reward"""
     
-    reward = db.query(Reward).filter(Reward.id == reward_id).first()
+    reward = await db.get(Reward, reward_id)
     
     if not reward:
         raise NotFoundError("Reward not found")
@@ -82,12 +92,12 @@ async def get_reward_details(
 async def redeem_reward(
     redeem_request: RedeemRewardRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Redeem a reward using points"""
     
     # Get reward
-    reward = db.query(Reward).filter(Reward.id == redeem_request.reward_id).first()
+    reward = await db.get(Reward, redeem_request.reward_id)
     
     if not reward:
         raise NotFoundError("Reward not found")
@@ -100,10 +110,12 @@ async def redeem_reward(
         raise ValidationError("Insufficient points to redeem this reward")
     
     # Check usage limit per user
-    user_redemptions = db.query(UserReward).filter(
-        UserReward.user_id == current_user.id,
-        UserReward.reward_id == reward.id
-    ).count()
+    user_redemptions = await db.scalar(
+        select(func.count(UserReward.id)).where(
+            UserReward.user_id == current_user.id,
+            UserReward.reward_id == reward.id
+        )
+    )
     
     if user_redemptions >= reward.usage_limit_per_user:
         raise BusinessLogicError("You have reached the maximum redemptions for this reward")
@@ -126,7 +138,7 @@ async def redeem_reward(
     )
     
     db.add(user_reward)
-    db.flush()
+    await db.flush()
     
     # Generate QR code for redemption
     qr_data = {
@@ -145,8 +157,8 @@ async def redeem_reward(
     # Update reward statistics
     reward.redeem()
     
-    db.commit()
-    db.refresh(user_reward)
+    await db.commit()
+    await db.refresh(user_reward)
     
     logger.info(
         f"Reward redeemed: {redemption_code} - "
@@ -172,23 +184,29 @@ async def redeem_reward(
 
 @router.get("/user/my-rewards", response_model=List[UserRewardList])
 async def get_user_rewards(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db),
     status_filter: UserRewardStatus = None,
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Get user's redeemed rewards"""
+    """Get user's redeemed rewards, pass the X-Next-Cursor header back as cursor for the next page"""
     
-    query = db.query(UserReward).filter(UserReward.user_id == current_user.id)
+    # Only the reward columns shown in the list are joined in, not the whole reward
+    query = select(UserReward, Reward.name, Reward.type).join(UserReward.reward).where(
+        UserReward.user_id == current_user.id
+    )
     
     if status_filter:
-        query = query.filter(UserReward.status == status_filter)
+        query = query.where(UserReward.status == status_filter)
     
-    user_rewards = query.order_by(UserReward.created_at.desc()).offset(offset).limit(limit).all()
+    rows = (await db.execute(USER_REWARDS_ORDER.paginate(query, cursor, offset, limit))).all()
+    set_next_cursor(response, USER_REWARDS_ORDER.next_cursor([row.UserReward for row in rows], limit))
     
     result = []
-    for user_reward in user_rewards:
+    for user_reward, reward_name, reward_type in rows[:limit]:
         result.append(UserRewardList(
             id=user_reward.id,
             redemption_code=user_reward.redemption_code,
@@ -196,8 +214,8 @@ async def get_user_rewards(
             points_spent=user_reward.points_spent,
             expires_at=user_reward.expires_at,
             created_at=user_reward.created_at,
-            reward_name=user_reward.reward.name,
-            reward_type=user_reward.reward.type,
+            reward_name=reward_name,
+            reward_type=reward_type,
             is_valid=user_reward.is_valid
         ))
     
@@ -207,15 +225,18 @@ async def get_user_rewards(
 @router.get("/user/my-rewards/{reward_id}", response_model=UserRewardResponse)
 async def get_user_reward_details(
     reward_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed information about a user's specific reward"""
     
-    user_reward = db.query(UserReward).filter(
-        UserReward.id == reward_id,
-        UserReward.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(UserReward).options(joinedload(UserReward.reward)).where(
+            UserReward.id == reward_id,
+            UserReward.user_id == current_user.id
+        )
+    )
+    user_reward = result.scalars().first()
     
     if not user_reward:
         raise NotFoundError("User reward not found")
@@ -239,16 +260,19 @@ async def get_user_reward_details(
 @router.post("/user/my-rewards/{reward_id}/use")
 async def use_reward(
     reward_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db),
     branch_id: int = None
 ):
     """Mark a reward as used (typically called by branch staff)"""
     
-    user_reward = db.query(UserReward).filter(
-        UserReward.id == reward_id,
-        UserReward.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(UserReward).where(
+            UserReward.id == reward_id,
+            UserReward.user_id == current_user.id
+        )
+    )
+    user_reward = result.scalars().first()
     
     if not user_reward:
         raise NotFoundError("User reward not found")
@@ -261,7 +285,7 @@ async def use_reward(
     
     # Mark as used
     user_reward.use_reward(branch_id)
-    db.commit()
+    await db.commit()
     
     logger.info(f"Reward used: {user_reward.redemption_code} by user {current_user.email}")
     
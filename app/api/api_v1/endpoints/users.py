@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 from loguru import logger
 
-from app.core.security import get_current_active_user, get_current_admin_user
-from app.db.session import get_db
+from app.core.security import get_current_active_user, get_current_active_principal, get_current_admin_claims
+from app.core.token_revocation import record_authz_version
+from app.core.principal_cache import Principal, invalidate_principal
+from app.db.session import get_async_db, get_async_read_db
+from app.db.pagination import Keyset, set_next_cursor
 from app.models.user import User
 from app.models.purchase import Purchase
+from app.models.branch import Branch
 from app.models.recycling import RecyclingEvent
 from app.schemas.user import (
     User as UserSchema,
@@ -14,29 +19,34 @@ from app.schemas.user import (
     UserUpdate,
     UserStats,
     PasswordChange,
-    UserList
+    UserList,
+    UserAccessUpdate
 )
 from app.schemas.purchase import PurchaseList
-from app.core.exceptions import NotFoundError, ValidationError
+from app.core.exceptions import NotFoundError, ValidationError, ServiceUnavailableError
 
 router = APIRouter()
 
+# Newest first, the id breaks ties between rows created in the same instant
+PURCHASE_HISTORY_ORDER = Keyset(Purchase.created_at, Purchase.id)
+USER_LIST_ORDER = Keyset(User.created_at, User.id)
+
 
 @router.get("/profile", response_model=UserProfile)
 async def get_user_profile(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user's profile with statistics"""
     
     # Get recent activity counts
-    recent_purchases = db.query(Purchase).filter(
-        Purchase.user_id == current_user.id
-    ).count()
+    recent_purchases = await db.scalar(
+        select(func.count(Purchase.id)).where(Purchase.user_id == current_user.id)
+    )
     
-    recent_recycling = db.query(RecyclingEvent).filter(
-        RecyclingEvent.user_id == current_user.id
-    ).count()
+    recent_recycling = await db.scalar(
+        select(func.count(RecyclingEvent.id)).where(RecyclingEvent.user_id == current_user.id)
+    )
     
     # Create response with additional data
     profile_data = {
@@ -54,7 +64,7 @@ async def get_user_profile(
 async def update_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user's profile"""
     
@@ -64,8 +74,9 @@ async def update_user_profile(
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    await invalidate_principal(current_user.id)
     
     logger.info(f"User profile updated: {current_user.email}")
     
@@ -82,19 +93,20 @@ async def update_user_profile(
 async def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Change user password"""
     
-    from app.core.security import verify_password, get_password_hash
+    from app.core.security import verify_password_async, get_password_hash_async
     
     # Verify current password
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise ValidationError("Current password is incorrect")
     
     # Update password
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    await db.commit()
+    await invalidate_principal(current_user.id)
     
     logger.info(f"Password changed for user: {current_user.email}")
     
@@ -116,19 +128,21 @@ async def get_user_points(
 @router.get("/stats", response_model=UserStats)
 async def get_user_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed user environmental statistics"""
     
     # Calculate recycling accuracy rate
-    total_recycling = db.query(RecyclingEvent).filter(
-        RecyclingEvent.user_id == current_user.id
-    ).count()
+    total_recycling = await db.scalar(
+        select(func.count(RecyclingEvent.id)).where(RecyclingEvent.user_id == current_user.id)
+    )
     
-    successful_recycling = db.query(RecyclingEvent).filter(
-        RecyclingEvent.user_id == current_user.id,
-        RecyclingEvent.points_earned > 0
-    ).count()
+    successful_recycling = await db.scalar(
+        select(func.count(RecyclingEvent.id)).where(
+            RecyclingEvent.user_id == current_user.id,
+            RecyclingEvent.points_earned > 0
+        )
+    )
     
     accuracy_rate = (successful_recycling / total_recycling * 100) if total_recycling > 0 else 0
     
@@ -136,10 +150,12 @@ async def get_user_stats(
     from datetime import datetime, timedelta
     current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    monthly_count = db.query(RecyclingEvent).filter(
-        RecyclingEvent.user_id == current_user.id,
-        RecyclingEvent.created_at >= current_month_start
-    ).count()
+    monthly_count = await db.scalar(
+        select(func.count(RecyclingEvent.id)).where(
+            RecyclingEvent.user_id == current_user.id,
+            RecyclingEvent.created_at >= current_month_start
+        )
+    )
     
     return UserStats(
         total_points=current_user.total_points,
@@ -154,54 +170,62 @@ async def get_user_stats(
 
 @router.get("/purchases", response_model=List[PurchaseList])
 async def get_user_purchases(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db),
     limit: int = Query(20, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None)
 ):
-    """Get user's purchase history"""
-    
-    purchases = db.query(Purchase).filter(
-        Purchase.user_id == current_user.id
-    ).order_by(Purchase.created_at.desc()).offset(offset).limit(limit).all()
-    
-    result = []
-    for purchase in purchases:
-        result.append(PurchaseList(
-            id=purchase.id,
-            purchase_code=purchase.purchase_code,
-            total_amount=purchase.total_amount,
-            currency=purchase.currency,
-            potential_points=purchase.potential_points,
-            is_recycled=purchase.is_recycled,
-            created_at=purchase.created_at,
-            branch_name=purchase.branch.name
-        ))
+    """Get user's purchase history, pass the X-Next-Cursor header back as cursor for the next page"""
+    
+    # Only the listed columns are selected, the branch name comes from the join
+    query = (
+        select(
+            Purchase.id,
+            Purchase.purchase_code,
+            Purchase.total_amount,
+            Purchase.currency,
+            Purchase.potential_points,
+            Purchase.is_recycled,
+            Purchase.created_at,
+            Branch.name.label("branch_name")
+        )
+        .join(Purchase.branch)
+        .where(Purchase.user_id == current_user.id)
+    )
+    rows = (await db.execute(PURCHASE_HISTORY_ORDER.paginate(query, cursor, offset, limit))).all()
     
-    return result
+    set_next_cursor(response, PURCHASE_HISTORY_ORDER.next_cursor(rows, limit))
+    return [PurchaseList(**row._mapping) for row in rows[:limit]]
 
 
 # Admin endpoints
 @router.get("/", response_model=List[UserList])
 async def list_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims),
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     search: Optional[str] = Query(None)
 ):
     """List all users (admin only)"""
     
-    query = db.query(User)
+    query = select(User)
     
     if search:
-        query = query.filter(
-            User.email.ilike(f"%{search}%") |
-            User.first_name.ilike(f"%{search}%") |
+        query = query.where(or_(
+            User.email.ilike(f"%{search}%"),
+            User.first_name.ilike(f"%{search}%"),
             User.last_name.ilike(f"%{search}%")
-        )
+        ))
     
-    users = query.order_by(User.created_at.desc()).offset(offset).limit(limit).all()
+    result = await db.execute(USER_LIST_ORDER.paginate(query, cursor, offset, limit))
+    users = result.scalars().all()
+    set_next_cursor(response, USER_LIST_ORDER.next_cursor(users, limit))
+    users = users[:limit]
     
     result = []
     for user in users:
@@ -222,12 +246,12 @@ async def list_users(
 @router.get("/{user_id}", response_model=UserProfile)
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims)
 ):
     """Get user by ID (admin only)"""
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise NotFoundError("User not found")
     
@@ -237,3 +261,47 @@ async def get_user_by_id(
     }
     
     return UserProfile(**profile_data)
+
+
+@router.put("/{user_id}/access", response_model=UserProfile)
+async def update_user_access(
+    user_id: int,
+    access_update: UserAccessUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: Dict[str, Any] = Depends(get_current_admin_claims)
+):
+    """Change a user's role or activation (admin only), refusing the user's older access tokens"""
+    
+    user = await db.get(User, user_id)
+    if not user:
+        raise NotFoundError("User not found")
+    
+    update_data = access_update.dict(exclude_unset=True, exclude_none=True)
+    changed = {field: value for field, value in update_data.items() if getattr(user, field) != value}
+    if changed:
+        for field, value in changed.items():
+            setattr(user, field, value)
+        user.authz_version = (user.authz_version or 0) + 1
+        
+        # Tokens issued before carry the old role and status claims. Recorded
+        # before the commit: if Redis is down nothing changes and the admin
+        # retries, rather than the change landing while old tokens stay valid
+        try:
+            await record_authz_version(user.id, user.authz_version)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Recording access change of user {user_id} failed: {str(e)}")
+            raise ServiceUnavailableError("Could not change user access, please retry shortly")
+        
+        await db.commit()
+        await db.refresh(user)
+        await invalidate_principal(user.id)
+        
+        logger.info(f"User access changed: {user.email} {changed} by admin {current_admin['sub']}")
+    
+    profile_data = {
+        **user.__dict__,
+        "full_name": user.full_name,
+    }
+    
+    return UserProfile(**profile_data)
@@ -1,4 +1,5 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Optional, List, Dict
 from pydantic_settings import BaseSettings
 from pydantic import validator
 import os
@@ -26,6 +27,21 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
     ALGORITHM: str = "HS256"
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost, pick with scripts/calibrate_bcrypt.py; older hashes are upgraded on login
+    PASSWORD_HASH_BUDGET_MS: float = 250.0  # Target time for one hash, used by the calibration script
+    PASSWORD_HASH_MAX_WORKERS: Optional[int] = None  # None = min(4, number of CPUs)
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Queued + running hashes before requests get 503
+    TOKEN_CACHE_MAX_ITEMS: int = 10000  # Decoded JWTs kept per worker, 0 disables the cache
+    TOKEN_REVOCATION_ENABLED: bool = True  # Logout revokes tokens and role changes outdate them, through Redis
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 5.0  # How often workers pull new revocations into their Bloom filter
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000  # Revoked tokens per filter before it is rebuilt
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001  # Share of unrevoked tokens that still need a Redis lookup
+    
+    # Authenticated principal cache (id, email and flags of the token's user)
+    PRINCIPAL_CACHE_MAX_ITEMS: int = 10000  # Per worker, 0 disables the in-process tier
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 10.0  # Bounds how long other workers see a changed user
+    PRINCIPAL_CACHE_REDIS: bool = False  # Share principals between workers through REDIS_URL
+    PRINCIPAL_CACHE_REDIS_TTL_SECONDS: int = 300
     
     # Database URLs
     POSTGRES_SERVER: str
@@ -34,11 +50,40 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     
+    # Connection pools (per engine, per worker process)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: int = 300  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_REQUIRE_CURRENT_SCHEMA: bool = False  # Refuse to start when migrations are pending
+    
+    # SQL profiling (per endpoint statement counts and time, slow query log)
+    SQL_PROFILER_ENABLED: bool = True
+    SQL_SLOW_QUERY_MS: int = 200
+    SQL_SLOW_QUERY_LOG_SIZE: int = 100  # Most recent slow statements kept per worker
+    SQL_SLOW_QUERY_EXPLAIN: bool = False  # Store the PostgreSQL plan of slow SELECTs
+    SQL_QUERY_COUNT_HEADER: bool = False  # Send X-DB-Query-Count on responses, for development only
+    
+    # Read replicas ("host" or "host:port", same database and credentials as the primary)
+    POSTGRES_REPLICA_SERVERS: List[str] = []
+    READ_YOUR_WRITES_SECONDS: int = 5  # Reads stay on the primary this long after a write
+    
     MONGODB_URL: str
     MONGODB_DB: str = "ecorewards_logs"
     
+    # Buffered MongoDB event logging
+    EVENT_LOG_QUEUE_SIZE: int = 10000  # Events held in memory per worker
+    EVENT_LOG_BATCH_SIZE: int = 500  # Flush as soon as this many are buffered
+    EVENT_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENT_LOG_OVERFLOW_POLICY: str = "drop_oldest"  # "block", "drop_oldest" or "spill"
+    EVENT_LOG_BLOCK_TIMEOUT_SECONDS: float = 1.0  # "block" drops the event after waiting this long
+    EVENT_LOG_SPILL_PATH: str = "./spill/mongo_events.jsonl"
+    EVENT_LOG_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+    
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
     
     # External Services
     QR_SERVICE_URL: str = "http://localhost:8000"
@@ -48,6 +93,24 @@ class Settings(BaseSettings):
     UPLOAD_FOLDER: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
     
+    # QR Rendering
+    QR_RENDER_EXECUTOR: str = "process"  # "process" or "thread"
+    QR_RENDER_MAX_WORKERS: Optional[int] = None  # None = number of CPUs
+    QR_CACHE_MAX_ITEMS: int = 1024
+    QR_CACHE_MAX_BYTES: int = 33554432  # 32MB
+    QR_SIGNING_KEY: Optional[str] = None  # Defaults to a key derived from SECRET_KEY
+    QR_SIGNING_KEYS: Dict[int, str] = {}  # Key id -> secret, all accepted for verification
+    QR_SIGNING_ACTIVE_KEY_ID: Optional[int] = None  # Key used for new tokens, defaults to highest id
+    QR_ACCEPT_LEGACY_PAYLOADS: bool = False  # Unsigned JSON payloads issued before QR tokens, for the transition only
+    QR_LEGACY_ACCEPT_UNTIL: Optional[datetime] = None  # Cutoff for legacy payloads (UTC), 24h after deploying tokens
+    QR_MAX_PAYLOAD_BYTES: int = 4096  # Larger than any QR code can hold
+    
+    # Expired QR artifact garbage collection
+    QR_GC_ENABLED: bool = True
+    QR_GC_INTERVAL_SECONDS: int = 3600
+    QR_GC_BATCH_SIZE: int = 200
+    QR_GC_MAX_DELETES_PER_SECOND: int = 100
+    
     # Email Configuration
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: int = 587
@@ -59,9 +122,12 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
     
-    # Rate Limiting
-    RATE_LIMIT_PER_MINUTE: int = 60
-    RATE_LIMIT_BURST: int = 10
+    # Rate Limiting (token bucket per user, or per address before login)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 60  # Refill rate
+    RATE_LIMIT_BURST: int = 10  # Bucket size
+    RATE_LIMIT_SYNC_SECONDS: float = 1.0  # How often workers reconcile their buckets through Redis
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, float] = {}  # "METHOD /api/v1/route" -> cost, overrides the defaults
     
     # Environment
     ENVIRONMENT: str = "development"
@@ -93,6 +159,18 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
     
+    @property
+    def ASYNC_DATABASE_REPLICA_URLS(self) -> List[str]:
+        """Construct async PostgreSQL URLs for the read replicas"""
+        urls = []
+        for server in self.POSTGRES_REPLICA_SERVERS:
+            host, _, port = server.partition(":")
+            urls.append(
+                f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+                f"@{host}:{port or self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+            )
+        return urls
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from loguru import logger
+import math
 import traceback
 from typing import Union
 
@@ -58,6 +59,21 @@ class ExternalServiceError(EcoRewardsException):
         super().__init__(message, 502)
 
 
+class ServiceUnavailableError(EcoRewardsException):
+    """Server is temporarily overloaded"""
+    
+    def __init__(self, message: str = "Service temporarily unavailable"):
+        super().__init__(message, 503)
+
+
+class RateLimitError(EcoRewardsException):
+    """Client exceeded its request rate"""
+    
+    def __init__(self, retry_after: float, message: str = "Too many requests, please slow down"):
+        super().__init__(message, 429)
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
 def setup_exception_handlers(app: FastAPI):
     """Setup global exception handlers for the FastAPI app"""
     
@@ -71,7 +87,8 @@ def setup_exception_handlers(app: FastAPI):
                 "message": exc.message,
                 "type": exc.__class__.__name__,
                 "path": request.url.path
-            }
+            },
+            headers=getattr(exc, "headers", None)
         )
     
     @app.exception_handler(HTTPException)
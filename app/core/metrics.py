@@ -0,0 +1,141 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Dict
+
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Summary:
+    """Count, sum, max and recent percentiles of observed values"""
+
+    def __init__(self, window: int = 1024):
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+            self._recent.append(value)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, maximum = self._count, self._sum, self._max
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+        return {
+            "count": count,
+            "sum": total,
+            "avg": total / count if count else 0.0,
+            "max": maximum,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99)
+        }
+
+
+class MetricsRegistry:
+    """In-process registry of named metrics and collector callbacks"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str) -> Counter:
+        """Get or create a counter"""
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        """Get or create a gauge"""
+        return self._get_or_create(name, Gauge)
+
+    def summary(self, name: str) -> Summary:
+        """Get or create a summary"""
+        return self._get_or_create(name, Summary)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]):
+        """Register a callback evaluated on every snapshot"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current values of all metrics"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            collectors = dict(self._collectors)
+
+        data = {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+        for name, collector in sorted(collectors.items()):
+            data[name] = collector()
+        return data
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
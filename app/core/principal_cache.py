@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from pydantic import BaseModel, ConfigDict
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+
+REDIS_KEY_PREFIX = "principal:"
+
+principal_cache_hits = metrics.counter("principal_cache.hits")
+principal_cache_redis_hits = metrics.counter("principal_cache.redis_hits")
+principal_cache_misses = metrics.counter("principal_cache.misses")
+principal_cache_redis_errors = metrics.counter("principal_cache.redis_errors")
+
+
+class Principal(BaseModel):
+    """The authenticated user as far as authorization needs it"""
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    is_verified: bool
+
+
+class PrincipalCache:
+    """TTL'd in-process LRU of principals keyed by user id, optionally backed by Redis"""
+
+    def __init__(self, max_items: int, ttl: float, redis_ttl: float = 0, redis_client=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self._redis = redis_client
+        self._entries: "OrderedDict[int, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def _put_local(self, principal: Principal):
+        if self.max_items <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(principal.id, None)
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> Optional[Principal]:
+        principal = self._get_local(user_id)
+        if principal is not None:
+            principal_cache_hits.inc()
+            return principal
+
+        if self._redis is not None:
+            try:
+                data = await self._redis.get(f"{REDIS_KEY_PREFIX}{user_id}")
+            except Exception as e:
+                principal_cache_redis_errors.inc()
+                logger.warning(f"Principal cache Redis read failed: {str(e)}")
+                data = None
+            if data is not None:
+                principal = Principal.model_validate_json(data)
+                self._put_local(principal)
+                principal_cache_redis_hits.inc()
+                return principal
+
+        principal_cache_misses.inc()
+        return None
+
+    async def put(self, principal: Principal):
+        self._put_local(principal)
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    f"{REDIS_KEY_PREFIX}{principal.id}",
+                    principal.model_dump_json(),
+                    ex=max(1, int(self.redis_ttl))
+                )
+            except Exception as e:
+                principal_cache_redis_errors.inc()
+                logger.warning(f"Principal cache Redis write failed: {str(e)}")
+
+    async def invalidate(self, user_id: int):
+        """Forget a user, call after changing anything a Principal holds or the password"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(f"{REDIS_KEY_PREFIX}{user_id}")
+            except Exception as e:
+                # Other workers keep the entry until it expires
+                principal_cache_redis_errors.inc()
+                logger.error(f"Principal cache Redis invalidation failed for user {user_id}: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._entries),
+            "max_items": self.max_items,
+            "ttl_seconds": self.ttl,
+            "redis": self._redis is not None
+        }
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_MAX_ITEMS,
+    settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+    get_redis() if settings.PRINCIPAL_CACHE_REDIS else None
+)
+metrics.register_collector("principal_cache.memory", principal_cache.stats)
+
+
+async def invalidate_principal(user_id: int):
+    """Drop a user's cached principal after a profile, password or activation change"""
+    await principal_cache.invalidate(user_id)
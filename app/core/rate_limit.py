@@ -0,0 +1,287 @@
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from fastapi import Request
+from loguru import logger
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitError
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+from app.core.security import decode_token
+
+
+BUCKET_KEY_PREFIX = "rate_limit:"
+
+# Buckets reconciled per script call
+SYNC_BATCH_SIZE = 200
+
+# Adds this worker's consumption to each shared bucket and returns what is
+# left. Redis' clock refills the buckets, so worker clocks do not matter.
+# KEYS: bucket keys, ARGV: rate per second, capacity, ttl ms, then the
+# tokens consumed per key since the last reconciliation
+RECONCILE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local remaining = {}
+for i, key in ipairs(KEYS) do
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+    tokens = math.max(-capacity, tokens - tonumber(ARGV[3 + i]))
+    redis.call('HSET', key, 'tokens', tokens, 'updated_at', now)
+    redis.call('PEXPIRE', key, ttl)
+    remaining[i] = tostring(tokens)
+end
+return remaining
+"""
+
+# Relative cost of a request by "METHOD route", everything else costs 1.
+# Costs reflect the work behind a route: bcrypt, AI validation, QR rendering.
+DEFAULT_ROUTE_COSTS: Dict[str, float] = {
+    "POST /auth/login": 3,
+    "POST /auth/register": 3,
+    "POST /auth/forgot-password": 3,
+    "POST /recycling/scan-qr": 3,
+    "POST /recycling/validate": 10,
+    "POST /ai/validate-classification": 5,
+    "POST /ai/analyze-image": 5,
+    "POST /ai/batch-validate": 10,
+    "POST /purchases/": 2,
+    "POST /purchases/qr/batch": 5,
+    "POST /rewards/redeem": 2,
+}
+
+requests_allowed = metrics.counter("rate_limit.allowed")
+requests_rejected = metrics.counter("rate_limit.rejected")
+sync_failures = metrics.counter("rate_limit.sync_failures")
+sync_seconds = metrics.summary("rate_limit.sync_seconds")
+
+
+def route_costs() -> Dict[str, float]:
+    """Cost table keyed by method and full route path, settings override the defaults"""
+    costs = {}
+    for endpoint, cost in DEFAULT_ROUTE_COSTS.items():
+        method, path = endpoint.split(" ", 1)
+        costs[f"{method} {settings.API_V1_STR}{path}"] = cost
+    costs.update(settings.RATE_LIMIT_ROUTE_COSTS)
+    return costs
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "pending")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+        self.pending = 0.0  # Consumed since the last reconciliation
+
+
+# Requests never wait on Redis; the price is that between reconciliations
+# each worker can hand out at most one extra burst per client
+class RateLimiter:
+    """Token buckets per client held in memory and reconciled with Redis in the background"""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: float,
+        sync_interval: float = 1.0,
+        redis_client=None
+    ):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.sync_interval = sync_interval
+        self._redis = redis_client
+        self._script = None
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self):
+        return self._redis if self._redis is not None else get_redis()
+
+    def _refill(self, bucket: _Bucket, now: float):
+        bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated_at) * self.rate)
+        bucket.updated_at = now
+
+    def acquire(self, key: str, cost: float = 1) -> float:
+        """Take cost tokens from a client's bucket, returns 0 or the seconds to wait before retrying"""
+        # A request costing more than the burst is allowed from a full bucket
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(self.capacity, now)
+            else:
+                self._refill(bucket, now)
+
+            if bucket.tokens < cost:
+                return (cost - bucket.tokens) / self.rate
+            bucket.tokens -= cost
+            bucket.pending += cost
+            return 0.0
+
+    def _take_pending(self) -> List[Tuple[str, float]]:
+        """Consumption to reconcile, forgetting buckets that refilled and are idle"""
+        now = time.monotonic()
+        pending = []
+        with self._lock:
+            for key, bucket in list(self._buckets.items()):
+                if bucket.pending:
+                    pending.append((key, bucket.pending))
+                    bucket.pending = 0.0
+                else:
+                    self._refill(bucket, now)
+                    if bucket.tokens >= self.capacity:
+                        del self._buckets[key]
+        return pending
+
+    async def sync(self):
+        """Push this worker's consumption to Redis and adopt the shared bucket levels"""
+        pending = self._take_pending()
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        if self._script is None:
+            self._script = self.redis.register_script(RECONCILE_SCRIPT)
+        ttl_ms = max(1000, math.ceil(2 * self.capacity / self.rate * 1000))
+
+        for index in range(0, len(pending), SYNC_BATCH_SIZE):
+            batch = pending[index:index + SYNC_BATCH_SIZE]
+            try:
+                remaining = await self._script(
+                    keys=[f"{BUCKET_KEY_PREFIX}{key}" for key, _ in batch],
+                    args=[self.rate, self.capacity, ttl_ms, *(consumed for _, consumed in batch)]
+                )
+            except Exception:
+                # Keep the consumption for the next attempt
+                with self._lock:
+                    for key, consumed in pending[index:]:
+                        bucket = self._buckets.get(key)
+                        if bucket is not None:
+                            bucket.pending += consumed
+                raise
+
+            now = time.monotonic()
+            with self._lock:
+                for (key, _), tokens in zip(batch, remaining):
+                    bucket = self._buckets.get(key)
+                    if bucket is None:
+                        continue
+                    # Whatever was consumed here while the script ran is not in Redis yet
+                    bucket.tokens = min(self.capacity, float(tokens) - bucket.pending)
+                    bucket.updated_at = now
+
+        sync_seconds.observe(time.perf_counter() - start)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                sync_failures.inc()
+                logger.warning(f"Rate limit reconciliation failed, limits are per worker until Redis is back: {str(e)}")
+
+    def start(self):
+        """Start reconciling in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "buckets": len(self._buckets),
+            "rate_per_second": self.rate,
+            "burst": self.capacity
+        }
+
+
+_limiter: Optional[RateLimiter] = None
+_route_costs: Optional[Dict[str, float]] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter configured from settings"""
+    global _limiter
+
+    if _limiter is None:
+        _limiter = RateLimiter(
+            settings.RATE_LIMIT_PER_MINUTE,
+            settings.RATE_LIMIT_BURST,
+            settings.RATE_LIMIT_SYNC_SECONDS
+        )
+    return _limiter
+
+
+def client_key(request: Request) -> str:
+    """Authenticated user id when the request carries a valid token, else the client address"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # Verified tokens are cached, the auth dependency reuses the result
+        claims = decode_token(token)
+        if claims is not None and claims.get("sub") is not None:
+            return f"user:{claims['sub']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def enforce_rate_limit(request: Request):
+    """Charge the request's route cost to its client, 429 when the bucket is empty"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+
+    global _route_costs
+    if _route_costs is None:
+        _route_costs = route_costs()
+
+    route = request.scope.get("route")
+    cost = _route_costs.get(f"{request.method} {getattr(route, 'path', request.url.path)}", 1)
+    retry_after = get_rate_limiter().acquire(client_key(request), cost)
+    if retry_after:
+        requests_rejected.inc()
+        raise RateLimitError(retry_after)
+    requests_allowed.inc()
+
+
+def start_rate_limit_sync():
+    """Start reconciling this worker's buckets with Redis"""
+    if settings.RATE_LIMIT_ENABLED:
+        get_rate_limiter().start()
+        logger.info(
+            f"Rate limiter started ({settings.RATE_LIMIT_PER_MINUTE}/min, burst {settings.RATE_LIMIT_BURST}, "
+            f"reconciled every {settings.RATE_LIMIT_SYNC_SECONDS}s)"
+        )
+
+
+async def stop_rate_limit_sync():
+    """Stop reconciling, unsynced consumption is dropped"""
+    if _limiter is not None:
+        await _limiter.stop()
+
+
+def _rate_limit_stats():
+    return _limiter.stats() if _limiter is not None else {}
+
+
+metrics.register_collector("rate_limit.buckets", _rate_limit_stats)
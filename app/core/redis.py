@@ -0,0 +1,34 @@
+import threading
+from typing import Optional
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+
+_redis: Optional[redis.Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """Get (lazily creating) the shared Redis client, connections are opened on first command"""
+    global _redis
+
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                _redis = redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS
+                )
+    return _redis
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis
+
+    with _redis_lock:
+        client, _redis = _redis, None
+    if client is not None:
+        await client.aclose()
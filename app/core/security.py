@@ -1,19 +1,35 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from typing import Callable, Dict, Optional, Tuple, Union, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_db
-from app.models.user import User as UserModel
-from app.core.exceptions import AuthenticationError, AuthorizationError
+from app.core.metrics import metrics
+from app.core.principal_cache import Principal, principal_cache
+from app.core.token_revocation import are_authz_claims_trusted, is_token_revoked, is_token_outdated
+from app.db.session import get_async_db
+from app.models.user import User as UserModel, UserRole, UserStatus
+from app.core.exceptions import AuthenticationError, AuthorizationError, ServiceUnavailableError
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing, hashes with another cost are flagged by needs_update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Calibration never recommends a cost below this
+BCRYPT_MIN_ROUNDS = 10
 
 # JWT token scheme
 security = HTTPBearer()
@@ -29,11 +45,152 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, also returning a new hash when the stored one uses another cost"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def measure_bcrypt_rounds(rounds: int, samples: int = 3) -> float:
+    """Median seconds to hash a password at a bcrypt cost on this machine"""
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("CalibrationPassword123")
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate_bcrypt_rounds(
+    budget_ms: float,
+    min_rounds: int = BCRYPT_MIN_ROUNDS,
+    max_rounds: int = 16,
+    samples: int = 3
+) -> Tuple[int, Dict[int, float]]:
+    """Highest bcrypt cost hashing within the budget, with the milliseconds measured per cost"""
+    timings: Dict[int, float] = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = measure_bcrypt_rounds(rounds, samples) * 1000
+        if timings[rounds] > budget_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+# Password hashing executor: bcrypt releases the GIL, so a few threads keep
+# hashing off the event loop while the pending limit sheds login bursts
+_password_executor: Optional[ThreadPoolExecutor] = None
+_password_executor_lock = threading.Lock()
+_password_pending = 0
+
+password_queue_depth = metrics.gauge("password_hash.queue_depth")
+password_wait_time = metrics.summary("password_hash.wait_seconds")
+password_hash_time = metrics.summary("password_hash.latency_seconds")
+password_rejections = metrics.counter("password_hash.rejected")
+password_rehashes = metrics.counter("password_hash.rehashed")
+
+
+def _password_workers() -> int:
+    """Number of password hashing threads configured in settings"""
+    return settings.PASSWORD_HASH_MAX_WORKERS or min(4, os.cpu_count() or 1)
+
+
+def get_password_executor() -> ThreadPoolExecutor:
+    """Get (lazily creating) the shared password hashing executor"""
+    global _password_executor
+    
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                _password_executor = ThreadPoolExecutor(
+                    max_workers=_password_workers(),
+                    thread_name_prefix="password-hash"
+                )
+    return _password_executor
+
+
+def shutdown_password_executor():
+    """Shut down the password hashing executor"""
+    global _password_executor
+    
+    with _password_executor_lock:
+        executor, _password_executor = _password_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _timed(func: Callable[..., Any], submitted_at: float, *args) -> Any:
+    started_at = time.perf_counter()
+    password_wait_time.observe(started_at - submitted_at)
+    try:
+        return func(*args)
+    finally:
+        password_hash_time.observe(time.perf_counter() - started_at)
+
+
+async def run_password_job(func: Callable[..., Any], *args) -> Any:
+    """Run a bcrypt operation on the password executor, rejecting work beyond the pending limit"""
+    global _password_pending
+    
+    with _password_executor_lock:
+        if _password_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            password_rejections.inc()
+            raise ServiceUnavailableError("Too many authentication requests, please retry shortly")
+        _password_pending += 1
+        password_queue_depth.set(_password_pending)
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), _timed, func, time.perf_counter(), *args)
+    finally:
+        with _password_executor_lock:
+            _password_pending -= 1
+            password_queue_depth.set(_password_pending)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await run_password_job(get_password_hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and compute any rehash without blocking the event loop"""
+    return await run_password_job(verify_and_update_password, plain_password, hashed_password)
+
+
+def _password_executor_info() -> Dict[str, Any]:
+    """Password executor configuration for metrics"""
+    return {
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "max_workers": _password_workers(),
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING
+    }
+
+
+metrics.register_collector("password_hash.executor", _password_executor_info)
+
+
+def authorization_claims(user: UserModel) -> Dict[str, Any]:
+    """Role and status claims for a user's access tokens, valid while authz_version is unchanged"""
+    return {
+        "role": user.role.value,
+        "status": user.status.value,
+        "ver": user.authz_version or 0
+    }
+
+
 def create_access_token(
     subject: Union[str, Any], 
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[Dict[str, Any]] = None
 ) -> str:
-    """Create JWT access token"""
+    """Create JWT access token, with extra claims such as authorization_claims(user)"""
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -41,7 +198,7 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access", "jti": uuid.uuid4().hex}
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.SECRET_KEY, 
@@ -62,7 +219,7 @@ def create_refresh_token(
             minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
+    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh", "jti": uuid.uuid4().hex}
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.SECRET_KEY, 
@@ -71,40 +228,215 @@ def create_refresh_token(
     return encoded_jwt
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[str]:
-    """Verify JWT token and return subject"""
+# Verified access tokens are sent many times during their life, this keeps
+# their claims so repeated requests skip the signature check
+token_cache_hits = metrics.counter("token_cache.hits")
+token_cache_misses = metrics.counter("token_cache.misses")
+
+# Verified JWT payload: sub, type, exp (unix timestamp), jti and, on access
+# tokens, the authorization claims. Shared through the cache, do not modify.
+DecodedToken = Dict[str, Any]
+
+
+class DecodedTokenCache:
+    """Bounded LRU of decoded JWTs keyed by token digest, entries are dropped once the token expires"""
+    
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._entries: "OrderedDict[bytes, DecodedToken]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+    
+    def get(self, token: str) -> Optional[DecodedToken]:
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims["exp"] <= time.time():
+                del self._entries[key]
+                claims = None
+            if claims is not None:
+                self._entries.move_to_end(key)
+        
+        if claims is None:
+            token_cache_misses.inc()
+        else:
+            token_cache_hits.inc()
+        return claims
+    
+    def put(self, token: str, claims: DecodedToken):
+        if self.max_items <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._entries),
+            "max_items": self.max_items
+        }
+
+
+decoded_token_cache = DecodedTokenCache(settings.TOKEN_CACHE_MAX_ITEMS)
+metrics.register_collector("token_cache.memory", decoded_token_cache.stats)
+
+
+def decode_token(token: str) -> Optional[DecodedToken]:
+    """Claims of a validly signed, unexpired JWT, from the cache when it was seen before"""
+    claims = decoded_token_cache.get(token)
+    if claims is not None:
+        return claims
+    
     try:
         payload = jwt.decode(
             token, 
             settings.SECRET_KEY, 
             algorithms=[settings.ALGORITHM]
         )
-        user_id: str = payload.get("sub")
-        token_type_check: str = payload.get("type")
-        
-        if user_id is None or token_type_check != token_type:
-            return None
-        
-        return user_id
     except JWTError:
         return None
+    
+    # Tokens without an expiry cannot be dropped from the cache in time
+    if isinstance(payload.get("exp"), (int, float)):
+        decoded_token_cache.put(token, payload)
+    return payload
 
 
-async def get_current_user(
+def verify_token(token: str, token_type: str = "access") -> Optional[str]:
+    """Verify JWT token and return subject"""
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    
+    user_id = claims.get("sub")
+    if user_id is None or claims.get("type") != token_type:
+        return None
+    
+    return user_id
+
+
+async def verify_unrevoked_token(token: str, token_type: str = "access") -> Optional[DecodedToken]:
+    """Verify JWT token and return its claims, None when it is invalid, revoked or its role claims are outdated"""
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    
+    user_id = claims.get("sub")
+    if user_id is None or claims.get("type") != token_type:
+        return None
+    
+    if is_token_outdated(user_id, claims.get("ver")) or await is_token_revoked(claims.get("jti")):
+        return None
+    
+    return claims
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Load the columns of a Principal, without the rest of the user row"""
+    result = await db.execute(
+        select(
+            UserModel.id,
+            UserModel.email,
+            UserModel.is_active,
+            UserModel.is_admin,
+            UserModel.is_verified
+        ).where(UserModel.id == user_id)
+    )
+    row = result.first()
+    return Principal(**row._mapping) if row is not None else None
+
+
+async def resolve_principal(db: AsyncSession, user_id: int) -> Principal:
+    """Principal of a user id taken from a verified token, from the cache when possible"""
+    principal = await principal_cache.get(user_id)
+    if principal is None:
+        principal = await load_principal(db, user_id)
+        if principal is None:
+            raise AuthenticationError("User not found")
+        await principal_cache.put(principal)
+    return principal
+
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> UserModel:
-    """Get current authenticated user"""
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Get current authenticated principal, from the cache when possible"""
     token = credentials.credentials
-    user_id = verify_token(token, "access")
+    claims = await verify_unrevoked_token(token, "access")
     
-    if user_id is None:
+    if claims is None:
         raise AuthenticationError("Invalid authentication credentials")
     
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    principal = await resolve_principal(db, int(claims["sub"]))
+    if not principal.is_active:
+        raise AuthenticationError("Inactive user")
+    
+    return principal
+
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """Get current active principal"""
+    if not principal.is_active:
+        raise AuthenticationError("Inactive user")
+    return principal
+
+
+async def get_current_claims(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> DecodedToken:
+    """Get the verified claims of the current access token, without loading the user"""
+    claims = await verify_unrevoked_token(credentials.credentials, "access")
+    if claims is None:
+        raise AuthenticationError("Invalid authentication credentials")
+    return claims
+
+
+async def get_current_admin_claims(
+    claims: DecodedToken = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db)
+) -> DecodedToken:
+    """Authorize an admin from the token's role and status claims, without touching the database once synced"""
+    if "role" in claims and are_authz_claims_trusted():
+        is_active = claims.get("status") == UserStatus.ACTIVE.value
+        is_admin = claims["role"] == UserRole.ADMIN.value
+    else:
+        # Tokens issued before authorization claims, or claims this worker cannot
+        # check for role changes (revocation disabled or not synced), use the principal
+        principal = await resolve_principal(db, int(claims["sub"]))
+        is_active, is_admin = principal.is_active, principal.is_admin
+    
+    if not is_active:
+        raise AuthenticationError("Inactive user")
+    if not is_admin:
+        raise AuthorizationError("Admin access required")
+    return claims
+
+
+async def get_current_user(
+    claims: DecodedToken = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_async_db)
+) -> UserModel:
+    """Get current authenticated user as a full ORM object, for endpoints that need more than the principal"""
+    # The row is loaded anyway, so this skips the principal lookup and refreshes the cached one
+    user = await db.get(UserModel, int(claims["sub"]))
     if user is None:
+        await principal_cache.invalidate(int(claims["sub"]))
         raise AuthenticationError("User not found")
     
+    await principal_cache.put(Principal.model_validate(user))
     if not user.is_active:
         raise AuthenticationError("Inactive user")
     
@@ -129,11 +461,17 @@ async def get_current_admin_user(
     return current_user
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[UserModel]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[UserModel]:
     """Authenticate user with email and password"""
-    user = db.query(UserModel).filter(UserModel.email == email).first()
+    result = await db.execute(select(UserModel).where(UserModel.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash is not None:
+        # Stored with an older cost, saved by the caller's commit
+        user.hashed_password = new_hash
+        password_rehashes.inc()
     return user
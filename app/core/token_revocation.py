@@ -0,0 +1,306 @@
+import asyncio
+import hashlib
+import math
+import time
+from typing import Dict, Optional, Union
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+
+# revoked_token:<jti> exists until the token would have expired anyway,
+# revoked_tokens scores each jti by when it was revoked so workers can
+# fetch only what is new since their last sync
+REVOKED_TOKEN_PREFIX = "revoked_token:"
+REVOKED_TOKENS_LOG = "revoked_tokens"
+# "<user id>:<authz version>" scored by when the user's role or status changed,
+# access tokens carrying an older version are refused
+AUTHZ_VERSIONS_LOG = "authz_versions"
+
+# Re-read this much before the newest entry seen, in case another worker's
+# clock is behind and its revocation landed just before ours in the log
+SYNC_OVERLAP_SECONDS = 60
+
+revocations = metrics.counter("token_revocation.revoked")
+bloom_negatives = metrics.counter("token_revocation.bloom_negatives")
+bloom_positives = metrics.counter("token_revocation.bloom_positives")
+redis_checks = metrics.counter("token_revocation.redis_checks")
+redis_errors = metrics.counter("token_revocation.redis_errors")
+sync_failures = metrics.counter("token_revocation.sync_failures")
+sync_seconds = metrics.summary("token_revocation.sync_seconds")
+rebuilds = metrics.counter("token_revocation.rebuilds")
+capacity_exceeded = metrics.counter("token_revocation.capacity_exceeded")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings, about error_rate false positives once it holds capacity items"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Two halves of one digest combined into hash_count positions (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+class TokenRevocationList:
+    """Revoked token ids in Redis, mirrored per worker in a Bloom filter so tokens that were never revoked are checked in memory"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        sync_interval: float = 5.0,
+        retention_seconds: float = 7 * 24 * 3600
+    ):
+        self._redis = redis_client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.retention_seconds = retention_seconds
+
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._authz_versions: Dict[str, int] = {}  # User id -> oldest authorization version still valid
+        self._synced_until: Optional[float] = None  # Revocation time of the newest entry seen
+        self._last_sync: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self):
+        return self._redis if self._redis is not None else get_redis()
+
+    @property
+    def is_fresh(self) -> bool:
+        """Whether the filter reflects Redis as of a few sync intervals ago"""
+        return self._last_sync is not None and time.monotonic() - self._last_sync <= 3 * self.sync_interval
+
+    async def revoke(self, jti: str, expires_at: float):
+        """Revoke a token id until the token's expiry"""
+        now = time.time()
+        ttl = math.ceil(expires_at - now)
+        if ttl <= 0:
+            return
+
+        await self.redis.set(f"{REVOKED_TOKEN_PREFIX}{jti}", 1, ex=ttl)
+        await self.redis.zadd(REVOKED_TOKENS_LOG, {jti: now})
+        self._bloom.add(jti)
+        revocations.inc()
+
+    async def bump_authz_version(self, user_id: Union[int, str], version: int):
+        """Refuse access tokens of a user with an authorization version below this one"""
+        await self.redis.zadd(AUTHZ_VERSIONS_LOG, {f"{user_id}:{version}": time.time()})
+        self._add_authz_version(self._authz_versions, str(user_id), version)
+
+    @staticmethod
+    def _add_authz_version(versions: Dict[str, int], user_id: str, version: int):
+        if version > versions.get(user_id, 0):
+            versions[user_id] = version
+
+    def is_outdated(self, user_id: Union[int, str], version: Optional[int]) -> bool:
+        """Whether a token's authorization claims predate a role or status change"""
+        return version is not None and version < self._authz_versions.get(str(user_id), 0)
+
+    async def _revoked_in_redis(self, jti: str) -> bool:
+        redis_checks.inc()
+        return bool(await self.redis.exists(f"{REVOKED_TOKEN_PREFIX}{jti}"))
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        # Tokens issued before revocation support carry no jti
+        if jti is None:
+            return False
+
+        if not self.is_fresh:
+            # Revocations since the last sync are unknown, ask Redis but
+            # keep serving requests if it is down
+            try:
+                return await self._revoked_in_redis(jti)
+            except Exception as e:
+                redis_errors.inc()
+                logger.warning(f"Token revocation check failed, Bloom filter is stale: {str(e)}")
+                return jti in self._bloom
+
+        if jti not in self._bloom:
+            bloom_negatives.inc()
+            return False
+
+        bloom_positives.inc()
+        try:
+            return await self._revoked_in_redis(jti)
+        except Exception as e:
+            # Most positives are real revocations, refuse the token
+            redis_errors.inc()
+            logger.warning(f"Token revocation check failed, treating token as revoked: {str(e)}")
+            return True
+
+    async def sync(self):
+        """Add revocations made since the last sync, rebuilding the filter when it is full"""
+        start = time.perf_counter()
+        now = time.time()
+        rebuild = self._synced_until is None or self._bloom.count >= self._bloom.capacity
+
+        if rebuild:
+            rebuilds.inc()
+            await self.redis.zremrangebyscore(REVOKED_TOKENS_LOG, "-inf", now - self.retention_seconds)
+            await self.redis.zremrangebyscore(AUTHZ_VERSIONS_LOG, "-inf", now - self.retention_seconds)
+            since = now - self.retention_seconds
+            authz_versions: Dict[str, int] = {}
+        else:
+            since = self._synced_until - SYNC_OVERLAP_SECONDS
+            authz_versions = self._authz_versions
+
+        entries = await self.redis.zrangebyscore(REVOKED_TOKENS_LOG, since, "+inf", withscores=True)
+        if rebuild:
+            # Room for as many again, so a filter rebuilt over a long log is
+            # not full on arrival and rebuilt on every sync
+            capacity = max(self.capacity, 2 * len(entries))
+            if capacity > self.capacity:
+                capacity_exceeded.inc()
+                logger.warning(
+                    f"{len(entries)} live token revocations exceed TOKEN_REVOCATION_BLOOM_CAPACITY "
+                    f"({self.capacity}), sizing the Bloom filter for {capacity}"
+                )
+            bloom = BloomFilter(capacity, self.error_rate)
+        else:
+            bloom = self._bloom
+        for jti, _ in entries:
+            bloom.add(jti.decode() if isinstance(jti, bytes) else jti)
+
+        changes = await self.redis.zrangebyscore(AUTHZ_VERSIONS_LOG, since, "+inf", withscores=True)
+        for change, _ in changes:
+            user_id, _, version = (change.decode() if isinstance(change, bytes) else change).partition(":")
+            self._add_authz_version(authz_versions, user_id, int(version))
+
+        self._bloom = bloom
+        self._authz_versions = authz_versions
+        self._synced_until = max(
+            (changed_at for _, changed_at in entries + changes),
+            default=self._synced_until or now
+        )
+        self._last_sync = time.monotonic()
+        sync_seconds.observe(time.perf_counter() - start)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                sync_failures.inc()
+                logger.error(f"Token revocation sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        """Start syncing in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "bloom_items": self._bloom.count,
+            "bloom_capacity": self._bloom.capacity,
+            "bloom_bits": self._bloom.size,
+            "authz_versions": len(self._authz_versions),
+            "fresh": self.is_fresh
+        }
+
+
+_revocation_list: Optional[TokenRevocationList] = None
+
+
+def get_revocation_list() -> TokenRevocationList:
+    """Process-wide revocation list configured from settings"""
+    global _revocation_list
+
+    if _revocation_list is None:
+        _revocation_list = TokenRevocationList(
+            capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+            error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+            sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+            # Nothing outlives a refresh token
+            retention_seconds=max(settings.ACCESS_TOKEN_EXPIRE_MINUTES, settings.REFRESH_TOKEN_EXPIRE_MINUTES) * 60
+        )
+    return _revocation_list
+
+
+async def revoke_token(jti: Optional[str], expires_at: float):
+    """Revoke a token by id until it expires"""
+    if settings.TOKEN_REVOCATION_ENABLED and jti is not None:
+        await get_revocation_list().revoke(jti, expires_at)
+
+
+async def is_token_revoked(jti: Optional[str]) -> bool:
+    """Whether a token id was revoked, usually answered from memory"""
+    if not settings.TOKEN_REVOCATION_ENABLED:
+        return False
+    return await get_revocation_list().is_revoked(jti)
+
+
+async def record_authz_version(user_id: int, version: int):
+    """Refuse the user's access tokens issued before a role or status change"""
+    if settings.TOKEN_REVOCATION_ENABLED:
+        await get_revocation_list().bump_authz_version(user_id, version)
+
+
+def is_token_outdated(user_id: Union[int, str], version: Optional[int]) -> bool:
+    """Whether a token's role and status claims predate a change, answered from memory"""
+    if not settings.TOKEN_REVOCATION_ENABLED:
+        return False
+    return get_revocation_list().is_outdated(user_id, version)
+
+
+def are_authz_claims_trusted() -> bool:
+    """Whether this worker synced recently enough to know every outdated role and status claim"""
+    return settings.TOKEN_REVOCATION_ENABLED and get_revocation_list().is_fresh
+
+
+def start_token_revocation_sync():
+    """Start keeping this worker's Bloom filter in sync with Redis"""
+    if settings.TOKEN_REVOCATION_ENABLED:
+        get_revocation_list().start()
+        logger.info(f"Token revocation sync started (every {settings.TOKEN_REVOCATION_SYNC_SECONDS}s)")
+
+
+async def stop_token_revocation_sync():
+    """Stop the background revocation sync"""
+    if _revocation_list is not None:
+        await _revocation_list.stop()
+
+
+def _revocation_stats():
+    return _revocation_list.stats() if _revocation_list is not None else {}
+
+
+metrics.register_collector("token_revocation.bloom", _revocation_stats)
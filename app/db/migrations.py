@@ -0,0 +1,117 @@
+import os
+from typing import Optional, Set
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from loguru import logger
+from pymongo import IndexModel
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db.session import get_async_engine, get_sync_mongodb
+
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+# Schema that init_db used to create with create_all
+BASELINE_REVISION = "0001"
+
+# MongoDB indexes per collection, created by the migration command instead of on startup
+MONGODB_INDEXES = {
+    "recycling_events": [
+        [("user_id", 1), ("timestamp", -1)],
+        [("purchase_id", 1)],
+        [("branch_id", 1), ("timestamp", -1)],
+    ],
+    "ai_validations": [
+        [("validation_id", 1)],
+        [("timestamp", -1)],
+        [("accuracy_score", -1)],
+    ],
+    "user_activities": [
+        [("user_id", 1), ("timestamp", -1)],
+        [("activity_type", 1)],
+    ],
+    "environmental_metrics": [
+        [("date", -1)],
+        [("branch_id", 1), ("date", -1)],
+    ],
+    "system_logs": [
+        [("timestamp", -1)],
+        [("level", 1)],
+    ],
+}
+
+
+class SchemaOutdatedError(RuntimeError):
+    """Database schema revision does not match the application's migrations"""
+
+
+def alembic_config(url: Optional[str] = None) -> Config:
+    """Alembic configuration for the project's migrations"""
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    if url:
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    return config
+
+
+def head_revisions(config: Optional[Config] = None) -> Set[str]:
+    """Revisions the code expects the database to be at"""
+    return set(ScriptDirectory.from_config(config or alembic_config()).get_heads())
+
+
+async def current_revisions(engine=None) -> Set[str]:
+    """Revisions recorded in the database, empty when it was never migrated"""
+    async with (engine or get_async_engine()).connect() as connection:
+        try:
+            result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            return set()
+        return set(result.scalars().all())
+
+
+async def check_schema_current(engine=None) -> bool:
+    """Cheap startup check: one query comparing the database revision with the code's heads"""
+    expected = head_revisions()
+    current = await current_revisions(engine)
+    if current == expected:
+        return True
+
+    message = (
+        f"Database schema is at {sorted(current) or 'no revision'}, "
+        f"expected {sorted(expected)}. Run: python scripts/migrate.py"
+    )
+    if settings.DB_REQUIRE_CURRENT_SCHEMA:
+        raise SchemaOutdatedError(message)
+    logger.warning(message)
+    return False
+
+
+def _stamp_unversioned_database(config: Config, url: Optional[str]):
+    """Mark databases created by create_all, before migrations existed, as the baseline"""
+    engine = create_engine(url or settings.DATABASE_URL, poolclass=NullPool)
+    try:
+        tables = set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+    
+    if "users" in tables and "alembic_version" not in tables:
+        logger.info(f"Existing schema without a revision, stamping baseline {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+
+
+def upgrade_database(revision: str = "head", url: Optional[str] = None):
+    """Apply Alembic migrations to the primary database"""
+    config = alembic_config(url)
+    _stamp_unversioned_database(config, url)
+    command.upgrade(config, revision)
+
+
+def create_mongodb_indexes(database=None):
+    """Create MongoDB indexes, existing ones are left untouched"""
+    database = database if database is not None else get_sync_mongodb()
+    for collection_name, indexes in MONGODB_INDEXES.items():
+        database[collection_name].create_indexes([IndexModel(keys) for keys in indexes])
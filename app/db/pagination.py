@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from fastapi import Response
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+from app.core.exceptions import ValidationError
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque token holding the sort key of the last row of a page"""
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, python_types: Sequence[type]) -> List[Any]:
+    """Sort key values from a cursor token, in the given column types"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(python_types):
+            raise ValueError("cursor does not match the sort key")
+        return [
+            datetime.fromisoformat(value) if python_type is datetime else python_type(value)
+            for value, python_type in zip(values, python_types)
+        ]
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid pagination cursor")
+
+
+class Keyset:
+    """Sort order of a listing, ending with a unique column so it is total"""
+
+    def __init__(self, *columns, descending: bool = True):
+        self.columns = columns
+        self.descending = descending
+
+    def paginate(self, query: Select, cursor: Optional[str], offset: int, limit: int) -> Select:
+        """Order and limit a query, starting after the cursor or, without one, at the offset
+
+        One row past the limit is fetched so next_cursor can tell whether another page exists.
+        """
+        query = query.order_by(*[
+            column.desc() if self.descending else column.asc() for column in self.columns
+        ])
+
+        if cursor:
+            values = decode_cursor(cursor, [column.type.python_type for column in self.columns])
+            key = tuple_(*self.columns)
+            query = query.where(key < tuple(values) if self.descending else key > tuple(values))
+        elif offset:
+            query = query.offset(offset)
+
+        return query.limit(limit + 1)
+
+    def next_cursor(self, rows: Sequence[Any], limit: int) -> Optional[str]:
+        """Cursor for the page after these rows, None when paginate found no row past the limit"""
+        if len(rows) <= limit:
+            return None
+        return encode_cursor([getattr(rows[limit - 1], column.key) for column in self.columns])
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    """Expose the next page's cursor, list bodies stay unchanged for existing clients"""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
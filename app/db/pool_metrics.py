@@ -0,0 +1,88 @@
+import time
+from typing import Any, Dict, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from app.core.metrics import metrics
+
+
+def _metric_name(pool_name: str, metric: str) -> str:
+    return f"db.pool.{pool_name}.{metric}"
+
+
+class _TimedCheckoutMixin:
+    """Times how long callers wait for a connection, including waits on an exhausted pool"""
+
+    def _do_get(self):
+        pool_name = self._orig_logging_name or "default"
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.counter(_metric_name(pool_name, "checkout_timeouts")).inc()
+            raise
+        finally:
+            metrics.summary(_metric_name(pool_name, "checkout_wait_seconds")).observe(
+                time.perf_counter() - start
+            )
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool recording checkout wait times"""
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool recording checkout wait times"""
+
+
+def instrument_engine(engine: Union[Engine, AsyncEngine], pool_name: str):
+    """Record connection lifecycle metrics and pool occupancy for an engine"""
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+
+    connects = metrics.counter(_metric_name(pool_name, "connects"))
+    invalidations = metrics.counter(_metric_name(pool_name, "invalidations"))
+    connection_age = metrics.summary(_metric_name(pool_name, "connection_age_seconds"))
+    hold_time = metrics.summary(_metric_name(pool_name, "checkout_hold_seconds"))
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.time()
+        connects.inc()
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        now = time.time()
+        connection_record.info["checked_out_at"] = now
+        connection_age.observe(now - connection_record.info.get("connected_at", now))
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            hold_time.observe(time.time() - checked_out_at)
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        invalidations.inc()
+
+    def collect() -> Dict[str, Any]:
+        # Read the engine's current pool, dispose() replaces it
+        pool = sync_engine.pool
+        if not isinstance(pool, QueuePool):
+            return {"pool_class": type(pool).__name__}
+
+        capacity = pool.size() + pool._max_overflow
+        checked_out = pool.checkedout()
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "saturation": checked_out / capacity if capacity > 0 else 0.0
+        }
+
+    metrics.register_collector(_metric_name(pool_name, "status"), collect)
@@ -0,0 +1,46 @@
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import metrics
+
+
+queries_per_request = metrics.summary("db.queries_per_request")
+
+
+class QueryCounter:
+    """Number of SQL statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+
+
+# Requests share the counter object with tasks and threads spawned for them
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+def start_query_counter() -> QueryCounter:
+    """Start counting statements for the current request"""
+    counter = QueryCounter()
+    _current_counter.set(counter)
+    return counter
+
+
+def finish_query_counter(counter: QueryCounter):
+    """Stop counting and record the request's statement count"""
+    _current_counter.set(None)
+    queries_per_request.observe(counter.count)
+
+
+def current_query_count() -> int:
+    """Statements executed so far in the current request"""
+    counter = _current_counter.get()
+    return counter.count if counter else 0
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+# Statements run outside a request (scripts, background jobs) are grouped here
+UNATTRIBUTED = "(no request)"
+
+# Per endpoint, distinct statements beyond this are folded into one entry
+MAX_STATEMENTS_PER_ENDPOINT = 50
+OTHER_STATEMENTS = "(other statements)"
+
+# The ASGI scope of the request being handled; the router adds the matched
+# route to the same dict, so statements see it once routing has happened
+_current_scope: ContextVar[Optional[dict]] = ContextVar("query_profiler_scope", default=None)
+
+
+def start_query_profile(scope: dict):
+    """Attribute statements executed from now on to the request with this scope"""
+    _current_scope.set(scope)
+
+
+def finish_query_profile():
+    """Stop attributing statements to the current request"""
+    _current_scope.set(None)
+
+
+def current_endpoint() -> str:
+    """Method and route template of the current request, e.g. "GET /api/v1/users/{user_id}" """
+    scope = _current_scope.get()
+    if scope is None:
+        return UNATTRIBUTED
+
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}"
+
+
+def parameters_shape(parameters: Any) -> Any:
+    """Types of the bound parameters, never their values"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"executemany": len(parameters), "rows": parameters_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class _StatementStats:
+    __slots__ = ("count", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "avg_ms": round(self.total_seconds * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3)
+        }
+
+
+class QueryProfiler:
+    """Statement counts and time per endpoint, plus a bounded log of slow statements"""
+
+    def __init__(self, slow_log_size: int = 100):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _StatementStats] = {}
+        self._statements: Dict[str, Dict[str, _StatementStats]] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now(timezone.utc)
+
+    def record(self, endpoint: str, statement: str, seconds: float):
+        with self._lock:
+            self._endpoints.setdefault(endpoint, _StatementStats()).add(seconds)
+
+            statements = self._statements.setdefault(endpoint, {})
+            if statement not in statements and len(statements) >= MAX_STATEMENTS_PER_ENDPOINT:
+                statement = OTHER_STATEMENTS
+            statements.setdefault(statement, _StatementStats()).add(seconds)
+
+    def record_slow(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._slow.append(entry)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._statements.clear()
+            self._slow.clear()
+            self.started_at = datetime.now(timezone.utc)
+
+    def report(self, top_statements: int = 10) -> Dict[str, Any]:
+        """Endpoints by total database time, each with its most expensive statements"""
+        with self._lock:
+            endpoints = []
+            for endpoint, stats in self._endpoints.items():
+                statements = sorted(
+                    self._statements.get(endpoint, {}).items(),
+                    key=lambda item: item[1].total_seconds,
+                    reverse=True
+                )[:top_statements]
+                endpoints.append({
+                    "endpoint": endpoint,
+                    **stats.to_dict(),
+                    "statements": [
+                        {"statement": statement, **statement_stats.to_dict()}
+                        for statement, statement_stats in statements
+                    ]
+                })
+            slow = list(self._slow)
+
+        endpoints.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "since": self.started_at.isoformat(),
+            "slow_query_threshold_ms": settings.SQL_SLOW_QUERY_MS,
+            "endpoints": endpoints,
+            "slow_queries": list(reversed(slow))
+        }
+
+
+profiler = QueryProfiler(settings.SQL_SLOW_QUERY_LOG_SIZE)
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[List[Any]]:
+    """PostgreSQL plan of a slow SELECT, run on a separate cursor of the same connection"""
+    if conn.dialect.name != "postgresql" or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        return cursor.fetchone()[0]
+    except Exception as e:
+        logger.warning(f"EXPLAIN of slow query failed: {str(e)}")
+        return None
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if settings.SQL_PROFILER_ENABLED:
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_timer(exception_context):
+    # Failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is None or exception_context.execution_context is None:
+        return
+    starts = conn.info.get("query_profiler_start")
+    if starts:
+        starts.pop()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_profiler_start")
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+
+    endpoint = current_endpoint()
+    profiler.record(endpoint, statement, seconds)
+
+    if seconds * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "endpoint": endpoint,
+            "duration_ms": round(seconds * 1000, 3),
+            "statement": statement,
+            "parameters": parameters_shape(parameters),
+            "executemany": executemany
+        }
+        if settings.SQL_SLOW_QUERY_EXPLAIN and not executemany:
+            entry["plan"] = _explain(conn, statement, parameters)
+        profiler.record_slow(entry)
+        logger.warning(f"Slow query ({entry['duration_ms']:.1f}ms) - Endpoint: {endpoint} - {statement[:200]}")
@@ -1,53 +1,146 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import Depends, Request, Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, Result
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 import motor.motor_asyncio
 from pymongo import MongoClient
 from loguru import logger
 
 from app.core.config import settings
+from app.db.pool_metrics import (
+    InstrumentedQueuePool,
+    InstrumentedAsyncQueuePool,
+    instrument_engine
+)
 
 
-# PostgreSQL setup
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=10,
-    max_overflow=20
-)
+def _pool_options(pool_name: str) -> dict:
+    """Pool configuration shared by all PostgreSQL engines"""
+    return {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_logging_name": pool_name
+    }
 
-async_engine = create_async_engine(
-    settings.ASYNC_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=10,
-    max_overflow=20
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-AsyncSessionLocal = async_sessionmaker(
-    async_engine, 
-    class_=AsyncSession, 
-    expire_on_commit=False
-)
+def _create_engine(url: str, pool_name: str):
+    """Create an instrumented engine"""
+    db_engine = create_engine(url, poolclass=InstrumentedQueuePool, **_pool_options(pool_name))
+    instrument_engine(db_engine, pool_name)
+    return db_engine
+
+
+def _create_async_engine(url: str, pool_name: str):
+    """Create an instrumented async engine"""
+    db_engine = create_async_engine(url, poolclass=InstrumentedAsyncQueuePool, **_pool_options(pool_name))
+    instrument_engine(db_engine, pool_name)
+    return db_engine
+
+
+# Engines, session factories and clients are created on first use, so
+# importing this module (and starting a worker) opens no connections
+_lazy_lock = threading.RLock()
+_lazy_state: Dict[str, Any] = {}
+
+
+def _lazy(name: str, factory: Callable[[], Any]) -> Any:
+    value = _lazy_state.get(name)
+    if value is None:
+        with _lazy_lock:
+            value = _lazy_state.get(name)
+            if value is None:
+                value = factory()
+                _lazy_state[name] = value
+    return value
+
+
+def get_engine() -> Engine:
+    """Primary PostgreSQL engine (scripts and background jobs)"""
+    return _lazy("engine", lambda: _create_engine(settings.DATABASE_URL, "primary"))
+
+
+def get_async_engine() -> AsyncEngine:
+    """Primary PostgreSQL async engine (API requests)"""
+    return _lazy("async_engine", lambda: _create_async_engine(settings.ASYNC_DATABASE_URL, "primary_async"))
+
+
+def get_async_replica_engines() -> List[AsyncEngine]:
+    """Read replica async engines, empty when no replica is configured"""
+    return _lazy("async_replica_engines", lambda: [
+        _create_async_engine(url, f"replica_{index}_async")
+        for index, url in enumerate(settings.ASYNC_DATABASE_REPLICA_URLS, 1)
+    ])
+
+
+def _next_replica() -> Optional[AsyncEngine]:
+    """Replicas are handed out in turn, each read-only session is pinned to one"""
+    replica_cycle = _lazy("replica_cycle", lambda: itertools.cycle(get_async_replica_engines() or [None]))
+    return next(replica_cycle)
+
+
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+READ_YOUR_WRITES_COOKIE = "read_your_writes"
+
+
+class RoutingSession(Session):
+    """Session that sends reads to its assigned replica and writes to the primary"""
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and not getattr(clause, "is_dml", False):
+            return replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def get_session_factory() -> sessionmaker:
+    """Factory for synchronous sessions on the primary"""
+    return _lazy("SessionLocal", lambda: sessionmaker(autocommit=False, autoflush=False, bind=get_engine()))
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Factory for async sessions, routed to replicas by get_async_read_db"""
+    return _lazy("AsyncSessionLocal", lambda: async_sessionmaker(
+        get_async_engine(), 
+        class_=AsyncSession, 
+        sync_session_class=RoutingSession,
+        expire_on_commit=False
+    ))
+
 
 Base = declarative_base()
 
 
 # MongoDB setup
-mongodb_client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL)
-mongodb_database = mongodb_client[settings.MONGODB_DB]
+def get_mongodb_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    """Async MongoDB client for request-time logging"""
+    return _lazy("mongodb_client", lambda: motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL))
+
+
+def get_sync_mongodb_client() -> MongoClient:
+    """Synchronous MongoDB client for scripts and migrations"""
+    return _lazy("sync_mongodb_client", lambda: MongoClient(settings.MONGODB_URL))
+
 
-# Synchronous MongoDB client for initialization
-sync_mongodb_client = MongoClient(settings.MONGODB_URL)
-sync_mongodb_database = sync_mongodb_client[settings.MONGODB_DB]
+def get_sync_mongodb():
+    """Get synchronous MongoDB database instance"""
+    return get_sync_mongodb_client()[settings.MONGODB_DB]
 
 
 def get_db() -> Session:
     """Dependency to get database session"""
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
@@ -56,76 +149,120 @@ def get_db() -> Session:
 
 async def get_async_db() -> AsyncSession:
     """Dependency to get async database session"""
-    async with AsyncSessionLocal() as session:
+    async with get_async_session_factory()() as session:
         yield session
 
 
-def get_mongodb():
-    """Get MongoDB database instance"""
-    return mongodb_database
+def _sign_read_your_writes(until: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"read_your_writes:{until}".encode(), hashlib.sha256).hexdigest()[:32]
 
 
-async def init_db():
-    """Initialize databases and create tables"""
+def _read_your_writes_until(request: Request) -> Optional[float]:
+    """Expiry of the client's read-your-writes token, None unless it was issued by us"""
+    token = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    until, _, signature = (token or "").partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign_read_your_writes(until)):
+        return None
     try:
-        # Import all models to ensure they are registered with SQLAlchemy
-        from app.models import user, branch, purchase, recycling, reward, waste_type
-        
-        logger.info("Creating PostgreSQL tables...")
-        Base.metadata.create_all(bind=engine)
-        logger.info("✅ PostgreSQL tables created successfully")
-        
-        # Initialize MongoDB collections and indexes
-        logger.info("Initializing MongoDB collections...")
-        await init_mongodb_collections()
-        logger.info("✅ MongoDB collections initialized successfully")
-        
-    except Exception as e:
-        logger.error(f"❌ Database initialization failed: {str(e)}")
-        raise
-
-
-async def init_mongodb_collections():
-    """Initialize MongoDB collections and indexes"""
-    # Collections for logs and analytics
-    collections = [
-        "recycling_events",
-        "ai_validations", 
-        "user_activities",
-        "environmental_metrics",
-        "system_logs"
-    ]
+        # Never further out than a token issued now, in case the window was shortened
+        return min(float(until), time.time() + settings.READ_YOUR_WRITES_SECONDS)
+    except ValueError:
+        return None
+
+
+def requires_primary(request: Request) -> bool:
+    """Check whether the client wrote recently and must read from the primary"""
+    until = _read_your_writes_until(request)
+    return until is not None and until > time.time()
+
+
+def issue_read_your_writes_token(response: Response):
+    """Keep the client's reads on the primary until replicas have caught up with its write"""
+    if settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return
     
-    for collection_name in collections:
-        collection = mongodb_database[collection_name]
-        
-        # Create indexes based on collection type
-        if collection_name == "recycling_events":
-            await collection.create_index([("user_id", 1), ("timestamp", -1)])
-            await collection.create_index([("purchase_id", 1)])
-            await collection.create_index([("branch_id", 1), ("timestamp", -1)])
-            
-        elif collection_name == "ai_validations":
-            await collection.create_index([("validation_id", 1)])
-            await collection.create_index([("timestamp", -1)])
-            await collection.create_index([("accuracy_score", -1)])
-            
-        elif collection_name == "user_activities":
-            await collection.create_index([("user_id", 1), ("timestamp", -1)])
-            await collection.create_index([("activity_type", 1)])
-            
-        elif collection_name == "environmental_metrics":
-            await collection.create_index([("date", -1)])
-            await collection.create_index([("branch_id", 1), ("date", -1)])
-            
-        elif collection_name == "system_logs":
-            await collection.create_index([("timestamp", -1)])
-            await collection.create_index([("level", 1)])
+    # Signed so clients cannot pin their reads to the primary with a far-future expiry
+    until = str(int(time.time()) + settings.READ_YOUR_WRITES_SECONDS)
+    token = f"{until}.{_sign_read_your_writes(until)}"
+    response.headers[READ_YOUR_WRITES_HEADER] = token
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        token,
+        max_age=settings.READ_YOUR_WRITES_SECONDS,
+        httponly=True,
+        samesite="lax"
+    )
+
+
+async def get_async_read_db(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+) -> AsyncSession:
+    """Dependency for read-only endpoints, reads go to a replica when one is configured"""
+    if settings.POSTGRES_REPLICA_SERVERS and not requires_primary(request):
+        db.sync_session.info["replica"] = _next_replica()
+    return db
+
+
+def _sibling_session(db: AsyncSession) -> AsyncSession:
+    """New session on the same database and replica as db"""
+    session = AsyncSession(db.bind, sync_session_class=RoutingSession, expire_on_commit=False)
+    session.sync_session.info["replica"] = db.sync_session.info.get("replica")
+    return session
+
+
+async def execute_concurrently(db: AsyncSession, *statements) -> List[Result]:
+    """Run independent reads at once, each statement after the first on its own pooled connection"""
+    sessions = [db] + [_sibling_session(db) for _ in statements[1:]]
+    try:
+        return await asyncio.gather(*(
+            session.execute(statement) for session, statement in zip(sessions, statements)
+        ))
+    finally:
+        for session in sessions[1:]:
+            await session.close()
+
+
+def get_mongodb():
+    """Get MongoDB database instance"""
+    return get_mongodb_client()[settings.MONGODB_DB]
 
 
 async def close_db_connections():
-    """Close database connections"""
-    await async_engine.dispose()
-    mongodb_client.close()
-    sync_mongodb_client.close()
+    """Close database connections that were opened"""
+    with _lazy_lock:
+        state = dict(_lazy_state)
+        _lazy_state.clear()
+    
+    if "async_engine" in state:
+        await state["async_engine"].dispose()
+    for replica_engine in state.get("async_replica_engines", []):
+        await replica_engine.dispose()
+    if "engine" in state:
+        state["engine"].dispose()
+    if "mongodb_client" in state:
+        state["mongodb_client"].close()
+    if "sync_mongodb_client" in state:
+        state["sync_mongodb_client"].close()
     logger.info("Database connections closed")
+
+
+# Backward compatible module attributes, resolved (and created) on first access
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "async_engine": get_async_engine,
+    "async_replica_engines": get_async_replica_engines,
+    "SessionLocal": get_session_factory,
+    "AsyncSessionLocal": get_async_session_factory,
+    "mongodb_client": get_mongodb_client,
+    "mongodb_database": get_mongodb,
+    "sync_mongodb_client": get_sync_mongodb_client,
+    "sync_mongodb_database": get_sync_mongodb,
+}
+
+
+def __getattr__(name: str):
+    factory = _LAZY_ATTRIBUTES.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
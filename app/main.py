@@ -1,21 +1,26 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 import time
 from loguru import logger
 
 from app.core.config import settings
 from app.core.exceptions import setup_exception_handlers
+from app.core.metrics import metrics
+from app.core.security import shutdown_password_executor
+from app.core.redis import close_redis
+from app.core.token_revocation import start_token_revocation_sync, stop_token_revocation_sync
+from app.core.rate_limit import start_rate_limit_sync, stop_rate_limit_sync
 from app.api.api_v1.api import api_router
-from app.db.session import init_db
+from app.db.session import close_db_connections, issue_read_your_writes_token
+from app.db.migrations import check_schema_current
+from app.db.query_counter import start_query_counter, finish_query_counter
+from app.db.query_profiler import start_query_profile, finish_query_profile
+from app.services.qr_service import shutdown_render_executor
+from app.services.qr_gc import start_qr_gc, stop_qr_gc
+from app.services.event_log import start_event_writer, stop_event_writer
 
 
-# Rate limiter setup
-limiter = Limiter(key_func=get_remote_address)
-
 # Create FastAPI app
 app = FastAPI(
     title="EcoRewards API",
@@ -26,10 +31,6 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
-# Rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,18 +54,39 @@ async def log_requests(request: Request, call_next):
     # Log request
     logger.info(f"Request: {request.method} {request.url}")
     
-    response = await call_next(request)
+    query_counter = start_query_counter()
+    start_query_profile(request.scope)
+    try:
+        response = await call_next(request)
+    finally:
+        finish_query_counter(query_counter)
+        finish_query_profile()
     
     # Log response
     process_time = time.time() - start_time
     logger.info(
         f"Response: {response.status_code} - "
         f"Time: {process_time:.3f}s - "
+        f"Queries: {query_counter.count} - "
         f"Method: {request.method} - "
         f"Path: {request.url.path}"
     )
     
     response.headers["X-Process-Time"] = str(process_time)
+    if settings.SQL_QUERY_COUNT_HEADER:
+        response.headers["X-DB-Query-Count"] = str(query_counter.count)
+    return response
+
+
+# Read-your-writes middleware: after a successful write the client's reads
+# skip the replicas until they have caught up
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        issue_read_your_writes_token(response)
+    
     return response
 
 
@@ -80,8 +102,20 @@ async def startup_event():
     """Initialize database and services on startup"""
     logger.info("🚀 Starting EcoRewards API...")
     
-    # Initialize databases
-    await init_db()
+    # Schema changes are applied by scripts/migrate.py, startup only verifies the revision
+    await check_schema_current()
+    
+    # Background cleanup of expired QR images
+    start_qr_gc()
+    
+    # Batched MongoDB event logging, requests only enqueue
+    start_event_writer()
+    
+    # Keep this worker's view of revoked tokens current
+    start_token_revocation_sync()
+    
+    # Rate limits are enforced locally and shared through Redis
+    start_rate_limit_sync()
     
     logger.info("✅ EcoRewards API started successfully!")
 
@@ -90,6 +124,15 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("🛑 Shutting down EcoRewards API...")
+    
+    await stop_qr_gc()
+    await stop_event_writer()
+    await stop_token_revocation_sync()
+    await stop_rate_limit_sync()
+    shutdown_render_executor()
+    shutdown_password_executor()
+    await close_redis()
+    await close_db_connections()
 
 
 # Health check endpoint
@@ -104,6 +147,16 @@ async def health_check():
     }
 
 
+# Metrics endpoint
+@app.get("/metrics")
+async def get_metrics():
+    """In-process runtime metrics for this worker"""
+    return {
+        "timestamp": time.time(),
+        "metrics": metrics.snapshot()
+    }
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -8,6 +8,10 @@ import json
 
 class Purchase(Base):
     __tablename__ = "purchases"
+    __table_args__ = (
+        # Purchase history per user, newest first
+        Index("ix_purchases_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     purchase_code = Column(String(100), unique=True, index=True, nullable=False)
@@ -29,7 +33,7 @@ class Purchase(Base):
     # QR Code
     qr_code_data = Column(Text, nullable=True)  # JSON with QR data
     qr_code_url = Column(String(500), nullable=True)
-    qr_expires_at = Column(DateTime(timezone=True), nullable=True)
+    qr_expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
     # Status
     is_recycled = Column(Boolean, default=False)
@@ -55,6 +59,13 @@ class Purchase(Base):
             return json.loads(self.qr_code_data)
         return {}
     
+    @property
+    def qr_payload(self):
+        """Data encoded in the QR image: the signed token, or the legacy JSON payload"""
+        if not self.qr_code_data:
+            return None
+        return self.qr_data_dict.get("qr_token") or self.qr_code_data
+    
     def set_qr_data(self, data: dict):
         """Set QR code data from dictionary"""
         self.qr_code_data = json.dumps(data)
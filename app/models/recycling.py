@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -22,6 +22,11 @@ class ValidationStatus(str, enum.Enum):
 
 class RecyclingEvent(Base):
     __tablename__ = "recycling_events"
+    __table_args__ = (
+        # Recycling history and monthly counts per user and per branch
+        Index("ix_recycling_events_user_id_created_at", "user_id", "created_at"),
+        Index("ix_recycling_events_branch_id_created_at", "branch_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
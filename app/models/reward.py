@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -29,6 +29,10 @@ class UserRewardStatus(str, enum.Enum):
 
 class Reward(Base):
     __tablename__ = "rewards"
+    __table_args__ = (
+        # Catalog of active rewards ordered by popularity
+        Index("ix_rewards_status_popularity_score", "status", "popularity_score"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -122,6 +126,12 @@ class Reward(Base):
 
 class UserReward(Base):
     __tablename__ = "user_rewards"
+    __table_args__ = (
+        # Per-user redemption limit check
+        Index("ix_user_rewards_user_id_reward_id", "user_id", "reward_id"),
+        # User's rewards filtered by status, newest first
+        Index("ix_user_rewards_user_id_status_created_at", "user_id", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -139,7 +149,7 @@ class UserReward(Base):
     used_at_branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)
     
     # Validity
-    expires_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
     # Additional data
     notes = Column(Text, nullable=True)
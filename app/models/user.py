@@ -1,11 +1,26 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text
+import enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
 
 
+class UserRole(str, enum.Enum):
+    USER = "user"
+    ADMIN = "admin"
+
+
+class UserStatus(str, enum.Enum):
+    ACTIVE = "active"
+    INACTIVE = "inactive"
+
+
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Admin user list, newest first, paged by (created_at, id) cursors
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -18,6 +33,9 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)
+    # Access tokens carry role and status claims with this version, bump it
+    # whenever either changes so tokens issued before are refused
+    authz_version = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Environmental tracking
     total_points = Column(Integer, default=0)
@@ -45,6 +63,14 @@ class User(Base):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
+    @property
+    def role(self) -> UserRole:
+        return UserRole.ADMIN if self.is_admin else UserRole.USER
+    
+    @property
+    def status(self) -> UserStatus:
+        return UserStatus.ACTIVE if self.is_active else UserStatus.INACTIVE
+    
     def add_points(self, points: int):
         """Add points to user's total"""
         self.total_points += points
@@ -19,6 +19,10 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 class RefreshTokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List, Dict, Any
+from typing_extensions import Annotated, TypedDict
 from datetime import datetime
+from enum import Enum
 
 
 class PurchaseItemCreate(BaseModel):
@@ -78,6 +80,42 @@ class QRCodeResponse(BaseModel):
     purchase_code: str
 
 
+class QRImageFormat(str, Enum):
+    PNG = "png"
+    SVG = "svg"
+
+
+class QRBatchOutput(str, Enum):
+    ZIP = "zip"
+    SHEET = "sheet"
+
+
+class QRBatchRequest(BaseModel):
+    purchase_ids: List[int] = Field(..., min_length=1, max_length=100)
+    output: QRBatchOutput = QRBatchOutput.ZIP
+    image_format: QRImageFormat = QRImageFormat.PNG  # Sheets are always rendered from PNG
+
+
+class QRPayloadItem(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+    
+    name: str
+    waste_type_id: int
+    waste_type_name: str
+    waste_type_category: str
+
+
+class LegacyQRPayload(TypedDict):
+    """JSON payload embedded in purchase QR codes before compact tokens"""
+    __pydantic_config__ = ConfigDict(extra="allow")
+    
+    purchase_id: int
+    purchase_code: str
+    user_id: int
+    branch_id: int
+    items: Annotated[List[QRPayloadItem], Field(min_length=1)]
+
+
 class PurchaseStats(BaseModel):
     total_purchases: int
     total_amount_spent: float
@@ -35,6 +35,12 @@ class UserUpdate(BaseModel):
     profile_image_url: Optional[str] = Field(None, max_length=500)
 
 
+class UserAccessUpdate(BaseModel):
+    """Role and activation changes, made by an admin"""
+    is_admin: Optional[bool] = None
+    is_active: Optional[bool] = None
+
+
 class UserInDB(UserBase):
     id: int
     is_active: bool
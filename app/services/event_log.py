@@ -0,0 +1,337 @@
+import asyncio
+import enum
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, IO, List, Optional, Tuple
+from bson import json_util
+from loguru import logger
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.session import get_mongodb
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+events_queue_depth = metrics.gauge("mongo_events.queue_depth")
+events_written = metrics.counter("mongo_events.written")
+events_dropped = metrics.counter("mongo_events.dropped")
+events_spilled = metrics.counter("mongo_events.spilled")
+events_replayed = metrics.counter("mongo_events.replayed")
+flush_failures = metrics.counter("mongo_events.flush_failures")
+flush_seconds = metrics.summary("mongo_events.flush_seconds")
+flush_batch_size = metrics.summary("mongo_events.batch_size")
+
+# (collection name, document)
+Event = Tuple[str, Dict[str, Any]]
+
+
+class EventOverflowPolicy(str, enum.Enum):
+    BLOCK = "block"  # Callers wait for room, up to a timeout, then the event is dropped
+    DROP_OLDEST = "drop_oldest"
+    SPILL = "spill"  # Overflow and failed batches go to a local file, replayed once MongoDB is back
+
+
+class MongoEventWriter:
+    """Buffers log documents in memory and writes them with one insert_many per collection"""
+
+    def __init__(
+        self,
+        database=None,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        policy: EventOverflowPolicy = EventOverflowPolicy.DROP_OLDEST,
+        block_timeout: float = 1.0,
+        spill_path: Optional[str] = None
+    ):
+        self._database = database
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = EventOverflowPolicy(policy)
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+
+        self._buffer: Deque[Event] = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._spill_file_lock = threading.Lock()  # Spill file appends and renames run on worker threads
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def database(self):
+        return self._database if self._database is not None else get_mongodb()
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer)
+
+    def _set_depth(self):
+        events_queue_depth.set(len(self._buffer))
+
+    async def write(self, collection: str, document: Dict[str, Any]) -> bool:
+        """Queue a document, returns False when it was dropped instead"""
+        if len(self._buffer) >= self.max_queue_size:
+            if self.policy == EventOverflowPolicy.DROP_OLDEST:
+                self._buffer.popleft()
+                events_dropped.inc()
+            elif self.policy == EventOverflowPolicy.SPILL:
+                await self._spill([(collection, document)])
+                return True
+            elif not await self._wait_for_space():
+                events_dropped.inc()
+                return False
+
+        self._buffer.append((collection, document))
+        self._set_depth()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _wait_for_space(self) -> bool:
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._buffer) >= self.max_queue_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _insert(self, events: List[Event]) -> bool:
+        """Write events grouped by collection, False when MongoDB could not take them"""
+        by_collection: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for collection, document in events:
+            by_collection[collection].append(document)
+
+        start = time.perf_counter()
+        try:
+            for collection, documents in by_collection.items():
+                try:
+                    await self.database[collection].insert_many(documents, ordered=False)
+                except BulkWriteError as e:
+                    # Documents keep their _id across retries, duplicates were written by an earlier attempt
+                    errors = e.details.get("writeErrors", [])
+                    if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                        raise
+        except Exception as e:
+            flush_failures.inc()
+            logger.error(f"MongoDB event flush failed ({len(events)} events): {str(e)}")
+            return False
+
+        flush_seconds.observe(time.perf_counter() - start)
+        flush_batch_size.observe(len(events))
+        events_written.inc(len(events))
+        return True
+
+    def _requeue(self, events: List[Event]):
+        """Put a failed batch back at the front, the oldest events give way when full"""
+        for event in reversed(events):
+            if len(self._buffer) >= self.max_queue_size:
+                events_dropped.inc()
+                continue
+            self._buffer.appendleft(event)
+        self._set_depth()
+
+    def _append_to_spill(self, events: List[Event], remainder: Optional[IO[str]] = None) -> int:
+        """Append events, then the lines left in a replay file, to the spill file; returns how many"""
+        with self._spill_file_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                for collection, document in events:
+                    spill_file.write(json_util.dumps({"collection": collection, "document": document}) + "\n")
+                spilled = len(events)
+                for line in remainder or ():
+                    spill_file.write(line)
+                    spilled += 1
+        return spilled
+
+    async def _spill(self, events: List[Event], remainder: Optional[IO[str]] = None) -> bool:
+        """Append events to the spill file off the event loop, dropping them if it cannot be written"""
+        if not self.spill_path:
+            events_dropped.inc(len(events))
+            return False
+
+        try:
+            spilled = await asyncio.to_thread(self._append_to_spill, events, remainder)
+        except OSError as e:
+            logger.error(f"Could not spill {len(events)} MongoDB events: {str(e)}")
+            events_dropped.inc(len(events))
+            return False
+
+        events_spilled.inc(spilled)
+        return True
+
+    def _open_replay_file(self) -> Optional[IO[str]]:
+        """Move the spill file aside and open it, None when there is nothing to replay"""
+        # New spills go to a fresh file while this one is replayed, a replay
+        # file left by an interrupted run is finished first
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_file_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return None
+                os.replace(self.spill_path, replay_path)
+        return open(replay_path, encoding="utf-8")
+
+    @staticmethod
+    def _read_spilled(replay_file: IO[str], count: int) -> List[Event]:
+        """Read up to count events from where the replay file was left"""
+        events = []
+        for line in replay_file:
+            record = json_util.loads(line)
+            events.append((record["collection"], record["document"]))
+            if len(events) >= count:
+                break
+        return events
+
+    async def _replay_spill(self):
+        """Write events spilled while MongoDB was unavailable, one batch in memory at a time"""
+        if not self.spill_path:
+            return
+
+        replay_file = await asyncio.to_thread(self._open_replay_file)
+        if replay_file is None:
+            return
+
+        finished = True
+        try:
+            while True:
+                batch = await asyncio.to_thread(self._read_spilled, replay_file, self.batch_size)
+                if not batch:
+                    break
+                if not await self._insert(batch):
+                    # Keep the replay file if the rest could not be spilled again,
+                    # the next replay starts over and duplicates are skipped by _id
+                    finished = await self._spill(batch, replay_file)
+                    break
+                events_replayed.inc(len(batch))
+        finally:
+            await asyncio.to_thread(replay_file.close)
+
+        if finished:
+            await asyncio.to_thread(os.remove, replay_file.name)
+
+    async def _handle_failed_batch(self, events: List[Event]):
+        if self.policy == EventOverflowPolicy.SPILL:
+            await self._spill(events)
+        else:
+            self._requeue(events)
+
+    async def flush(self) -> int:
+        """Write everything buffered so far, returns the number of events written"""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._set_depth()
+                self._space.set()
+
+                try:
+                    inserted = await self._insert(batch)
+                except asyncio.CancelledError:
+                    await self._handle_failed_batch(batch)
+                    raise
+                if not inserted:
+                    await self._handle_failed_batch(batch)
+                    return written
+                written += len(batch)
+
+            await self._replay_spill()
+            return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MongoDB event writer error: {str(e)}")
+
+    def start(self):
+        """Start flushing in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop the background task and write what is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error("MongoDB event flush on shutdown timed out")
+
+        if self._buffer:
+            remaining = list(self._buffer)
+            self._buffer.clear()
+            self._set_depth()
+            if self.policy == EventOverflowPolicy.SPILL:
+                await self._spill(remaining)
+            else:
+                events_dropped.inc(len(remaining))
+                logger.warning(f"Dropped {len(remaining)} MongoDB events on shutdown")
+
+
+_writer: Optional[MongoEventWriter] = None
+
+
+def get_event_writer() -> MongoEventWriter:
+    """Process-wide writer configured from settings"""
+    global _writer
+
+    if _writer is None:
+        _writer = MongoEventWriter(
+            max_queue_size=settings.EVENT_LOG_QUEUE_SIZE,
+            batch_size=settings.EVENT_LOG_BATCH_SIZE,
+            flush_interval=settings.EVENT_LOG_FLUSH_INTERVAL_SECONDS,
+            policy=settings.EVENT_LOG_OVERFLOW_POLICY,
+            block_timeout=settings.EVENT_LOG_BLOCK_TIMEOUT_SECONDS,
+            spill_path=settings.EVENT_LOG_SPILL_PATH
+        )
+    return _writer
+
+
+async def log_event(collection: str, document: Dict[str, Any]) -> bool:
+    """Queue a document for a MongoDB collection without waiting for MongoDB"""
+    return await get_event_writer().write(collection, document)
+
+
+def start_event_writer():
+    """Start the background MongoDB event writer"""
+    get_event_writer().start()
+    logger.info(
+        f"MongoDB event writer started (batch {settings.EVENT_LOG_BATCH_SIZE}, "
+        f"every {settings.EVENT_LOG_FLUSH_INTERVAL_SECONDS}s, {settings.EVENT_LOG_OVERFLOW_POLICY} on overflow)"
+    )
+
+
+async def stop_event_writer():
+    """Flush buffered events and stop the writer"""
+    global _writer
+
+    if _writer is not None:
+        await _writer.stop(settings.EVENT_LOG_SHUTDOWN_TIMEOUT_SECONDS)
+        _writer = None
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.session import get_session_factory
+from app.models.purchase import Purchase
+from app.models.reward import UserReward
+from app.services.qr_service import (
+    qr_cache_key,
+    qr_artifact_key,
+    qr_artifact_path,
+    qr_image_cache,
+    QR_RENDERERS
+)
+
+
+gc_runs = metrics.counter("qr_gc.runs")
+gc_files_deleted = metrics.counter("qr_gc.files_deleted")
+gc_bytes_reclaimed = metrics.counter("qr_gc.bytes_reclaimed")
+gc_rows_swept = metrics.counter("qr_gc.rows_swept")
+
+_gc_task: Optional[asyncio.Task] = None
+
+
+class DeleteThrottle:
+    """Spaces out file deletions to cap the sweeper's I/O rate"""
+
+    def __init__(self, max_per_second: int):
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def _upload_url_to_path(url: Optional[str]) -> Optional[str]:
+    """Map an /uploads/... URL to a file inside the upload folder"""
+    if not url or not url.startswith("/uploads/"):
+        return None
+
+    upload_dir = os.path.abspath(settings.UPLOAD_FOLDER)
+    file_path = os.path.abspath(os.path.join(upload_dir, *url[len("/uploads/"):].split("/")))
+    if os.path.commonpath([upload_dir, file_path]) != upload_dir:
+        return None
+    return file_path
+
+
+def _purchase_artifacts(purchase: Purchase) -> List[str]:
+    """Files that may hold QR images for a purchase"""
+    paths = []
+
+    legacy_path = _upload_url_to_path(purchase.qr_code_url)
+    if legacy_path:
+        paths.append(legacy_path)
+
+    payload = purchase.qr_payload
+    if payload:
+        for image_format in QR_RENDERERS:
+            key = qr_cache_key(payload, image_format)
+            qr_image_cache.discard(key)
+            paths.append(qr_artifact_path(key, image_format))
+
+    return paths
+
+
+def _delete_files(paths: List[str], throttle: DeleteThrottle, totals: Dict[str, int]):
+    """Delete files that exist, accumulating file and byte counts"""
+    for file_path in paths:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            continue
+
+        throttle.wait()
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            continue
+
+        totals["files"] += 1
+        totals["bytes"] += size
+        gc_files_deleted.inc()
+        gc_bytes_reclaimed.inc(size)
+
+
+def sweep_expired_batch(db: Session, now: datetime, batch_size: int, throttle: DeleteThrottle) -> Dict[str, int]:
+    """Delete QR artifacts for one batch of expired purchases and redemptions"""
+    totals = {"rows": 0, "files": 0, "bytes": 0}
+
+    # Both queries walk the expiry indexes and only see rows not swept yet
+    purchases = db.query(Purchase).filter(
+        Purchase.qr_expires_at < now,
+        Purchase.qr_code_url.isnot(None)
+    ).order_by(Purchase.qr_expires_at).limit(batch_size).all()
+
+    for purchase in purchases:
+        _delete_files(_purchase_artifacts(purchase), throttle, totals)
+        purchase.qr_code_url = None
+
+    user_rewards = db.query(UserReward).filter(
+        UserReward.expires_at < now,
+        UserReward.qr_code_url.isnot(None)
+    ).order_by(UserReward.expires_at).limit(batch_size).all()
+
+    for user_reward in user_rewards:
+        key = qr_artifact_key(user_reward.qr_code_url)
+        if key:
+            qr_image_cache.discard(key)
+        file_path = _upload_url_to_path(user_reward.qr_code_url)
+        if file_path:
+            _delete_files([file_path], throttle, totals)
+        user_reward.qr_code_url = None
+
+    db.commit()
+
+    totals["rows"] = len(purchases) + len(user_rewards)
+    gc_rows_swept.inc(totals["rows"])
+    return totals
+
+
+def _sweep_batch_in_session(now: datetime, throttle: DeleteThrottle) -> Dict[str, int]:
+    db = get_session_factory()()
+    try:
+        return sweep_expired_batch(db, now, settings.QR_GC_BATCH_SIZE, throttle)
+    finally:
+        db.close()
+
+
+async def sweep_expired_qr_artifacts() -> Dict[str, int]:
+    """Sweep all expired QR artifacts in bounded batches"""
+    now = datetime.utcnow()
+    throttle = DeleteThrottle(settings.QR_GC_MAX_DELETES_PER_SECOND)
+    totals = {"rows": 0, "files": 0, "bytes": 0}
+
+    while True:
+        batch = await asyncio.to_thread(_sweep_batch_in_session, now, throttle)
+        for name, value in batch.items():
+            totals[name] += value
+
+        # A short batch means nothing expired is left
+        if batch["rows"] < settings.QR_GC_BATCH_SIZE:
+            break
+
+    gc_runs.inc()
+    logger.info(
+        f"QR artifact sweep: {totals['rows']} expired records, "
+        f"{totals['files']} files deleted, {totals['bytes']} bytes reclaimed"
+    )
+    return totals
+
+
+async def _gc_loop():
+    while True:
+        try:
+            await sweep_expired_qr_artifacts()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"QR artifact sweep failed: {str(e)}")
+
+        await asyncio.sleep(settings.QR_GC_INTERVAL_SECONDS)
+
+
+def start_qr_gc():
+    """Start the background QR artifact sweeper"""
+    global _gc_task
+
+    if settings.QR_GC_ENABLED and _gc_task is None:
+        _gc_task = asyncio.create_task(_gc_loop())
+        logger.info(f"QR artifact sweeper started (every {settings.QR_GC_INTERVAL_SECONDS}s)")
+
+
+async def stop_qr_gc():
+    """Stop the background QR artifact sweeper"""
+    global _gc_task
+
+    if _gc_task is not None:
+        _gc_task.cancel()
+        try:
+            await _gc_task
+        except asyncio.CancelledError:
+            pass
+        _gc_task = None
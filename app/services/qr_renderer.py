@@ -0,0 +1,97 @@
+import qrcode
+import qrcode.image.svg
+from io import BytesIO
+from typing import List, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+
+# This module is imported by QR render worker processes, keep it free of
+# application imports (settings, database, logging configuration).
+
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+
+# Print sheets: A4 pages at 150 dpi
+SHEET_PAGE_SIZE = (1240, 1754)
+SHEET_RESOLUTION = 150.0
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+SHEET_MARGIN = 60
+SHEET_LABEL_HEIGHT = 40
+
+
+def build_qr(payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> qrcode.QRCode:
+    """Build the QR matrix for a payload"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_png(payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> bytes:
+    """Render a payload as PNG bytes"""
+    qr = build_qr(payload, box_size, border)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_qr_svg(payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> bytes:
+    """Render a payload as SVG bytes"""
+    qr = build_qr(payload, box_size, border)
+    img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+
+    buffer = BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def compose_qr_sheet(entries: List[Tuple[str, bytes]]) -> bytes:
+    """Lay out labelled PNG QR codes on A4 pages and return a print-ready PDF"""
+    page_width, page_height = SHEET_PAGE_SIZE
+    cell_width = (page_width - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+    cell_height = (page_height - 2 * SHEET_MARGIN) // SHEET_ROWS
+    qr_size = min(cell_width, cell_height - SHEET_LABEL_HEIGHT) - 20
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+    font = ImageFont.load_default()
+
+    pages = []
+    for start in range(0, len(entries), per_page):
+        page = Image.new("RGB", SHEET_PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+
+        for index, (label, png_bytes) in enumerate(entries[start:start + per_page]):
+            row, column = divmod(index, SHEET_COLUMNS)
+            left = SHEET_MARGIN + column * cell_width
+            top = SHEET_MARGIN + row * cell_height
+
+            qr_image = Image.open(BytesIO(png_bytes)).convert("RGB")
+            qr_image = qr_image.resize((qr_size, qr_size), Image.NEAREST)
+            page.paste(qr_image, (left + (cell_width - qr_size) // 2, top))
+
+            text_width = draw.textlength(label, font=font)
+            draw.text(
+                (left + (cell_width - text_width) / 2, top + qr_size + 10),
+                label,
+                fill="black",
+                font=font
+            )
+
+        pages.append(page)
+
+    buffer = BytesIO()
+    pages[0].save(
+        buffer,
+        format="PDF",
+        resolution=SHEET_RESOLUTION,
+        save_all=True,
+        append_images=pages[1:]
+    )
+    return buffer.getvalue()
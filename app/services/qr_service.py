@@ -1,55 +1,371 @@
-import qrcode
-import qrcode.image.svg
-from io import BytesIO
 import base64
 import json
-from typing import Dict, Any
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+import orjson
+from collections import OrderedDict
+from datetime import datetime, timezone
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
 from loguru import logger
+from pydantic import TypeAdapter, ValidationError as PydanticValidationError
 import aiofiles
-import os
+import aiofiles.os
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.purchase import LegacyQRPayload
+from app.services.qr_renderer import (
+    render_qr_png,
+    render_qr_svg,
+    compose_qr_sheet,
+    QR_BOX_SIZE,
+    QR_BORDER
+)
+from app.services.qr_token import is_qr_token, decode_purchase_token, QRTokenError
+
+
+# QR rendering executor
+_render_executor: Optional[Executor] = None
+_render_executor_kind: Optional[str] = None
+_render_executor_lock = threading.Lock()
+
+render_queue_depth = metrics.gauge("qr_render.queue_depth")
+render_latency = metrics.summary("qr_render.latency_seconds")
+render_failures = metrics.counter("qr_render.failures")
+
+
+def _render_workers() -> int:
+    """Number of render workers configured in settings"""
+    return settings.QR_RENDER_MAX_WORKERS or os.cpu_count() or 1
+
+
+def _create_render_executor() -> Executor:
+    """Create the render executor, falling back to threads if processes are unavailable"""
+    global _render_executor_kind
+    
+    workers = _render_workers()
+    
+    if settings.QR_RENDER_EXECUTOR == "process":
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _render_executor_kind = "process"
+            logger.info(f"QR render executor: process pool with {workers} workers")
+            return executor
+        except (OSError, NotImplementedError, ImportError) as e:
+            logger.warning(f"Process pool unavailable for QR rendering, using threads: {str(e)}")
+    
+    _render_executor_kind = "thread"
+    logger.info(f"QR render executor: thread pool with {workers} workers")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr-render")
+
+
+def get_render_executor() -> Executor:
+    """Get (lazily creating) the shared QR render executor"""
+    global _render_executor
+    
+    if _render_executor is None:
+        with _render_executor_lock:
+            if _render_executor is None:
+                _render_executor = _create_render_executor()
+    return _render_executor
+
+
+def _fallback_to_thread_executor(broken: Executor):
+    """Replace a broken process pool with a thread pool"""
+    global _render_executor, _render_executor_kind
+    
+    with _render_executor_lock:
+        if _render_executor is broken:
+            workers = _render_workers()
+            _render_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr-render")
+            _render_executor_kind = "thread"
+            logger.warning(f"QR render process pool broken, switched to thread pool with {workers} workers")
+    broken.shutdown(wait=False)
+
+
+def shutdown_render_executor():
+    """Shut down the QR render executor"""
+    global _render_executor, _render_executor_kind
+    
+    with _render_executor_lock:
+        executor, _render_executor, _render_executor_kind = _render_executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def run_render(func: Callable[..., bytes], *args) -> bytes:
+    """Run a render function on the render executor, off the event loop"""
+    loop = asyncio.get_running_loop()
+    executor = get_render_executor()
+    
+    render_queue_depth.inc()
+    start_time = time.perf_counter()
+    try:
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            _fallback_to_thread_executor(executor)
+            return await loop.run_in_executor(get_render_executor(), func, *args)
+    except Exception:
+        render_failures.inc()
+        raise
+    finally:
+        render_queue_depth.dec()
+        render_latency.observe(time.perf_counter() - start_time)
+
+
+def _render_executor_info() -> Dict[str, Any]:
+    """Render executor configuration for metrics"""
+    return {
+        "kind": _render_executor_kind,
+        "max_workers": _render_workers()
+    }
+
+
+metrics.register_collector("qr_render.executor", _render_executor_info)
+
+
+# Content-addressed QR image cache
+qr_cache_memory_hits = metrics.counter("qr_cache.memory_hits")
+qr_cache_disk_hits = metrics.counter("qr_cache.disk_hits")
+qr_cache_misses = metrics.counter("qr_cache.misses")
+qr_cache_evictions = metrics.counter("qr_cache.evictions")
+
+
+class QRImageCache:
+    """Bounded in-memory LRU of rendered QR images keyed by content hash"""
+    
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+    
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while len(self._entries) > self.max_items or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                qr_cache_evictions.inc()
+    
+    def discard(self, key: str):
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self._size -= len(data)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._entries),
+            "bytes": self._size,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes
+        }
+
+
+qr_image_cache = QRImageCache(settings.QR_CACHE_MAX_ITEMS, settings.QR_CACHE_MAX_BYTES)
+metrics.register_collector("qr_cache.memory", qr_image_cache.stats)
+
+QR_RENDERERS = {
+    "png": render_qr_png,
+    "svg": render_qr_svg,
+}
+QR_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+# Bump when rendering changes so old artifacts are not reused
+QR_CACHE_VERSION = 1
+
+
+def canonical_qr_payload(data: Dict[str, Any]) -> str:
+    """Serialize QR data deterministically so equal data renders equal images"""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def qr_cache_key(payload: str, image_format: str = "png") -> str:
+    """Content hash of a QR payload plus the parameters used to render it"""
+    render_params = f"v{QR_CACHE_VERSION}|{image_format}|ecl=L|box={QR_BOX_SIZE}|border={QR_BORDER}|"
+    return hashlib.sha256((render_params + payload).encode("utf-8")).hexdigest()
+
+
+def qr_artifact_name(key: str, image_format: str = "png") -> str:
+    """Relative path of a QR artifact inside the upload folder"""
+    return f"qr/{key[:2]}/{key}.{image_format}"
+
+
+def qr_artifact_path(key: str, image_format: str = "png") -> str:
+    """Absolute path of a QR artifact on disk"""
+    return os.path.join(settings.UPLOAD_FOLDER, *qr_artifact_name(key, image_format).split("/"))
+
+
+def qr_artifact_key(url: Optional[str]) -> Optional[str]:
+    """Cache key of a QR artifact from its /uploads/ URL, None for other URLs"""
+    prefix = "/uploads/qr/"
+    if not url or not url.startswith(prefix):
+        return None
+    key, _, image_format = url.rsplit("/", 1)[-1].partition(".")
+    return key if image_format in QR_RENDERERS and url == f"/uploads/{qr_artifact_name(key, image_format)}" else None
+
+
+async def _read_artifact(file_path: str) -> Optional[bytes]:
+    """Read a stored QR artifact, None if missing"""
+    try:
+        async with aiofiles.open(file_path, 'rb') as f:
+            return await f.read()
+    except FileNotFoundError:
+        return None
+
+
+async def _write_artifact(file_path: str, data: bytes):
+    """Atomically write a QR artifact"""
+    await aiofiles.os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    async with aiofiles.open(tmp_path, 'wb') as f:
+        await f.write(data)
+    await aiofiles.os.replace(tmp_path, file_path)
+
+
+async def _render_and_store(key: str, payload: str, image_format: str) -> bytes:
+    """Render a payload and persist it in the content-addressed store"""
+    qr_cache_misses.inc()
+    data = await run_render(QR_RENDERERS[image_format], payload)
+    await _write_artifact(qr_artifact_path(key, image_format), data)
+    qr_image_cache.put(key, data)
+    return data
+
+
+async def get_qr_image(payload: str, image_format: str = "png") -> Tuple[str, bytes]:
+    """Return (cache key, image bytes) for a payload, rendering only on a full miss"""
+    key = qr_cache_key(payload, image_format)
+    
+    data = qr_image_cache.get(key)
+    if data is not None:
+        qr_cache_memory_hits.inc()
+        return key, data
+    
+    data = await _read_artifact(qr_artifact_path(key, image_format))
+    if data is not None:
+        qr_cache_disk_hits.inc()
+        qr_image_cache.put(key, data)
+        return key, data
+    
+    return key, await _render_and_store(key, payload, image_format)
+
+
+async def store_qr_image(payload: str, image_format: str = "png") -> str:
+    """Ensure a payload's image exists on disk and return its cache key"""
+    key = qr_cache_key(payload, image_format)
+    file_path = qr_artifact_path(key, image_format)
+    exists = await aiofiles.os.path.exists(file_path)
+    
+    data = qr_image_cache.get(key)
+    if data is not None:
+        qr_cache_memory_hits.inc()
+        # The sweeper may have deleted the file of an image still cached in memory
+        if not exists:
+            await _write_artifact(file_path, data)
+        return key
+    
+    if exists:
+        qr_cache_disk_hits.inc()
+        return key
+    
+    await _render_and_store(key, payload, image_format)
+    return key
+
+
+class _ZipChunkBuffer:
+    """Write-only, unseekable file object that hands zip output back in chunks"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _labelled_image(label: str, payload: str, image_format: str) -> Tuple[str, bytes]:
+    _, image = await get_qr_image(payload, image_format)
+    return label, image
+
+
+async def stream_qr_zip(
+    entries: List[Tuple[str, str]],
+    image_format: str = "png"
+) -> AsyncIterator[bytes]:
+    """Render (label, payload) entries in parallel and stream them as a ZIP archive"""
+    buffer = _ZipChunkBuffer()
+    tasks = [_labelled_image(label, payload, image_format) for label, payload in entries]
+    
+    # Images are already compressed, store them as-is and emit each one as it finishes
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for next_image in asyncio.as_completed(tasks):
+            label, image = await next_image
+            archive.writestr(f"{label}.{image_format}", image)
+            yield buffer.drain()
+    
+    yield buffer.drain()
+
+
+async def render_qr_sheet(entries: List[Tuple[str, str]]) -> bytes:
+    """Render (label, payload) entries in parallel and lay them out as a printable PDF"""
+    images = await asyncio.gather(*[
+        _labelled_image(label, payload, "png") for label, payload in entries
+    ])
+    return await run_render(compose_qr_sheet, list(images))
 
 
 async def generate_qr_code(data: Dict[str, Any]) -> str:
     """Generate QR code for purchase data and return URL"""
     
     try:
-        # Convert data to JSON string
-        qr_data = json.dumps(data, ensure_ascii=False)
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to bytes
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Generate filename
-        purchase_code = data.get('purchase_code', 'unknown')
-        filename = f"qr_{purchase_code}_{data.get('purchase_id', 'unknown')}.png"
-        
-        # Ensure upload directory exists
-        upload_dir = settings.UPLOAD_FOLDER
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_dir, filename)
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(buffer.getvalue())
+        # Identical data maps to the same stored image
+        key = await store_qr_image(canonical_qr_payload(data))
         
         # Return URL (in production, this would be a proper URL)
-        qr_url = f"/uploads/{filename}"
+        qr_url = f"/uploads/{qr_artifact_name(key)}"
         
         logger.info(f"QR code generated: {qr_url}")
         return qr_url
@@ -59,43 +375,87 @@ async def generate_qr_code(data: Dict[str, Any]) -> str:
         raise
 
 
+qr_validation_accepted = metrics.counter("qr_validation.accepted")
+
+
+# Precompiled validator for legacy JSON payloads
+legacy_qr_payload_adapter = TypeAdapter(LegacyQRPayload)
+
+
 def decode_qr_data(qr_data_string: str) -> Dict[str, Any]:
     """Decode QR code data string back to dictionary"""
     try:
-        return json.loads(qr_data_string)
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding QR data: {str(e)}")
-        raise ValueError("Invalid QR code data")
+        return orjson.loads(qr_data_string)
+    except orjson.JSONDecodeError:
+        raise QRTokenError("Invalid QR code data")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def legacy_payloads_accepted() -> bool:
+    """Whether unsigned JSON payloads are still accepted, only during the configured transition"""
+    if not settings.QR_ACCEPT_LEGACY_PAYLOADS:
+        return False
+    cutoff = settings.QR_LEGACY_ACCEPT_UNTIL
+    return cutoff is None or datetime.now(timezone.utc) < _as_utc(cutoff)
+
+
+def parse_qr_payload(qr_code_data: str) -> Dict[str, Any]:
+    """Parse and validate scanned QR data in one pass, without database access"""
+    
+    # Cap the size in UTF-8 bytes before any parsing work, the character
+    # count alone already rules out oversized strings without encoding them
+    if (
+        len(qr_code_data) > settings.QR_MAX_PAYLOAD_BYTES
+        or len(qr_code_data.encode("utf-8", "surrogatepass")) > settings.QR_MAX_PAYLOAD_BYTES
+    ):
+        raise QRTokenError("QR code data is too large", "too_large")
+    
+    # Compact signed token: signature and expiry are checked in-process,
+    # items are loaded from the purchase afterwards
+    if is_qr_token(qr_code_data):
+        data = decode_purchase_token(qr_code_data)
+        if data["expires_at"] <= datetime.now(timezone.utc):
+            raise QRTokenError("QR code has expired", "expired")
+        return data
+    
+    if not legacy_payloads_accepted():
+        raise QRTokenError("Unsigned QR codes are no longer accepted", "legacy_disabled")
+    
+    # Legacy JSON payload with the full item list
+    try:
+        data = legacy_qr_payload_adapter.validate_python(decode_qr_data(qr_code_data))
+    except PydanticValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        raise QRTokenError(f"Invalid QR code data: {location} {error['msg'].lower()}")
+    
+    # Legacy codes were issued without an expiry, the cutoff bounds them; an
+    # embedded one is still checked so a payload cannot outlive it
+    if "expires_at" in data:
+        try:
+            expires_at = _as_utc(datetime.fromisoformat(str(data["expires_at"])))
+        except ValueError:
+            raise QRTokenError("Invalid QR code data: expires_at is not a timestamp")
+        if expires_at <= datetime.now(timezone.utc):
+            raise QRTokenError("QR code has expired", "expired")
+    return data
 
 
 async def validate_qr_code(qr_code_data: str) -> Dict[str, Any]:
     """Validate QR code data and return parsed information"""
     
     try:
-        data = decode_qr_data(qr_code_data)
-        
-        # Validate required fields
-        required_fields = ['purchase_id', 'purchase_code', 'user_id', 'branch_id', 'items']
-        for field in required_fields:
-            if field not in data:
-                raise ValueError(f"Missing required field: {field}")
-        
-        # Validate items structure
-        if not isinstance(data['items'], list) or len(data['items']) == 0:
-            raise ValueError("Items must be a non-empty list")
-        
-        for item in data['items']:
-            item_required = ['name', 'waste_type_id', 'waste_type_name', 'waste_type_category']
-            for field in item_required:
-                if field not in item:
-                    raise ValueError(f"Missing required item field: {field}")
-        
-        logger.info(f"QR code validated for purchase: {data['purchase_code']}")
-        return data
-        
-    except Exception as e:
-        logger.error(f"QR code validation failed: {str(e)}")
+        data = parse_qr_payload(qr_code_data)
+    except QRTokenError as e:
+        metrics.counter(f"qr_validation.rejected.{e.reason}").inc()
+        logger.warning(f"QR code validation failed: {str(e)}")
         raise
+    
+    qr_validation_accepted.inc()
+    return data
 
 
 async def generate_redemption_qr(redemption_code: str, reward_data: Dict[str, Any]) -> str:
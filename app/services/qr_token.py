@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import hmac
+import struct
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Any, Tuple
+
+from app.core.config import settings
+
+
+# Compact QR token layout (version 1), base32 encoded after the prefix:
+#   kind (1) | key id (1) | purchase id (4) | user id (4) | expires at (4) | HMAC-SHA256[:10]
+# Base32 only uses QR alphanumeric characters, so the token encodes in the
+# dense alphanumeric mode and stays at a low QR version.
+TOKEN_PREFIX = "EQ1:"
+TOKEN_KIND_PURCHASE = 1
+
+_BODY = struct.Struct(">BBIII")
+_MAC_SIZE = 10
+_TOKEN_SIZE = _BODY.size + _MAC_SIZE
+_ENCODED_SIZE = (_TOKEN_SIZE * 8 + 4) // 5
+
+
+class QRTokenError(ValueError):
+    """Scanned QR data was rejected before any database lookup"""
+    
+    def __init__(self, message: str = "Invalid QR code data", reason: str = "malformed"):
+        self.reason = reason
+        super().__init__(message)
+
+
+@lru_cache(maxsize=8)
+def _derive_keys(secrets: Tuple[Tuple[int, str], ...]) -> Dict[int, bytes]:
+    """Derive HMAC keys from configured secrets"""
+    return {
+        key_id: hmac.new(secret.encode("utf-8"), b"ecorewards-qr-token", hashlib.sha256).digest()
+        for key_id, secret in secrets
+    }
+
+
+def _signing_keys() -> Dict[int, bytes]:
+    """QR signing keys by key id, every configured key is accepted for verification"""
+    if settings.QR_SIGNING_KEYS:
+        secrets = tuple(sorted(settings.QR_SIGNING_KEYS.items()))
+    else:
+        secrets = ((1, settings.QR_SIGNING_KEY or settings.SECRET_KEY),)
+    return _derive_keys(secrets)
+
+
+def _active_key() -> Tuple[int, bytes]:
+    """Key id and key used to sign new tokens"""
+    keys = _signing_keys()
+    key_id = settings.QR_SIGNING_ACTIVE_KEY_ID
+    if key_id is None:
+        key_id = max(keys)
+    if key_id not in keys:
+        raise ValueError(f"QR signing key {key_id} is not configured")
+    return key_id, keys[key_id]
+
+
+def _mac(key: bytes, body: bytes) -> bytes:
+    return hmac.new(key, body, hashlib.sha256).digest()[:_MAC_SIZE]
+
+
+def _to_timestamp(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def is_qr_token(qr_code_data: str) -> bool:
+    """Check whether scanned data uses the compact token format"""
+    return qr_code_data.startswith(TOKEN_PREFIX)
+
+
+def encode_purchase_token(purchase_id: int, user_id: int, expires_at: datetime) -> str:
+    """Create a signed compact QR token for a purchase"""
+    key_id, key = _active_key()
+    body = _BODY.pack(TOKEN_KIND_PURCHASE, key_id, purchase_id, user_id, _to_timestamp(expires_at))
+    token = base64.b32encode(body + _mac(key, body)).decode("ascii").rstrip("=")
+    return TOKEN_PREFIX + token
+
+
+def decode_purchase_token(qr_code_data: str) -> Dict[str, Any]:
+    """Verify a compact QR token and return its claims"""
+    if not is_qr_token(qr_code_data):
+        raise QRTokenError()
+
+    encoded = qr_code_data[len(TOKEN_PREFIX):]
+    if len(encoded) > _ENCODED_SIZE:
+        raise QRTokenError()
+
+    try:
+        raw = base64.b32decode(encoded + "=" * (-len(encoded) % 8))
+    except (ValueError, TypeError):
+        raise QRTokenError()
+
+    if len(raw) != _TOKEN_SIZE:
+        raise QRTokenError()
+
+    body, signature = raw[:_BODY.size], raw[_BODY.size:]
+    kind, key_id, purchase_id, user_id, expires_at = _BODY.unpack(body)
+
+    key = _signing_keys().get(key_id)
+    if key is None:
+        raise QRTokenError("Invalid QR code signature", "unknown_key")
+    if not hmac.compare_digest(_mac(key, body), signature):
+        raise QRTokenError("Invalid QR code signature", "signature")
+
+    if kind != TOKEN_KIND_PURCHASE:
+        raise QRTokenError("Unsupported QR code type")
+
+    return {
+        "format": "compact",
+        "purchase_id": purchase_id,
+        "user_id": user_id,
+        "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    }
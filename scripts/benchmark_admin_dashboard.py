@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Admin dashboard latency on a large recycling history: seeds millions of
+recycling events, then times the dashboard reads as seven sequential
+aggregates plus two rankings against one aggregate statement run
+concurrently with the rankings.
+
+Without --database-url a temporary SQLite file is used; point it at a scratch
+PostgreSQL database for numbers that match production (SQLite serializes the
+concurrent reads, so it only shows the effect of the single scan).
+
+Usage: python scripts/benchmark_admin_dashboard.py [--database-url postgresql://...]
+       [--events 2000000] [--users 5000] [--branches 50] [--repeat 10]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.api.api_v1.endpoints.admin import dashboard_overview_query, top_branches_query, top_users_query
+from app.db.migrations import upgrade_database
+from app.db.session import RoutingSession, execute_concurrently
+from app.models.branch import Branch
+from app.models.purchase import Purchase
+from app.models.recycling import RecyclingEvent
+from app.models.user import User
+
+
+BATCH_SIZE = 50000
+
+
+def seed(connection, events: int, users: int, branches: int):
+    """Users, branches, one purchase per user and events spread over them"""
+    suffix = uuid.uuid4().hex[:8]
+    branch_ids = connection.execute(insert(Branch).returning(Branch.id), [
+        {
+            "name": f"Dashboard {suffix} {index}",
+            "address": "Street 1",
+            "city": "Lima",
+            "state": "Lima",
+            "country": "PE",
+            "total_recycled_items": random.randint(0, 100000)
+        }
+        for index in range(branches)
+    ]).scalars().all()
+    user_ids = connection.execute(insert(User).returning(User.id), [
+        {
+            "email": f"dashboard_{suffix}_{index}@benchmark.test",
+            "hashed_password": "x",
+            "first_name": "Dashboard",
+            "last_name": str(index),
+            "total_points": random.randint(0, 100000)
+        }
+        for index in range(users)
+    ]).scalars().all()
+    purchases = connection.execute(insert(Purchase).returning(Purchase.id, Purchase.user_id, Purchase.branch_id), [
+        {
+            "purchase_code": f"PUR-{suffix}-{index}",
+            "user_id": user_id,
+            "branch_id": branch_ids[index % branches],
+            "total_amount": 10.0
+        }
+        for index, user_id in enumerate(user_ids)
+    ]).all()
+
+    for start in range(0, events, BATCH_SIZE):
+        rows = []
+        for index in range(start, min(start + BATCH_SIZE, events)):
+            purchase = random.choice(purchases)
+            rows.append({
+                "event_code": f"REC-{suffix}-{index}",
+                "user_id": purchase.user_id,
+                "purchase_id": purchase.id,
+                "branch_id": purchase.branch_id,
+                "points_earned": random.randint(0, 200),
+                "accuracy_score": random.uniform(50, 100),
+                "total_weight_recycled": random.uniform(0.01, 2.0),
+                "carbon_footprint_reduced": random.uniform(0.01, 1.0)
+            })
+        connection.execute(insert(RecyclingEvent), rows)
+        print(f"  {start + len(rows)}/{events} events", end="\r", flush=True)
+    print()
+
+
+async def sequential_dashboard(session: AsyncSession):
+    """The dashboard reads as they ran before: one statement per figure, in turn"""
+    await session.scalar(select(func.count(RecyclingEvent.id)))
+    await session.scalar(select(func.count(User.id)).where(User.is_active == True))
+    await session.scalar(select(func.count(Branch.id)).where(Branch.is_active == True))
+    await session.scalar(select(func.sum(RecyclingEvent.total_weight_recycled)))
+    await session.scalar(select(func.sum(RecyclingEvent.carbon_footprint_reduced)))
+    await session.scalar(select(func.sum(RecyclingEvent.points_earned)))
+    await session.scalar(select(func.avg(RecyclingEvent.accuracy_score)))
+    (await session.execute(
+        select(Branch).where(Branch.is_active == True).order_by(Branch.total_recycled_items.desc()).limit(10)
+    )).scalars().all()
+    (await session.execute(
+        select(User).where(User.is_active == True).order_by(User.total_points.desc()).limit(10)
+    )).scalars().all()
+
+
+async def concurrent_dashboard(session: AsyncSession):
+    """The dashboard reads as the endpoint runs them now"""
+    overview, branches, users = await execute_concurrently(
+        session,
+        dashboard_overview_query(),
+        top_branches_query(10),
+        top_users_query(10)
+    )
+    overview.one()
+    branches.all()
+    users.all()
+
+
+async def time_dashboard(engine, dashboard, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        async with AsyncSession(engine, sync_session_class=RoutingSession, expire_on_commit=False) as session:
+            start = time.perf_counter()
+            await dashboard(session)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def run(async_url: str, repeat: int):
+    engine = create_async_engine(async_url)
+    try:
+        # Warm the caches once so both variants read the same hot data
+        await time_dashboard(engine, sequential_dashboard, 1)
+
+        print(f"{'variant':<12} {'statements':>10} {'median ms':>10} {'max ms':>10}")
+        for name, statements, dashboard in [
+            ("sequential", 9, sequential_dashboard),
+            ("concurrent", 3, concurrent_dashboard)
+        ]:
+            samples = await time_dashboard(engine, dashboard, repeat)
+            print(f"{name:<12} {statements:>10} {statistics.median(samples):>10.1f} {max(samples):>10.1f}")
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", help="Scratch database, a temporary SQLite file by default")
+    parser.add_argument("--events", type=int, default=2000000, help="Recycling events to seed")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--branches", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10, help="Dashboard loads per variant")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard.db')}"
+    upgrade_database(url=database_url)
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        print(f"Seeding {args.events} recycling events...")
+        seed(connection, args.events, args.users, args.branches)
+    engine.dispose()
+
+    async_url = database_url.replace("sqlite://", "sqlite+aiosqlite://", 1).replace("postgresql://", "postgresql+asyncpg://", 1)
+    asyncio.run(run(async_url, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Load test for database-backed API endpoints, used to compare the blocking
+Session endpoints with the AsyncSession ones against a local PostgreSQL
+
+Run the API (uvicorn app.main:app --workers 1) on each revision, then:
+
+Usage: python scripts/benchmark_async_db.py [--base-url http://localhost:8000]
+       [--concurrency 50] [--requests 2000] [--output after.json] [--compare before.json]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import os
+import time
+import uuid
+from typing import Dict, List
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+ENDPOINTS = [
+    "/api/v1/users/profile",
+    "/api/v1/users/stats",
+    "/api/v1/users/purchases",
+    "/api/v1/purchases/",
+    "/api/v1/recycling/history",
+    "/api/v1/rewards/",
+    "/api/v1/branches/",
+]
+
+
+async def get_auth_headers(client: httpx.AsyncClient) -> Dict[str, str]:
+    """Register a throwaway user and return authorization headers"""
+    credentials = {
+        "email": f"loadtest_{uuid.uuid4().hex[:8]}@example.com",
+        "password": "LoadTest123"
+    }
+    await client.post("/api/v1/auth/register", json={
+        **credentials,
+        "first_name": "Load",
+        "last_name": "Test"
+    })
+    response = await client.post("/api/v1/auth/login", json=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    path: str,
+    headers: Dict[str, str],
+    concurrency: int,
+    total_requests: int
+) -> dict:
+    """Issue requests with a fixed number of concurrent workers"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))]
+    }
+
+
+async def run(args) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60.0) as client:
+        headers = await get_auth_headers(client)
+
+        results = {}
+        for path in ENDPOINTS:
+            # Warm up pools and caches before measuring
+            await run_endpoint(client, path, headers, args.concurrency, args.concurrency)
+            results[path] = await run_endpoint(client, path, headers, args.concurrency, args.requests)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Running API server")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Results JSON from a previous run to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"DB endpoint load test ({args.concurrency} clients, {args.requests} requests per endpoint)")
+    print(f"{'endpoint':<28}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'rps x':>8}{'p99 x':>8}")
+    for path, result in results.items():
+        line = (
+            f"{path.replace('/api/v1', ''):<28}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+            f"{result['p99_ms']:>9.1f}{result['errors']:>8}"
+        )
+        if path in baseline:
+            line += (
+                f"{result['rps'] / baseline[path]['rps']:>8.2f}"
+                f"{baseline[path]['p99_ms'] / result['p99_ms']:>8.2f}"
+            )
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
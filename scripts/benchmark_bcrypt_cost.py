@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Login throughput per bcrypt cost: verifies a password at each cost on one
+thread, then on the password executor's thread count, and reports logins per
+second per core. Use it with scripts/calibrate_bcrypt.py to see what a cost
+change does to login capacity.
+
+Usage: python scripts/benchmark_bcrypt_cost.py [--min-rounds 10] [--max-rounds 14]
+       [--threads 4] [--seconds 3]
+"""
+
+import argparse
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.hash import bcrypt
+
+from app.core.security import BCRYPT_MIN_ROUNDS, _password_workers
+
+
+PASSWORD = "LoadTest123"
+
+
+def verify_for(hashed: str, seconds: float) -> int:
+    """Verify the password repeatedly for a while, returning how many verifications ran"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        bcrypt.verify(PASSWORD, hashed)
+        count += 1
+    return count
+
+
+def measure(rounds: int, threads: int, seconds: float):
+    hashed = bcrypt.using(rounds=rounds).hash(PASSWORD)
+
+    single = verify_for(hashed, seconds) / seconds
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        counts = list(executor.map(verify_for, [hashed] * threads, [seconds] * threads))
+    parallel = sum(counts) / (time.perf_counter() - start)
+
+    return {
+        "verify_ms": 1000 / single,
+        "single_thread": single,
+        "logins_per_second": parallel,
+        # More threads than cores cannot add throughput
+        "logins_per_second_per_core": parallel / min(threads, os.cpu_count() or 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS, help="Lowest cost to measure")
+    parser.add_argument("--max-rounds", type=int, default=14, help="Highest cost to measure")
+    parser.add_argument("--threads", type=int, default=_password_workers(), help="Threads for the parallel run, defaults to the executor size")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time spent per cost and run")
+    args = parser.parse_args()
+
+    print(f"bcrypt login throughput ({args.threads} threads, {os.cpu_count()} CPUs)")
+    print(f"{'cost':>4}  {'verify ms':>10}  {'1 thread/s':>10}  {'logins/s':>10}  {'per core/s':>10}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        result = measure(rounds, args.threads, args.seconds)
+        print(
+            f"{rounds:>4}  {result['verify_ms']:>10.1f}  {result['single_thread']:>10.1f}  "
+            f"{result['logins_per_second']:>10.1f}  {result['logins_per_second_per_core']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
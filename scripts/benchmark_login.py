@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Login burst benchmark: many clients log in at once while a probe measures how
+long /health takes to answer. With bcrypt on the event loop the probe stalls
+behind every hash; with the password executor it stays fast and excess logins
+are shed with 503.
+
+Run the API (uvicorn app.main:app --workers 1) on each revision, then:
+
+Usage: python scripts/benchmark_login.py [--base-url http://localhost:8000]
+       [--concurrency 50] [--logins 500] [--output after.json] [--compare before.json]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import os
+import time
+import uuid
+from typing import Dict, List
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+PASSWORD = "LoadTest123"
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[int(p * (len(values) - 1))] if values else 0.0
+
+
+async def create_user(client: httpx.AsyncClient) -> str:
+    """Register a throwaway user and return its email"""
+    email = f"loginbench_{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/v1/auth/register", json={
+        "email": email,
+        "password": PASSWORD,
+        "first_name": "Login",
+        "last_name": "Bench"
+    })
+    response.raise_for_status()
+    return email
+
+
+async def run(args) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=120.0) as client:
+        email = await create_user(client)
+
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        probe_latencies: List[float] = []
+        remaining = args.logins
+        done = False
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/auth/login", json={"email": email, "password": PASSWORD})
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                except httpx.HTTPError:
+                    statuses[0] = statuses.get(0, 0) + 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def health_probe():
+            while not done:
+                start = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        probe = asyncio.create_task(health_probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done = True
+        await probe
+
+    return {
+        "logins": len(latencies),
+        "succeeded": statuses.get(200, 0),
+        "rejected_503": statuses.get(503, 0),
+        "other_errors": len(latencies) - statuses.get(200, 0) - statuses.get(503, 0),
+        "logins_per_second": statuses.get(200, 0) / elapsed,
+        "login_p50_ms": statistics.median(latencies),
+        "login_p99_ms": percentile(latencies, 0.99),
+        "health_p50_ms": statistics.median(probe_latencies),
+        "health_p99_ms": percentile(probe_latencies, 0.99),
+        "health_max_ms": max(probe_latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Running API server")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent login clients")
+    parser.add_argument("--logins", type=int, default=500, help="Total login attempts")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Results JSON from a previous run to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"Login burst ({args.concurrency} clients, {args.logins} logins)")
+    for name, value in results.items():
+        line = f"{name:<20}{value:>12.1f}"
+        if name in baseline:
+            line += f"   (before {baseline[name]:.1f})"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare offset and cursor pagination of a purchase history as pages get deeper.
+Seeds one user with enough purchases to reach the last page, then times the
+same page fetched with OFFSET and with a (created_at, id) cursor.
+
+Without --database-url a temporary SQLite file is used; point it at a scratch
+PostgreSQL database for numbers that match production.
+
+Usage: python scripts/benchmark_pagination.py [--database-url postgresql://...]
+       [--page-size 20] [--pages 1 10 100 1000] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+
+from app.db.migrations import upgrade_database
+from app.db.pagination import Keyset
+from app.models.branch import Branch
+from app.models.purchase import Purchase
+from app.models.user import User
+
+
+HISTORY_ORDER = Keyset(Purchase.created_at, Purchase.id)
+
+
+def seed_history(connection, purchases: int) -> int:
+    """Create a user with a long purchase history, return the user id"""
+    suffix = uuid.uuid4().hex[:8]
+    user_id = connection.execute(insert(User).returning(User.id), {
+        "email": f"pagination_{suffix}@benchmark.test",
+        "hashed_password": "x",
+        "first_name": "Pagination",
+        "last_name": "Benchmark"
+    }).scalar_one()
+    branch_id = connection.execute(insert(Branch).returning(Branch.id), {
+        "name": f"Benchmark {suffix}",
+        "address": "Street 1",
+        "city": "Lima",
+        "state": "Lima",
+        "country": "PE"
+    }).scalar_one()
+
+    now = datetime.utcnow()
+    connection.execute(insert(Purchase), [
+        {
+            "purchase_code": f"PUR-{suffix}-{index}",
+            "user_id": user_id,
+            "branch_id": branch_id,
+            "total_amount": 10.0,
+            "created_at": now - timedelta(seconds=index // 2)  # pairs share a timestamp
+        }
+        for index in range(purchases)
+    ])
+    return user_id
+
+
+def median_ms(connection, query, repeat: int) -> float:
+    """Median time to fetch one page"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(query).all()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", help="Scratch database, a temporary SQLite file by default")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20, help="Fetches per measurement")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+    upgrade_database(url=database_url)
+    engine = create_engine(database_url)
+
+    deepest = max(args.pages)
+    with engine.begin() as connection:
+        print(f"Seeding {deepest * args.page_size} purchases...")
+        user_id = seed_history(connection, deepest * args.page_size)
+
+    query = select(Purchase.id, Purchase.purchase_code, Purchase.created_at).where(Purchase.user_id == user_id)
+
+    with engine.connect() as connection:
+        # Cursors are only reachable by walking, keep the one leading to each page
+        cursors = {1: None}
+        for page in range(1, deepest):
+            rows = connection.execute(HISTORY_ORDER.paginate(query, cursors[page], 0, args.page_size)).all()
+            cursors[page + 1] = HISTORY_ORDER.next_cursor(rows, args.page_size)
+
+        print(f"{'page':>6} {'offset ms':>12} {'cursor ms':>12}")
+        for page in sorted(args.pages):
+            offset_query = HISTORY_ORDER.paginate(query, None, (page - 1) * args.page_size, args.page_size)
+            cursor_query = HISTORY_ORDER.paginate(query, cursors[page], 0, args.page_size)
+            print(
+                f"{page:>6} {median_ms(connection, offset_query, args.repeat):>12.3f} "
+                f"{median_ms(connection, cursor_query, args.repeat):>12.3f}"
+            )
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark QR rendering for the legacy JSON payload vs the compact signed token
+
+Usage: python scripts/benchmark_qr_formats.py [--items 5] [--iterations 200]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.qr_renderer import build_qr, render_qr_png
+from app.services.qr_token import encode_purchase_token, decode_purchase_token
+
+
+def legacy_payload(num_items: int) -> str:
+    """Build a legacy purchase QR payload like create_purchase used to"""
+    items = [
+        {
+            "name": f"Menu item {i}",
+            "waste_type_id": i % 6 + 1,
+            "waste_type_name": "Plástico PET",
+            "waste_type_category": "plastic",
+            "bin_color": "yellow",
+            "quantity": 1,
+            "points": 15
+        }
+        for i in range(num_items)
+    ]
+    return json.dumps({
+        "purchase_id": 123456,
+        "purchase_code": "ECO-1A2B3C4D",
+        "user_id": 4321,
+        "branch_id": 12,
+        "items": items
+    }, ensure_ascii=False)
+
+
+def compact_payload() -> str:
+    """Build a compact signed purchase token"""
+    return encode_purchase_token(123456, 4321, datetime.utcnow() + timedelta(hours=24))
+
+
+def measure(payload: str, iterations: int) -> dict:
+    """Render a payload repeatedly and collect timings and sizes"""
+    timings = []
+    png_bytes = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        png_bytes = render_qr_png(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "payload_chars": len(payload),
+        "qr_version": build_qr(payload).version,
+        "png_bytes": len(png_bytes),
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=5, help="Items in the legacy payload")
+    parser.add_argument("--iterations", type=int, default=200, help="Renders per format")
+    args = parser.parse_args()
+
+    token = compact_payload()
+    decode_purchase_token(token)
+
+    results = {
+        "legacy_json": measure(legacy_payload(args.items), args.iterations),
+        "compact_token": measure(token, args.iterations)
+    }
+
+    print(f"QR render benchmark ({args.items} items, {args.iterations} iterations)")
+    print(f"{'format':<15}{'chars':>8}{'version':>9}{'png bytes':>11}{'mean ms':>10}{'p95 ms':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<15}{result['payload_chars']:>8}{result['qr_version']:>9}"
+            f"{result['png_bytes']:>11}{result['mean_ms']:>10.2f}{result['p95_ms']:>9.2f}"
+        )
+
+    legacy, compact = results["legacy_json"], results["compact_token"]
+    print(
+        f"\nRender time reduction: {(1 - compact['mean_ms'] / legacy['mean_ms']) * 100:.1f}% - "
+        f"Image size reduction: {(1 - compact['png_bytes'] / legacy['png_bytes']) * 100:.1f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Measure worker startup: cold import of the application in a fresh interpreter
+and the startup work done before the first request. With --legacy the old
+path (create_all plus one create_index round trip per MongoDB index) is
+timed against the same databases for comparison.
+
+Usage: python scripts/benchmark_startup.py [--runs 10] [--legacy]
+"""
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import os
+import time
+from typing import List
+
+# Add app to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+
+def summarize(name: str, samples: List[float]):
+    """Print median and worst time in milliseconds"""
+    print(
+        f"{name:<28} median {statistics.median(samples) * 1000:8.1f} ms   "
+        f"max {max(samples) * 1000:8.1f} ms   ({len(samples)} runs)"
+    )
+
+
+def time_cold_import(runs: int) -> List[float]:
+    """Import app.main in a new interpreter per run, nothing is cached in-process"""
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+async def time_schema_check(runs: int) -> List[float]:
+    """Startup check against a fresh engine, so each run pays for its first connection"""
+    from app.db.migrations import check_schema_current
+    from app.db.session import close_db_connections
+    
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await check_schema_current()
+        samples.append(time.perf_counter() - start)
+        await close_db_connections()
+    return samples
+
+
+async def time_legacy_startup(runs: int) -> List[float]:
+    """Previous startup: create_all and awaiting each MongoDB index on its own"""
+    from app.db.migrations import MONGODB_INDEXES
+    from app.db.session import Base, close_db_connections, get_engine, get_mongodb
+    from app.models import user, branch, purchase, recycling, reward, waste_type  # noqa: F401
+    
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        Base.metadata.create_all(bind=get_engine())
+        database = get_mongodb()
+        for collection_name, indexes in MONGODB_INDEXES.items():
+            for keys in indexes:
+                await database[collection_name].create_index(keys)
+        samples.append(time.perf_counter() - start)
+        await close_db_connections()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10, help="Measurements per phase")
+    parser.add_argument("--legacy", action="store_true", help="Also time create_all and index creation")
+    args = parser.parse_args()
+    
+    summarize("cold import app.main", time_cold_import(args.runs))
+    summarize("startup schema check", asyncio.run(time_schema_check(args.runs)))
+    if args.legacy:
+        summarize("legacy create_all + indexes", asyncio.run(time_legacy_startup(args.runs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Pick the bcrypt cost for this machine: times one hash at each cost and
+recommends the highest one that stays within PASSWORD_HASH_BUDGET_MS. Run it
+on the hardware the API is deployed on and set BCRYPT_ROUNDS to the result;
+existing users are rehashed at the new cost on their next login.
+
+Usage: python scripts/calibrate_bcrypt.py [--budget-ms 250] [--max-rounds 16] [--samples 3]
+"""
+
+import argparse
+import sys
+import os
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.security import BCRYPT_MIN_ROUNDS, calibrate_bcrypt_rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=settings.PASSWORD_HASH_BUDGET_MS, help="Target time for one hash")
+    parser.add_argument("--min-rounds", type=int, default=BCRYPT_MIN_ROUNDS, help="Lowest cost to consider")
+    parser.add_argument("--max-rounds", type=int, default=16, help="Highest cost to consider")
+    parser.add_argument("--samples", type=int, default=3, help="Hashes timed per cost, the median is used")
+    args = parser.parse_args()
+
+    print(f"Calibrating bcrypt for a {args.budget_ms:.0f} ms budget...")
+    rounds, timings = calibrate_bcrypt_rounds(args.budget_ms, args.min_rounds, args.max_rounds, args.samples)
+
+    for cost, elapsed_ms in timings.items():
+        marker = "  <- recommended" if cost == rounds else ""
+        print(f"cost {cost:>2}: {elapsed_ms:>8.1f} ms{marker}")
+
+    if timings[rounds] > args.budget_ms:
+        print(f"⚠️  Even cost {rounds} exceeds the budget, not going lower")
+    if rounds != settings.BCRYPT_ROUNDS:
+        print(f"Currently BCRYPT_ROUNDS={settings.BCRYPT_ROUNDS}, hashes will be upgraded on login after the change")
+    print(f"BCRYPT_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,8 @@ from datetime import datetime, timedelta, timezone
 # Add app to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.db.session import SessionLocal, init_db
+from app.db.session import SessionLocal
+from app.db.migrations import upgrade_database, create_mongodb_indexes
 from app.models.user import User
 from app.models.branch import Branch
 from app.models.waste_type import WasteType
@@ -303,8 +304,9 @@ async def main():
     print("🌱 Initializing EcoRewards database with sample data...")
     
     try:
-        # Initialize database
-        await init_db()
+        # Apply schema migrations and MongoDB indexes
+        upgrade_database()
+        create_mongodb_indexes()
         
         # Create sample data
         db = SessionLocal()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Apply database migrations: Alembic revisions on PostgreSQL and MongoDB indexes.
+Run once per deploy, before starting the API workers.
+
+Usage: python scripts/migrate.py [--revision head] [--skip-sql] [--skip-mongo]
+"""
+
+import argparse
+import sys
+import os
+
+# Add app to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.migrations import upgrade_database, create_mongodb_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revision", default="head", help="Alembic revision to upgrade to")
+    parser.add_argument("--skip-sql", action="store_true", help="Do not run PostgreSQL migrations")
+    parser.add_argument("--skip-mongo", action="store_true", help="Do not create MongoDB indexes")
+    args = parser.parse_args()
+    
+    if not args.skip_sql:
+        print(f"Upgrading PostgreSQL schema to {args.revision}...")
+        upgrade_database(args.revision)
+    
+    if not args.skip_mongo:
+        print("Creating MongoDB indexes...")
+        create_mongodb_indexes()
+    
+    print("✅ Migrations applied")
+
+
+if __name__ == "__main__":
+    main()
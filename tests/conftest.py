@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+import app.core.rate_limit
+import app.core.redis
+import app.core.token_revocation
+from app.core.config import settings
+
+
+class FakeRedis:
+    """In-process stand-in for the redis.asyncio commands the app uses, values are bytes like Redis returns"""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.sorted_sets = {}
+
+    def _expire(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    async def get(self, key):
+        self._expire(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = self._encode(value)
+        if ex is not None:
+            self.expires[key] = time.time() + ex
+        else:
+            self.expires.pop(key, None)
+        return True
+
+    async def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    async def exists(self, *keys):
+        for key in keys:
+            self._expire(key)
+        return sum(key in self.values for key in keys)
+
+    async def zadd(self, name, mapping):
+        members = self.sorted_sets.setdefault(name, {})
+        added = sum(member not in members for member in mapping)
+        members.update(mapping)
+        return added
+
+    async def zrangebyscore(self, name, min, max, withscores=False):
+        low, high = float(min), float(max)
+        members = sorted(self.sorted_sets.get(name, {}).items(), key=lambda item: item[1])
+        return [
+            (self._encode(member), score) if withscores else self._encode(member)
+            for member, score in members
+            if low <= score <= high
+        ]
+
+    async def zremrangebyscore(self, name, min, max):
+        low, high = float(min), float(max)
+        members = self.sorted_sets.get(name, {})
+        removed = [member for member, score in members.items() if low <= score <= high]
+        for member in removed:
+            del members[member]
+        return len(removed)
+
+    def register_script(self, source):
+        if source != app.core.rate_limit.RECONCILE_SCRIPT:
+            raise NotImplementedError("FakeRedis only runs the rate limit reconciliation script")
+        return self._reconcile
+
+    async def _reconcile(self, keys, args):
+        """RECONCILE_SCRIPT in Python"""
+        rate, capacity = float(args[0]), float(args[1])
+        now = time.time()
+        remaining = []
+        for key, consumed in zip(keys, args[3:]):
+            bucket = self.values.get(key) or {}
+            tokens = bucket.get("tokens", capacity)
+            updated_at = bucket.get("updated_at", now)
+            tokens = min(capacity, tokens + max(0, now - updated_at) * rate)
+            tokens = max(-capacity, tokens - float(consumed))
+            self.values[key] = {"tokens": tokens, "updated_at": now}
+            remaining.append(str(tokens).encode())
+        return remaining
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture(autouse=True)
+def local_redis(monkeypatch, fake_redis):
+    """Point the shared Redis client at a fresh stand-in for every test"""
+    monkeypatch.setattr(app.core.redis, "_redis", fake_redis)
+    monkeypatch.setattr(app.core.token_revocation, "_revocation_list", None)
+    return fake_redis
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    """Tests make many requests from one client, rate limit tests enable the limiter themselves"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(app.core.rate_limit, "_limiter", None)
+
+
+@pytest.fixture(autouse=True)
+def query_count_header(monkeypatch):
+    """Query budget tests read the per-request statement count from the response"""
+    monkeypatch.setattr(settings, "SQL_QUERY_COUNT_HEADER", True)
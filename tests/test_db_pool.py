@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.metrics import metrics
+from app.db.pool_metrics import InstrumentedQueuePool, instrument_engine
+
+
+@pytest.fixture
+def pool_engine(tmp_path):
+    """Single-connection instrumented engine on a temporary SQLite file"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+        pool_logging_name="pool_test"
+    )
+    instrument_engine(engine, "pool_test")
+    yield engine
+    engine.dispose()
+
+
+def test_pool_metrics_recorded(pool_engine):
+    """Test checkouts, connection age and hold time are recorded per engine"""
+    waits_before = metrics.summary("db.pool.pool_test.checkout_wait_seconds").count
+    holds_before = metrics.summary("db.pool.pool_test.checkout_hold_seconds").count
+
+    with pool_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        status = metrics.snapshot()["db.pool.pool_test.status"]
+        assert status["checked_out"] == 1
+        assert status["saturation"] == 1.0
+
+    snapshot = metrics.snapshot()
+    assert snapshot["db.pool.pool_test.status"]["checked_out"] == 0
+    assert snapshot["db.pool.pool_test.connects"] >= 1
+    assert metrics.summary("db.pool.pool_test.checkout_wait_seconds").count == waits_before + 1
+    assert metrics.summary("db.pool.pool_test.checkout_hold_seconds").count == holds_before + 1
+    assert snapshot["db.pool.pool_test.connection_age_seconds"]["count"] >= 1
+
+
+def test_pool_exhaustion_counted(pool_engine):
+    """Test checkouts that time out on a saturated pool are counted"""
+    timeouts = metrics.counter("db.pool.pool_test.checkout_timeouts")
+    timeouts_before = timeouts.value
+
+    with pool_engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            pool_engine.connect()
+
+    assert timeouts.value == timeouts_before + 1
+    assert metrics.summary("db.pool.pool_test.checkout_wait_seconds").snapshot()["max"] >= 0.1
@@ -0,0 +1,165 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+from pymongo.errors import ConnectionFailure
+
+from app.core.metrics import metrics
+from app.services.event_log import EventOverflowPolicy, MongoEventWriter
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    async def insert_many(self, documents, ordered=True):
+        if self.database.down:
+            raise ConnectionFailure("MongoDB is down")
+        self.database.batches[self.name].append(list(documents))
+
+
+class FakeDatabase:
+    """Records insert_many batches per collection, fails while down"""
+
+    def __init__(self):
+        self.down = False
+        self.batches = defaultdict(list)
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    def documents(self, name):
+        return [document for batch in self.batches[name] for document in batch]
+
+
+@pytest.mark.asyncio
+async def test_events_batched_per_collection():
+    """Test buffered events are written with one insert_many per collection"""
+    database = FakeDatabase()
+    writer = MongoEventWriter(database, batch_size=100)
+    for index in range(3):
+        await writer.write("recycling_events", {"n": index})
+    await writer.write("ai_validations", {"n": 0})
+
+    assert database.batches == {}
+    assert await writer.flush() == 4
+    assert [len(batch) for batch in database.batches["recycling_events"]] == [3]
+    assert [len(batch) for batch in database.batches["ai_validations"]] == [1]
+    assert writer.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_on_size_and_shutdown():
+    """Test the background task flushes a full batch early and stop writes the rest"""
+    database = FakeDatabase()
+    writer = MongoEventWriter(database, batch_size=2, flush_interval=60)
+    writer.start()
+    await writer.write("system_logs", {"n": 0})
+    await writer.write("system_logs", {"n": 1})
+    await asyncio.sleep(0.05)
+    assert len(database.documents("system_logs")) == 2
+
+    await writer.write("system_logs", {"n": 2})
+    await writer.stop()
+    assert [document["n"] for document in database.documents("system_logs")] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy():
+    """Test a full queue drops its oldest event and counts it"""
+    dropped = metrics.counter("mongo_events.dropped")
+    dropped_before = dropped.value
+    database = FakeDatabase()
+    writer = MongoEventWriter(database, max_queue_size=2, policy=EventOverflowPolicy.DROP_OLDEST)
+    for index in range(3):
+        assert await writer.write("system_logs", {"n": index})
+
+    await writer.flush()
+    assert [document["n"] for document in database.documents("system_logs")] == [1, 2]
+    assert dropped.value == dropped_before + 1
+
+
+@pytest.mark.asyncio
+async def test_block_policy_times_out():
+    """Test a blocked write gives up after the timeout when nothing drains the queue"""
+    writer = MongoEventWriter(FakeDatabase(), max_queue_size=1, policy=EventOverflowPolicy.BLOCK, block_timeout=0.05)
+    assert await writer.write("system_logs", {"n": 0})
+    assert not await writer.write("system_logs", {"n": 1})
+    assert writer.depth == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_requeued():
+    """Test events survive a MongoDB outage in memory and are written once it recovers"""
+    database = FakeDatabase()
+    database.down = True
+    writer = MongoEventWriter(database)
+    await writer.write("system_logs", {"n": 0})
+
+    assert await writer.flush() == 0
+    assert writer.depth == 1
+
+    database.down = False
+    assert await writer.flush() == 1
+    assert database.documents("system_logs") == [{"n": 0}]
+
+
+@pytest.mark.asyncio
+async def test_spill_and_replay(tmp_path):
+    """Test overflow and failed batches go to disk and are replayed after recovery"""
+    spill_path = tmp_path / "spill" / "events.jsonl"
+    database = FakeDatabase()
+    database.down = True
+    writer = MongoEventWriter(
+        database,
+        max_queue_size=2,
+        policy=EventOverflowPolicy.SPILL,
+        spill_path=str(spill_path)
+    )
+    for index in range(3):
+        assert await writer.write("system_logs", {"n": index})
+    assert spill_path.exists()
+
+    await writer.flush()
+    assert writer.depth == 0
+    assert len(spill_path.read_text().splitlines()) == 3
+
+    database.down = False
+    await writer.flush()
+    assert sorted(document["n"] for document in database.documents("system_logs")) == [0, 1, 2]
+    assert not spill_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_replay_interrupted_by_outage(tmp_path):
+    """Test replay reads the spill file batch by batch and spills what is left when MongoDB fails again"""
+    spill_path = tmp_path / "events.jsonl"
+    database = FakeDatabase()
+    database.down = True
+    writer = MongoEventWriter(database, batch_size=2, policy=EventOverflowPolicy.SPILL, spill_path=str(spill_path))
+    for index in range(5):
+        await writer.write("system_logs", {"n": index})
+    while writer.depth:
+        await writer.flush()
+    assert len(spill_path.read_text().splitlines()) == 5
+
+    database.down = False
+    insert = writer._insert
+
+    async def fail_after_first_batch(events):
+        if database.batches:
+            database.down = True
+        return await insert(events)
+
+    writer._insert = fail_after_first_batch
+    await writer.flush()
+    assert [len(batch) for batch in database.batches["system_logs"]] == [2]
+    assert len(spill_path.read_text().splitlines()) == 3
+    assert not (tmp_path / "events.jsonl.replay").exists()
+
+    database.down = False
+    writer._insert = insert
+    await writer.flush()
+    assert sorted(document["n"] for document in database.documents("system_logs")) == [0, 1, 2, 3, 4]
+    assert not spill_path.exists()
@@ -1,9 +1,38 @@
+import asyncio
+import io
+import json
 import pytest
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from fastapi import Request
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from passlib.hash import bcrypt
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.db.session import get_db, Base
+from app.core.config import settings
+from app.core.principal_cache import principal_cache, invalidate_principal
+from app.core.token_revocation import get_revocation_list
+from app.db.session import (
+    get_db,
+    get_async_db,
+    Base,
+    RoutingSession,
+    requires_primary,
+    READ_YOUR_WRITES_HEADER
+)
+from app.db.pagination import NEXT_CURSOR_HEADER
+from app.models.branch import Branch
+from app.models.user import User
+from app.models.purchase import Purchase
+from app.models.recycling import RecyclingEvent
+from app.models.reward import Reward, RewardType, UserReward
+from app.models.waste_type import WasteType
+from app.services.qr_gc import sweep_expired_batch, DeleteThrottle
+from app.services.qr_service import generate_redemption_qr, qr_artifact_key, qr_image_cache, shutdown_render_executor
 
 
 # Create test database
@@ -11,6 +40,10 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient may run each request on a fresh event loop, so async connections are not pooled
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -23,7 +56,13 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 client = TestClient(app)
 
@@ -42,6 +81,14 @@ def test_root_endpoint():
     assert "EcoRewards API" in response.json()["message"]
 
 
+def test_query_count_header_disabled(monkeypatch):
+    """Test the statement count is not sent to clients unless enabled"""
+    monkeypatch.setattr(settings, "SQL_QUERY_COUNT_HEADER", False)
+    response = client.get("/api/v1/branches/")
+    assert response.status_code == 200
+    assert "x-db-query-count" not in response.headers
+
+
 def test_register_user():
     """Test user registration"""
     user_data = {
@@ -111,6 +158,31 @@ def test_login_invalid_credentials():
     assert response.status_code == 401
 
 
+def test_login_rehashes_outdated_password_hash():
+    """Test a password hashed at another bcrypt cost is rehashed at the configured cost on login"""
+    email = f"rehash_{uuid.uuid4().hex[:8]}@example.com"
+    get_auth_headers(email)
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == email).update({
+            "hashed_password": bcrypt.using(rounds=4).hash("TestPassword123")
+        })
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": "TestPassword123"})
+    assert response.status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        hashed_password = db.query(User.hashed_password).filter(User.email == email).scalar()
+    finally:
+        db.close()
+    assert bcrypt.from_string(hashed_password).rounds == settings.BCRYPT_ROUNDS
+    assert client.post("/api/v1/auth/login", json={"email": email, "password": "TestPassword123"}).status_code == 200
+
+
 def test_get_user_profile_without_auth():
     """Test getting user profile without authentication"""
     response = client.get("/api/v1/users/profile")
@@ -188,3 +260,548 @@ def test_invalid_email_format():
     
     response = client.post("/api/v1/auth/register", json=invalid_email_data)
     assert response.status_code == 422  # Validation error
+
+
+def get_auth_headers(email: str) -> dict:
+    """Register and login a user, return authorization headers"""
+    client.post("/api/v1/auth/register", json={
+        "email": email,
+        "password": "TestPassword123",
+        "first_name": "Test",
+        "last_name": "User"
+    })
+    login_response = client.post("/api/v1/auth/login", json={
+        "email": email,
+        "password": "TestPassword123"
+    })
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+
+def create_purchase(headers: dict) -> dict:
+    """Create a branch, waste type and purchase, return the purchase response"""
+    db = TestingSessionLocal()
+    try:
+        branch = Branch(name="Test Branch", address="Main St 1", city="Lima", state="Lima", country="PE")
+        waste_type = WasteType(name=f"Cup {uuid.uuid4().hex[:8]}", category="paper", bin_color="blue", recycling_points=10)
+        db.add_all([branch, waste_type])
+        db.commit()
+        branch_id, waste_type_id = branch.id, waste_type.id
+    finally:
+        db.close()
+
+    response = client.post("/api/v1/purchases/", headers=headers, json={
+        "branch_id": branch_id,
+        "total_amount": 12.5,
+        "items": [{"name": "Coffee", "waste_type_id": waste_type_id, "quantity": 2}]
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_purchase_qr_rendered_lazily(tmp_path, monkeypatch):
+    """Test purchase QR images are rendered on request with caching headers"""
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    headers = get_auth_headers("qr_image_test@example.com")
+
+    purchase = create_purchase(headers)
+    assert purchase["qr_code_url"] == f"/api/v1/purchases/{purchase['id']}/qr.png"
+    assert not list(tmp_path.rglob("*.png"))
+
+    response = client.get(purchase["qr_code_url"], headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG")
+    assert response.headers["cache-control"].startswith("private, max-age=")
+    etag = response.headers["etag"]
+
+    cached = client.get(purchase["qr_code_url"], headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    svg = client.get(f"/api/v1/purchases/{purchase['id']}/qr.svg", headers=headers)
+    assert svg.status_code == 200
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert svg.headers["etag"] != etag
+
+
+def test_batch_purchase_qr(tmp_path, monkeypatch):
+    """Test QR codes for several purchases are reprinted in one request"""
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    headers = get_auth_headers("qr_batch_test@example.com")
+    purchases = [create_purchase(headers), create_purchase(headers)]
+    purchase_ids = [purchase["id"] for purchase in purchases]
+
+    response = client.post("/api/v1/purchases/qr/batch", headers=headers, json={
+        "purchase_ids": purchase_ids + [999999]
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["x-skipped-purchase-ids"] == "999999"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == sorted(f"{p['purchase_code']}.png" for p in purchases)
+
+    sheet = client.post("/api/v1/purchases/qr/batch", headers=headers, json={
+        "purchase_ids": purchase_ids,
+        "output": "sheet"
+    })
+    assert sheet.status_code == 200
+    assert sheet.content.startswith(b"%PDF")
+
+    # Purchases of other users are not reprinted
+    other_headers = get_auth_headers("qr_batch_other@example.com")
+    response = client.post("/api/v1/purchases/qr/batch", headers=other_headers, json={
+        "purchase_ids": purchase_ids
+    })
+    assert response.status_code == 404
+
+
+def test_expired_qr_artifacts_swept(tmp_path, monkeypatch):
+    """Test expired purchase QR images are deleted from the upload folder"""
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    headers = get_auth_headers("qr_gc_test@example.com")
+    purchase = create_purchase(headers)
+    assert client.get(purchase["qr_code_url"], headers=headers).status_code == 200
+    assert len(list(tmp_path.rglob("*.png"))) == 1
+
+    db = TestingSessionLocal()
+    try:
+        expired = db.query(Purchase).filter(Purchase.id == purchase["id"]).first()
+        expired.qr_expires_at = datetime.utcnow() - timedelta(days=1)
+        db.commit()
+
+        totals = sweep_expired_batch(db, datetime.utcnow(), 100, DeleteThrottle(0))
+
+        db.refresh(expired)
+        assert expired.qr_code_url is None
+    finally:
+        db.close()
+
+    assert totals["files"] == 1
+    assert totals["bytes"] > 0
+    assert not list(tmp_path.rglob("*.png"))
+
+
+def test_expired_redemption_qr_dropped_from_cache(tmp_path, monkeypatch):
+    """Test sweeping an expired redemption deletes its QR image and forgets the cached copy"""
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(settings, "QR_RENDER_EXECUTOR", "thread")
+    email = f"qr_gc_reward_{uuid.uuid4().hex[:8]}@example.com"
+    get_auth_headers(email)
+    shutdown_render_executor()
+    redemption_code = f"RWD-{uuid.uuid4().hex[:10].upper()}"
+    qr_code_url = asyncio.run(generate_redemption_qr(redemption_code, {"reward_id": 1}))
+    shutdown_render_executor()
+    key = qr_artifact_key(qr_code_url)
+    assert key in qr_image_cache
+
+    db = TestingSessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.email == email).scalar()
+        reward = Reward(name="Sweep", type=RewardType.VOUCHER, points_required=10)
+        db.add(reward)
+        db.flush()
+        db.add(UserReward(
+            user_id=user_id,
+            reward_id=reward.id,
+            redemption_code=redemption_code,
+            points_spent=10,
+            qr_code_url=qr_code_url,
+            expires_at=datetime.utcnow() - timedelta(days=1)
+        ))
+        db.commit()
+
+        totals = sweep_expired_batch(db, datetime.utcnow(), 100, DeleteThrottle(0))
+    finally:
+        db.close()
+
+    assert totals["files"] == 1
+    assert key not in qr_image_cache
+    assert not list(tmp_path.rglob("*.png"))
+
+
+def test_forged_qr_rejected_without_queries():
+    """Test an unsigned, well-formed QR payload is refused before any database access"""
+    headers = get_auth_headers(f"forged_qr_{uuid.uuid4().hex[:8]}@example.com")
+    user_id = client.get("/api/v1/users/profile", headers=headers).json()["id"]
+    forged = json.dumps({
+        "purchase_id": 1,
+        "purchase_code": "ECO-FORGED",
+        "user_id": user_id,
+        "branch_id": 1,
+        "items": [{"name": "Cup", "waste_type_id": 1, "waste_type_name": "Paper", "waste_type_category": "paper"}]
+    })
+
+    response = client.post("/api/v1/recycling/scan-qr", headers=headers, json={"qr_code_data": forged})
+    assert response.status_code == 422
+    assert "no longer accepted" in response.text
+    # The principal is cached by the profile request, nothing else is read
+    assert response.headers["x-db-query-count"] == "0"
+
+
+def test_purchase_history_and_details():
+    """Test purchase endpoints return related data loaded by the async session"""
+    headers = get_auth_headers("purchase_history_test@example.com")
+    purchase = create_purchase(headers)
+    assert purchase["potential_points"] == 20
+    assert purchase["items"][0]["waste_type"]["bin_color"] == "blue"
+
+    response = client.get("/api/v1/purchases/", headers=headers)
+    assert response.status_code == 200
+    assert response.json()[0]["branch_name"] == "Test Branch"
+
+    response = client.get(f"/api/v1/purchases/{purchase['id']}", headers=headers)
+    assert response.status_code == 200
+    details = response.json()
+    assert details["branch"]["name"] == "Test Branch"
+    assert details["items"][0]["name"] == "Coffee"
+    assert details["items"][0]["waste_type"]["category"] == "paper"
+
+
+def create_history(headers: dict, count: int):
+    """Create purchases, recycling events and redeemed rewards for the user, two share a timestamp"""
+    purchases = [create_purchase(headers) for _ in range(count)]
+    now = datetime.utcnow()
+    created = [now - timedelta(minutes=max(index, 1)) for index in range(count)]
+
+    db = TestingSessionLocal()
+    try:
+        user_id = db.get(Purchase, purchases[0]["id"]).user_id
+        reward = Reward(name="Coffee", type=RewardType.VOUCHER, points_required=10)
+        db.add(reward)
+        db.flush()
+        for purchase, created_at in zip(purchases, created):
+            db.get(Purchase, purchase["id"]).created_at = created_at
+            db.add(RecyclingEvent(
+                event_code=f"REC-{uuid.uuid4().hex[:8].upper()}",
+                user_id=user_id,
+                purchase_id=purchase["id"],
+                branch_id=purchase["branch"]["id"],
+                created_at=created_at
+            ))
+            db.add(UserReward(
+                user_id=user_id,
+                reward_id=reward.id,
+                redemption_code=f"RWD-{uuid.uuid4().hex[:10].upper()}",
+                points_spent=10,
+                created_at=created_at
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/purchases/",
+    "/api/v1/users/purchases",
+    "/api/v1/recycling/history",
+    "/api/v1/rewards/user/my-rewards"
+])
+def test_list_endpoint_query_budget(path):
+    """Test list endpoints run a fixed number of queries regardless of page size"""
+    email = f"query_budget_{uuid.uuid4().hex[:8]}@example.com"
+    headers = get_auth_headers(email)
+    create_history(headers, 3)
+
+    principal_cache.clear()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+
+    # One query authenticates the user, one loads the whole page
+    assert response.headers["x-db-query-count"] == "2"
+
+    # Once the principal is cached only the page is loaded
+    response = client.get(path, headers=headers)
+    assert response.headers["x-db-query-count"] == "1"
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/purchases/",
+    "/api/v1/users/purchases",
+    "/api/v1/recycling/history",
+    "/api/v1/rewards/user/my-rewards"
+])
+@pytest.mark.parametrize("limit", [2, 5])
+def test_cursor_pagination(path, limit):
+    """Test cursor pages follow the offset order without gaps, repeats or a trailing empty page"""
+    headers = get_auth_headers(f"cursor_{uuid.uuid4().hex[:8]}@example.com")
+    create_history(headers, 5)
+    expected = [item["id"] for item in client.get(path, headers=headers).json()]
+    assert len(expected) == 5
+
+    seen = []
+    pages = 0
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, headers=headers, params=params)
+        assert response.status_code == 200
+        page = [item["id"] for item in response.json()]
+        assert 0 < len(page) <= limit
+        seen.extend(page)
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    # A total that is an exact multiple of the limit ends on a full page, not an empty one
+    assert seen == expected
+    assert pages == -(-len(expected) // limit)
+    assert [item["id"] for item in client.get(path, headers=headers, params={"limit": 2, "offset": 2}).json()] == expected[2:4]
+
+    response = client.get(path, headers=headers, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 422
+
+
+def test_full_user_loaded_in_one_query():
+    """Test endpoints needing the ORM user load it once and refresh the cached principal from it"""
+    headers = get_auth_headers(f"full_user_{uuid.uuid4().hex[:8]}@example.com")
+    principal_cache.clear()
+
+    response = client.get("/api/v1/users/points", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == "1"
+
+    # Endpoints needing only the principal are served from the cache
+    response = client.get("/api/v1/recycling/history", headers=headers)
+    assert response.headers["x-db-query-count"] == "1"
+
+
+def test_principal_cache_invalidated_on_user_changes():
+    """Test profile and activation changes are seen by the next request despite the cached principal"""
+    email = f"principal_{uuid.uuid4().hex[:8]}@example.com"
+    headers = get_auth_headers(email)
+    assert client.get("/api/v1/purchases/", headers=headers).status_code == 200
+    user_id = client.get("/api/v1/users/profile", headers=headers).json()["id"]
+
+    response = client.put("/api/v1/users/profile", headers=headers, json={"first_name": "Renamed"})
+    assert response.status_code == 200
+    assert asyncio.run(principal_cache.get(user_id)) is None
+
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.id == user_id).update({"is_active": False})
+        db.commit()
+    finally:
+        db.close()
+    asyncio.run(invalidate_principal(user_id))
+    assert client.get("/api/v1/purchases/", headers=headers).status_code == 401
+
+
+def test_logout_revokes_tokens():
+    """Test logout revokes the access token and the caller's refresh token"""
+    email = f"logout_{uuid.uuid4().hex[:8]}@example.com"
+    get_auth_headers(email)
+    tokens = client.post("/api/v1/auth/login", json={"email": email, "password": "TestPassword123"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/v1/purchases/", headers=headers).status_code == 200
+
+    response = client.post("/api/v1/auth/logout", headers=headers, json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/purchases/", headers=headers).status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+    # Other sessions of the same user stay valid
+    assert client.get("/api/v1/purchases/", headers=get_auth_headers(email)).status_code == 200
+
+
+def test_admin_claims_and_role_changes():
+    """Test admin endpoints authorize from token claims and role changes refuse older tokens"""
+    admin_email = f"claims_admin_{uuid.uuid4().hex[:8]}@example.com"
+    get_auth_headers(admin_email)
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == admin_email).update({"is_admin": True})
+        db.commit()
+    finally:
+        db.close()
+    admin_headers = get_auth_headers(admin_email)
+
+    # Until the worker has synced role changes the claims are checked against the user
+    principal_cache.clear()
+    response = client.get("/api/v1/admin/sql-profile", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == "1"
+
+    # Authorized from the token alone
+    asyncio.run(get_revocation_list().sync())
+    response = client.get("/api/v1/admin/sql-profile", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == "0"
+
+    user_email = f"claims_user_{uuid.uuid4().hex[:8]}@example.com"
+    user_headers = get_auth_headers(user_email)
+    assert client.get("/api/v1/admin/sql-profile", headers=user_headers).status_code == 403
+    user_id = client.get("/api/v1/users/profile", headers=user_headers).json()["id"]
+
+    response = client.put(f"/api/v1/users/{user_id}/access", headers=user_headers, json={"is_admin": True})
+    assert response.status_code == 403
+    response = client.put(f"/api/v1/users/{user_id}/access", headers=admin_headers, json={"is_admin": True})
+    assert response.status_code == 200
+
+    # The token issued before the promotion is outdated, a new one carries the role
+    assert client.get("/api/v1/admin/sql-profile", headers=user_headers).status_code == 401
+    assert client.get("/api/v1/admin/sql-profile", headers=get_auth_headers(user_email)).status_code == 200
+
+    response = client.put(f"/api/v1/users/{user_id}/access", headers=admin_headers, json={"is_active": False})
+    assert response.status_code == 200
+    response = client.post("/api/v1/auth/login", json={"email": user_email, "password": "TestPassword123"})
+    assert response.status_code == 401
+
+
+def test_access_change_not_applied_when_redis_down(fake_redis, monkeypatch):
+    """Test a role change fails with 503 and leaves the user untouched when its version cannot be recorded"""
+    admin_email = f"access_admin_{uuid.uuid4().hex[:8]}@example.com"
+    get_auth_headers(admin_email)
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == admin_email).update({"is_admin": True})
+        db.commit()
+    finally:
+        db.close()
+    admin_headers = get_auth_headers(admin_email)
+    user_headers = get_auth_headers(f"access_user_{uuid.uuid4().hex[:8]}@example.com")
+    user_id = client.get("/api/v1/users/profile", headers=user_headers).json()["id"]
+
+    async def redis_down(*args, **kwargs):
+        raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr(fake_redis, "zadd", redis_down)
+    response = client.put(f"/api/v1/users/{user_id}/access", headers=admin_headers, json={"is_admin": True})
+    assert response.status_code == 503
+
+    db = TestingSessionLocal()
+    try:
+        user = db.get(User, user_id)
+        assert user.is_admin is False
+        assert user.authz_version == 0
+    finally:
+        db.close()
+
+
+def test_admin_dashboard_overview():
+    """Test the dashboard totals match the recycling events and its reads run as three statements"""
+    admin_email = f"dashboard_{uuid.uuid4().hex[:8]}@example.com"
+    headers = get_auth_headers(admin_email)
+    create_history(headers, 2)
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == admin_email).update({"is_admin": True, "total_points": 10 ** 9})
+        db.query(RecyclingEvent).update({"points_earned": 5, "accuracy_score": 80.0, "total_weight_recycled": 0.5})
+        db.commit()
+        total_events = db.query(RecyclingEvent).count()
+        active_users = db.query(User).filter(User.is_active == True).count()
+    finally:
+        db.close()
+
+    asyncio.run(get_revocation_list().sync())
+    response = client.get("/api/v1/admin/dashboard", headers=get_auth_headers(admin_email))
+    assert response.status_code == 200
+    # Overview, top branches and top users, the admin is authorized from the token
+    assert response.headers["x-db-query-count"] == "3"
+
+    dashboard = response.json()
+    assert dashboard["overview"]["total_recycling_events"] == total_events
+    assert dashboard["overview"]["total_points_awarded"] == 5 * total_events
+    assert dashboard["overview"]["total_waste_recycled"] == pytest.approx(0.5 * total_events)
+    assert dashboard["overview"]["recycling_accuracy_rate"] == pytest.approx(80.0)
+    assert dashboard["overview"]["active_users"] == active_users
+    assert dashboard["top_users"][0]["user_name"] == "Test User"
+    assert dashboard["top_users"][0]["total_points"] == 10 ** 9
+    assert len(dashboard["top_branches"]) >= 1
+
+
+def test_rate_limit_by_route_cost_and_client(monkeypatch):
+    """Test clients are limited by route cost, authenticated users in their own bucket"""
+    headers = get_auth_headers(f"rate_limit_{uuid.uuid4().hex[:8]}@example.com")
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 5)
+
+    for _ in range(5):
+        assert client.get("/api/v1/branches/").status_code == 200
+    response = client.get("/api/v1/branches/")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+    # Validation costs more than the 4 tokens left after one cheap request
+    assert client.get("/api/v1/recycling/history", headers=headers).status_code == 200
+    response = client.post("/api/v1/recycling/validate", headers=headers, json={})
+    assert response.status_code == 429
+    assert client.get("/api/v1/recycling/history", headers=headers).status_code == 200
+
+
+def test_routing_session_sends_reads_to_replica():
+    """Test read statements use the session's replica and writes use the primary"""
+    primary = create_async_engine("sqlite+aiosqlite://")
+    replica = create_async_engine("sqlite+aiosqlite://")
+    session = RoutingSession(bind=primary.sync_engine, info={"replica": replica})
+
+    assert session.get_bind(clause=select(User)) is replica.sync_engine
+    assert session.get_bind(clause=update(User).values(is_active=False)) is primary.sync_engine
+    assert RoutingSession(bind=primary.sync_engine).get_bind(clause=select(User)) is primary.sync_engine
+
+
+def test_read_your_writes_token():
+    """Test a successful write keeps the client's reads on the primary"""
+    headers = get_auth_headers("read_your_writes_test@example.com")
+    response = client.post("/api/v1/auth/login", json={
+        "email": "read_your_writes_test@example.com",
+        "password": "TestPassword123"
+    })
+    token = response.headers[READ_YOUR_WRITES_HEADER]
+
+    def request_with(header_value: str) -> Request:
+        return Request({
+            "type": "http",
+            "headers": [(READ_YOUR_WRITES_HEADER.lower().encode(), header_value.encode())]
+        })
+
+    assert requires_primary(request_with(token))
+    until, _, signature = token.partition(".")
+    assert not requires_primary(request_with(str(int(until) - settings.READ_YOUR_WRITES_SECONDS - 1)))
+    assert not requires_primary(request_with("garbage"))
+
+    # Clients cannot extend or forge the token to stay on the primary
+    far_future = str(int(until) + 10 ** 6)
+    assert not requires_primary(request_with(far_future))
+    assert not requires_primary(request_with(f"{far_future}.{signature}"))
+
+    # Reads do not issue tokens
+    response = client.get("/api/v1/purchases/", headers=headers)
+    assert READ_YOUR_WRITES_HEADER not in response.headers
+
+
+def test_sql_profile_attributes_queries_to_routes(monkeypatch):
+    """Test statements are aggregated per route template and slow ones are logged without values"""
+    email = f"sql_profile_{uuid.uuid4().hex[:8]}@example.com"
+    headers = get_auth_headers(email)
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == email).update({"is_admin": True})
+        db.commit()
+    finally:
+        db.close()
+
+    # Log in again for a token carrying the admin role
+    headers = get_auth_headers(email)
+    asyncio.run(get_revocation_list().sync())
+    client.delete("/api/v1/admin/sql-profile", headers=headers)
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0)
+    assert client.get("/api/v1/recycling/history", headers=headers).status_code == 200
+
+    response = client.get("/api/v1/admin/sql-profile", headers=headers)
+    assert response.status_code == 200
+    profile = response.json()
+    endpoints = {entry["endpoint"]: entry for entry in profile["endpoints"]}
+    # One query authenticates the user, one loads the page
+    assert endpoints["GET /api/v1/recycling/history"]["count"] == 2
+
+    slow = [entry for entry in profile["slow_queries"] if entry["endpoint"] == "GET /api/v1/recycling/history"]
+    assert slow
+    assert all(isinstance(shape, str) for entry in slow for shape in entry["parameters"])
+    assert email not in str(profile)
+
+    response = client.get("/api/v1/admin/sql-profile/export", headers=headers)
+    assert response.headers["content-disposition"] == 'attachment; filename="sql-profile.json"'
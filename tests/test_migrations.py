@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.migrations import check_schema_current, upgrade_database
+from app.db.session import Base
+from app.models import user, branch, purchase, recycling, reward, waste_type  # noqa: F401
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    """Temporary SQLite database upgraded to the latest revision"""
+    path = tmp_path / "migrated.db"
+    upgrade_database(url=f"sqlite:///{path}")
+    return path
+
+
+def test_migrations_match_models(migrated_db):
+    """Test the migrations produce exactly the schema declared by the models"""
+    engine = create_engine(f"sqlite:///{migrated_db}")
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    engine.dispose()
+    assert diff == []
+
+
+@pytest.mark.asyncio
+async def test_schema_check(migrated_db, tmp_path):
+    """Test the startup check accepts a migrated database and flags an unmigrated one"""
+    migrated = create_async_engine(f"sqlite+aiosqlite:///{migrated_db}", poolclass=NullPool)
+    empty = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.db'}", poolclass=NullPool)
+    try:
+        assert await check_schema_current(migrated) is True
+        assert await check_schema_current(empty) is False
+    finally:
+        await migrated.dispose()
+        await empty.dispose()
+
+
+def test_import_opens_no_connections():
+    """Test importing the application creates no engines or clients"""
+    code = "import app.main, app.db.session as s; print(sorted(s._lazy_state))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
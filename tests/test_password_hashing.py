@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.metrics import metrics
+from app.core.security import (
+    calibrate_bcrypt_rounds,
+    get_password_hash,
+    get_password_hash_async,
+    verify_password_async
+)
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_off_event_loop():
+    """Test bcrypt runs on the executor while the event loop keeps serving other work"""
+    hashed = get_password_hash("TestPassword123")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            verify_password_async("TestPassword123", hashed),
+            verify_password_async("WrongPassword123", hashed),
+            get_password_hash_async("OtherPassword123")
+        )
+    finally:
+        ticker_task.cancel()
+    elapsed = time.perf_counter() - start
+
+    assert results[0] is True
+    assert results[1] is False
+    assert results[2].startswith("$2b$")
+    # The loop ticked throughout instead of stalling for each hash
+    assert ticks >= elapsed / 0.005 / 4
+
+
+@pytest.mark.asyncio
+async def test_password_jobs_beyond_limit_rejected(monkeypatch):
+    """Test password work beyond the pending limit fails fast with a 503"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 1)
+    rejected = metrics.counter("password_hash.rejected")
+    rejected_before = rejected.value
+
+    results = await asyncio.gather(
+        get_password_hash_async("TestPassword123"),
+        get_password_hash_async("TestPassword123"),
+        return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1
+    assert isinstance(errors[0], ServiceUnavailableError)
+    assert errors[0].status_code == 503
+    assert rejected.value == rejected_before + 1
+    assert metrics.snapshot()["password_hash.queue_depth"] == 0
+
+
+def test_calibrate_bcrypt_rounds():
+    """Test calibration picks the highest cost within the budget and stops at the first one over it"""
+    rounds, timings = calibrate_bcrypt_rounds(budget_ms=60000, min_rounds=4, max_rounds=6, samples=1)
+    assert rounds == 6
+    assert list(timings) == [4, 5, 6]
+
+    rounds, timings = calibrate_bcrypt_rounds(budget_ms=0, min_rounds=4, max_rounds=6, samples=1)
+    assert rounds == 4
+    assert list(timings) == [4]
@@ -0,0 +1,43 @@
+import pytest
+
+from app.core.principal_cache import Principal, PrincipalCache, REDIS_KEY_PREFIX
+
+
+def make_principal(user_id: int, is_admin: bool = False) -> Principal:
+    return Principal(id=user_id, email=f"user{user_id}@example.com", is_active=True, is_admin=is_admin, is_verified=False)
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_expires_and_evicts(monkeypatch):
+    """Test entries expire after the TTL and the least recently used one is evicted"""
+    now = 1000.0
+    monkeypatch.setattr("app.core.principal_cache.time.monotonic", lambda: now)
+    cache = PrincipalCache(max_items=2, ttl=10)
+
+    await cache.put(make_principal(1))
+    await cache.put(make_principal(2))
+    assert (await cache.get(1)).id == 1
+    await cache.put(make_principal(3))
+    assert await cache.get(2) is None
+    assert await cache.get(1) is not None
+
+    now += 10
+    assert await cache.get(1) is None
+    assert cache.stats()["items"] == 1
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_redis_tier(fake_redis):
+    """Test a worker with an empty local cache is served from Redis and invalidation reaches Redis"""
+    worker_a = PrincipalCache(max_items=10, ttl=10, redis_ttl=60, redis_client=fake_redis)
+    worker_b = PrincipalCache(max_items=10, ttl=10, redis_ttl=60, redis_client=fake_redis)
+
+    await worker_a.put(make_principal(1, is_admin=True))
+    principal = await worker_b.get(1)
+    assert principal == make_principal(1, is_admin=True)
+
+    await worker_a.invalidate(1)
+    assert f"{REDIS_KEY_PREFIX}1" not in fake_redis.values
+    assert await worker_a.get(1) is None
+    # Worker B still holds its local copy until the short local TTL runs out
+    assert await worker_b.get(1) is not None
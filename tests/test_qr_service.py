@@ -0,0 +1,232 @@
+import json
+import os
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services import qr_service
+from app.services.qr_renderer import render_qr_png
+from app.services.qr_token import encode_purchase_token, QRTokenError
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def thread_executor(monkeypatch, tmp_path):
+    """Render on a thread pool and write into a temporary upload folder"""
+    monkeypatch.setattr(settings, "QR_RENDER_EXECUTOR", "thread")
+    monkeypatch.setattr(settings, "QR_RENDER_MAX_WORKERS", 2)
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    qr_service.shutdown_render_executor()
+    qr_service.qr_image_cache.clear()
+    yield tmp_path
+    qr_service.shutdown_render_executor()
+
+
+@pytest.mark.asyncio
+async def test_generate_qr_code_renders_off_loop(thread_executor):
+    """Test QR generation goes through the render executor"""
+    renders_before = metrics.summary("qr_render.latency_seconds").count
+
+    qr_url = await qr_service.generate_qr_code({"purchase_id": 1, "purchase_code": "ECO-TEST"})
+
+    key = qr_service.qr_cache_key('{"purchase_code":"ECO-TEST","purchase_id":1}')
+    assert qr_url == f"/uploads/qr/{key[:2]}/{key}.png"
+    with open(qr_service.qr_artifact_path(key), "rb") as f:
+        assert f.read().startswith(PNG_SIGNATURE)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["qr_render.latency_seconds"]["count"] == renders_before + 1
+    assert snapshot["qr_render.queue_depth"] == 0
+    assert snapshot["qr_render.executor"]["kind"] == "thread"
+
+
+@pytest.mark.asyncio
+async def test_process_pool_rendering(monkeypatch):
+    """Test rendering in a process pool produces the same image"""
+    monkeypatch.setattr(settings, "QR_RENDER_EXECUTOR", "process")
+    monkeypatch.setattr(settings, "QR_RENDER_MAX_WORKERS", 1)
+    qr_service.shutdown_render_executor()
+    try:
+        png_bytes = await qr_service.run_render(render_qr_png, "ECO-PROCESS")
+    finally:
+        qr_service.shutdown_render_executor()
+
+    assert png_bytes == render_qr_png("ECO-PROCESS")
+
+
+@pytest.mark.asyncio
+async def test_repeat_renders_hit_cache(thread_executor):
+    """Test identical QR data is rendered and written only once"""
+    data = {"purchase_id": 2, "purchase_code": "ECO-REPRINT"}
+    renders_before = metrics.summary("qr_render.latency_seconds").count
+    memory_hits_before = metrics.counter("qr_cache.memory_hits").value
+    disk_hits_before = metrics.counter("qr_cache.disk_hits").value
+
+    first_url = await qr_service.generate_qr_code(data)
+    second_url = await qr_service.generate_qr_code(dict(reversed(list(data.items()))))
+
+    assert first_url == second_url
+    assert metrics.summary("qr_render.latency_seconds").count == renders_before + 1
+    assert metrics.counter("qr_cache.memory_hits").value == memory_hits_before + 1
+
+    # A cold process finds the image in the on-disk store
+    qr_service.qr_image_cache.clear()
+    key, png_bytes = await qr_service.get_qr_image(qr_service.canonical_qr_payload(data))
+    assert png_bytes.startswith(PNG_SIGNATURE)
+    assert metrics.counter("qr_cache.disk_hits").value == disk_hits_before + 1
+    assert metrics.summary("qr_render.latency_seconds").count == renders_before + 1
+
+
+@pytest.mark.asyncio
+async def test_stored_image_restored_after_file_deleted(thread_executor):
+    """Test an image still cached in memory is written again when its file was swept"""
+    payload = qr_service.canonical_qr_payload({"purchase_id": 3, "purchase_code": "ECO-SWEPT"})
+    renders_before = metrics.summary("qr_render.latency_seconds").count
+
+    key = await qr_service.store_qr_image(payload)
+    file_path = qr_service.qr_artifact_path(key)
+    os.remove(file_path)
+    assert key in qr_service.qr_image_cache
+
+    assert await qr_service.store_qr_image(payload) == key
+    with open(file_path, "rb") as f:
+        assert f.read().startswith(PNG_SIGNATURE)
+    assert metrics.summary("qr_render.latency_seconds").count == renders_before + 1
+
+
+def test_lru_eviction():
+    """Test the in-memory cache evicts least recently used images"""
+    cache = qr_service.QRImageCache(max_items=2, max_bytes=1024)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+    cache.put("big", b"x" * 1020)
+    assert cache.stats()["bytes"] <= 1024
+
+
+@pytest.mark.asyncio
+async def test_validate_compact_token():
+    """Test compact signed tokens round-trip through validation"""
+    expires_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    token = encode_purchase_token(42, 7, expires_at)
+
+    assert token.startswith("EQ1:")
+    assert len(token) < 50
+
+    data = await qr_service.validate_qr_code(token)
+    assert data["purchase_id"] == 42
+    assert data["user_id"] == 7
+    assert data["expires_at"] == expires_at
+
+
+@pytest.mark.asyncio
+async def test_validate_tampered_token():
+    """Test tokens with a modified body are rejected"""
+    token = encode_purchase_token(42, 7, datetime(2030, 1, 1))
+    tampered = encode_purchase_token(43, 7, datetime(2030, 1, 1))
+    forged = tampered[:20] + token[20:]
+
+    with pytest.raises(ValueError):
+        await qr_service.validate_qr_code(forged)
+
+
+@pytest.mark.asyncio
+async def test_validate_legacy_payload(monkeypatch):
+    """Test legacy JSON payloads are accepted while the transition is enabled"""
+    monkeypatch.setattr(settings, "QR_ACCEPT_LEGACY_PAYLOADS", True)
+    legacy = json.dumps({
+        "purchase_id": 1,
+        "purchase_code": "ECO-LEGACY",
+        "user_id": 1,
+        "branch_id": 1,
+        "items": [{
+            "name": "Cup",
+            "waste_type_id": 1,
+            "waste_type_name": "Paper",
+            "waste_type_category": "paper"
+        }]
+    })
+
+    data = await qr_service.validate_qr_code(legacy)
+    assert data["purchase_code"] == "ECO-LEGACY"
+
+    # Not after the cutoff, nor with an embedded expiry in the past
+    monkeypatch.setattr(settings, "QR_LEGACY_ACCEPT_UNTIL", datetime.utcnow() - timedelta(minutes=1))
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code(legacy)
+    assert exc_info.value.reason == "legacy_disabled"
+
+    monkeypatch.setattr(settings, "QR_LEGACY_ACCEPT_UNTIL", datetime.utcnow() + timedelta(hours=24))
+    expired = json.dumps({**json.loads(legacy), "expires_at": (datetime.utcnow() - timedelta(minutes=1)).isoformat()})
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code(expired)
+    assert exc_info.value.reason == "expired"
+
+
+@pytest.mark.asyncio
+async def test_validate_expired_token():
+    """Test expired tokens are rejected from the embedded expiry"""
+    token = encode_purchase_token(42, 7, datetime.utcnow() - timedelta(minutes=1))
+
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code(token)
+    assert exc_info.value.reason == "expired"
+
+
+@pytest.mark.asyncio
+async def test_signing_key_rotation(monkeypatch):
+    """Test tokens signed with any configured key verify and new tokens use the active key"""
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(settings, "QR_SIGNING_KEYS", {1: "old-secret"})
+    old_token = encode_purchase_token(1, 1, expires_at)
+
+    monkeypatch.setattr(settings, "QR_SIGNING_KEYS", {1: "old-secret", 2: "new-secret"})
+    new_token = encode_purchase_token(2, 1, expires_at)
+    assert (await qr_service.validate_qr_code(old_token))["purchase_id"] == 1
+    assert (await qr_service.validate_qr_code(new_token))["purchase_id"] == 2
+
+    monkeypatch.setattr(settings, "QR_SIGNING_KEYS", {2: "new-secret"})
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code(old_token)
+    assert exc_info.value.reason == "unknown_key"
+
+
+@pytest.mark.asyncio
+async def test_legacy_payloads_refused_by_default():
+    """Test unsigned JSON payloads are refused unless legacy support is enabled"""
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code('{"purchase_id": 1}')
+    assert exc_info.value.reason == "legacy_disabled"
+
+
+@pytest.mark.asyncio
+async def test_validate_rejects_invalid_payloads(monkeypatch):
+    """Test oversized, malformed and incomplete payloads are rejected"""
+    monkeypatch.setattr(settings, "QR_MAX_PAYLOAD_BYTES", 64)
+    monkeypatch.setattr(settings, "QR_ACCEPT_LEGACY_PAYLOADS", True)
+
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code("x" * 65)
+    assert exc_info.value.reason == "too_large"
+
+    # The limit is in bytes, 40 characters of two bytes each exceed it
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code("é" * 40)
+    assert exc_info.value.reason == "too_large"
+
+    with pytest.raises(QRTokenError):
+        await qr_service.validate_qr_code("{not json")
+
+    with pytest.raises(QRTokenError) as exc_info:
+        await qr_service.validate_qr_code('{"purchase_id": 1, "items": []}')
+    assert "purchase_code" in str(exc_info.value)
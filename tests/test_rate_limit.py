@@ -0,0 +1,33 @@
+import pytest
+
+from app.core.rate_limit import RateLimiter, route_costs
+
+
+@pytest.mark.asyncio
+async def test_workers_share_buckets_through_redis(fake_redis):
+    """Test consumption on one worker limits the same client on another after reconciliation"""
+    worker_a = RateLimiter(rate_per_minute=60, burst=10, redis_client=fake_redis)
+    worker_b = RateLimiter(rate_per_minute=60, burst=10, redis_client=fake_redis)
+
+    assert all(worker_a.acquire("user:1") == 0 for _ in range(10))
+    assert worker_a.acquire("user:1") > 0
+    assert worker_a.acquire("user:2") == 0
+    await worker_a.sync()
+
+    # Worker B has not heard of the client yet, then adopts the shared level
+    assert worker_b.acquire("user:1") == 0
+    await worker_b.sync()
+    retry_after = worker_b.acquire("user:1")
+    assert 1 < retry_after <= 3
+
+    # Idle buckets that refilled are forgotten
+    await worker_a.sync()
+    assert worker_a.stats()["buckets"] == 2
+
+
+def test_route_costs_use_full_paths(monkeypatch):
+    """Test default costs are keyed by the mounted path and settings override them"""
+    monkeypatch.setattr("app.core.rate_limit.settings.RATE_LIMIT_ROUTE_COSTS", {"GET /api/v1/branches/": 4})
+    costs = route_costs()
+    assert costs["POST /api/v1/recycling/validate"] > costs["POST /api/v1/auth/login"] > 1
+    assert costs["GET /api/v1/branches/"] == 4
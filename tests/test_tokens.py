@@ -0,0 +1,120 @@
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from app.core.metrics import metrics
+from app.core.token_revocation import BloomFilter, TokenRevocationList
+from app.core.security import (
+    create_access_token,
+    create_refresh_token,
+    decoded_token_cache,
+    verify_token
+)
+
+
+def test_verify_token_cached_until_expiry(monkeypatch):
+    """Test a repeated token skips decoding and is refused once it expires"""
+    hits = metrics.counter("token_cache.hits")
+    misses = metrics.counter("token_cache.misses")
+    decoded_token_cache.clear()
+    token = create_access_token(42, expires_delta=timedelta(minutes=5))
+
+    misses_before = misses.value
+    assert verify_token(token) == "42"
+    assert misses.value == misses_before + 1
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("cached token decoded again")
+
+    hits_before = hits.value
+    monkeypatch.setattr("app.core.security.jwt.decode", fail_decode)
+    assert verify_token(token) == "42"
+    assert verify_token(token, "refresh") is None
+    assert hits.value == hits_before + 2
+
+    # Past its expiry the entry is dropped
+    monkeypatch.undo()
+    expires_at = decoded_token_cache.get(token)["exp"]
+    monkeypatch.setattr("app.core.security.time.time", lambda: expires_at)
+    assert decoded_token_cache.get(token) is None
+    assert decoded_token_cache.stats()["items"] == 0
+
+
+def test_invalid_tokens_not_cached():
+    """Test tokens that fail verification are neither accepted nor cached"""
+    decoded_token_cache.clear()
+    token = create_refresh_token(7)
+
+    assert verify_token(token[:-2] + "xx") is None
+    assert verify_token(create_access_token(7, expires_delta=timedelta(seconds=-1))) is None
+    assert decoded_token_cache.stats()["items"] == 0
+    assert verify_token(token, "refresh") == "7"
+    assert decoded_token_cache.stats()["items"] == 1
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added item is found and unrelated items rarely are"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [uuid.uuid4().hex for _ in range(1000)]
+    for item in added:
+        bloom.add(item)
+
+    assert all(item in bloom for item in added)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_revocations_reach_other_workers_on_sync(fake_redis):
+    """Test a revocation is seen by another worker after its sync, with unrevoked tokens checked in memory"""
+    redis_checks = metrics.counter("token_revocation.redis_checks")
+    worker_a = TokenRevocationList(fake_redis, capacity=100, sync_interval=60)
+    worker_b = TokenRevocationList(fake_redis, capacity=100, sync_interval=60)
+    await worker_a.sync()
+    await worker_b.sync()
+
+    checks_before = redis_checks.value
+    assert not await worker_b.is_revoked("unrevoked")
+    assert redis_checks.value == checks_before
+
+    await worker_a.revoke("leaked", time.time() + 300)
+    assert await worker_a.is_revoked("leaked")
+    # Worker B only learns about it on its next sync
+    assert not await worker_b.is_revoked("leaked")
+    await worker_b.sync()
+    assert await worker_b.is_revoked("leaked")
+
+    # Role changes outdate older access tokens once synced
+    await worker_a.bump_authz_version(7, 2)
+    assert worker_a.is_outdated("7", 1)
+    assert not worker_b.is_outdated("7", 1)
+    await worker_b.sync()
+    assert worker_b.is_outdated("7", 1)
+    assert not worker_b.is_outdated("7", 2)
+    assert not worker_b.is_outdated("7", None)
+
+    # Expired tokens need no revocation
+    await worker_a.revoke("expired", time.time() - 1)
+    assert "revoked_token:expired" not in fake_redis.values
+
+
+@pytest.mark.asyncio
+async def test_revocations_beyond_capacity_do_not_rebuild_every_sync(fake_redis):
+    """Test a filter rebuilt over more revocations than its capacity is sized to fit them and then synced incrementally"""
+    rebuilds = metrics.counter("token_revocation.rebuilds")
+    expires_at = time.time() + 3600
+    worker_a = TokenRevocationList(fake_redis, capacity=10, sync_interval=60)
+    revoked = [uuid.uuid4().hex for _ in range(25)]
+    for jti in revoked:
+        await worker_a.revoke(jti, expires_at)
+
+    worker_b = TokenRevocationList(fake_redis, capacity=10, sync_interval=60)
+    rebuilds_before = rebuilds.value
+    await worker_b.sync()
+    assert worker_b.stats()["bloom_capacity"] >= 50
+    for _ in range(3):
+        await worker_b.sync()
+    assert rebuilds.value == rebuilds_before + 1
+    assert all([await worker_b.is_revoked(jti) for jti in revoked])